@@ -1,9 +1,8 @@
+-- parametros: {"iso_code": "BRA", "ano_inicial": 2000, "ano_final": 2020}
 SELECT 
     e.ano,
-    f.nome AS fonte_poluente,
-    SUM(e.emissao) AS total_emissao
-FROM public."EmissãoPoluentes" e
-JOIN public."FontesPoluente" f ON e.fonte_poluente_id = f.fonte_poluente_id
-WHERE e.iso_code = 'BRA' AND e.ano BETWEEN 2000 AND 2020
-GROUP BY e.ano, f.nome
-ORDER BY e.ano, f.nome;
+    e.fonte_poluente,
+    e.total_emissao
+FROM public."EmissãoPaísAnoFonte" e
+WHERE e.iso_code = %(iso_code)s AND e.ano BETWEEN %(ano_inicial)s AND %(ano_final)s
+ORDER BY e.ano, e.fonte_poluente;
@@ -1,8 +1,9 @@
+-- parametros: {"ano": 2020}
 SELECT 
     p.nome AS pais,
-    SUM(e.emissao) AS total_emissao
-FROM public."EmissãoPoluentes" e
+    SUM(e.total_emissao) AS total_emissao
+FROM public."EmissãoPaísAno" e
 JOIN public."Países" p ON e.iso_code = p.iso_code
-WHERE e.ano = 2020
+WHERE e.ano = %(ano)s
 GROUP BY p.nome
 ORDER BY total_emissao DESC
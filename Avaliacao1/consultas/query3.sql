@@ -1,10 +1,10 @@
+-- parametros: {"ano": 2020}
 SELECT 
     p.nome AS pais,
-    SUM(CASE WHEN fe.nome IN ('Hydro', 'Solar', 'Wind', 'Biofuel') THEN a.consumo ELSE 0 END) AS consumo_renovavel,
-    SUM(CASE WHEN fe.nome IN ('Coal', 'Oil', 'Gas') THEN a.consumo ELSE 0 END) AS consumo_nao_renovavel
-FROM public."AtividadesEnergia" a
-JOIN public."Países" p ON a.iso_code = p.iso_code
-JOIN public."FontesEnergia" fe ON a.fonte_energia_id = fe.fonte_energia_id
-WHERE a.ano = 2020
+    SUM(c.consumo_renovavel) AS consumo_renovavel,
+    SUM(c.consumo_nao_renovavel) AS consumo_nao_renovavel
+FROM public."ConsumoEnergiaPaísAno" c
+JOIN public."Países" p ON c.iso_code = p.iso_code
+WHERE c.ano = %(ano)s
 GROUP BY p.nome
 ORDER BY consumo_renovavel DESC
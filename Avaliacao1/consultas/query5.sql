@@ -1,14 +1,13 @@
+-- parametros: {"ano_inicial": 2010, "ano_final": 2020}
 WITH emissao_2010 AS (
-    SELECT iso_code, SUM(emissao) AS emissao_2010
-    FROM public."EmissãoPoluentes"
-    WHERE ano = 2010
-    GROUP BY iso_code
+    SELECT iso_code, total_emissao AS emissao_2010
+    FROM public."EmissãoPaísAno"
+    WHERE ano = %(ano_inicial)s
 ),
 emissao_2020 AS (
-    SELECT iso_code, SUM(emissao) AS emissao_2020
-    FROM public."EmissãoPoluentes"
-    WHERE ano = 2020
-    GROUP BY iso_code
+    SELECT iso_code, total_emissao AS emissao_2020
+    FROM public."EmissãoPaísAno"
+    WHERE ano = %(ano_final)s
 )
 SELECT 
     p.nome AS pais,
@@ -0,0 +1,68 @@
+-- Agregados anuais materializados a partir das tabelas de fatos.
+-- Criados vazios (WITH NO DATA) e preenchidos por carga.atualizar_rollups ao
+-- fim de cada carga. Cada visão tem um índice único, exigido pelo
+-- REFRESH MATERIALIZED VIEW CONCURRENTLY. O arquivo não abre nem fecha
+-- transação: roda na transação de quem o executa (no psql, use -1).
+
+-- Emissão por país, ano e fonte poluente (soma dos gases)
+CREATE MATERIALIZED VIEW IF NOT EXISTS public."EmissãoPaísAnoFonte" AS
+SELECT
+    e.iso_code,
+    e.ano,
+    e.fonte_poluente_id,
+    f.nome AS fonte_poluente,
+    SUM(e.emissao) AS total_emissao
+FROM public."EmissãoPoluentes" e
+JOIN public."FontesPoluente" f ON e.fonte_poluente_id = f.fonte_poluente_id
+GROUP BY e.iso_code, e.ano, e.fonte_poluente_id, f.nome
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS "EmissãoPaísAnoFonte_pkey"
+    ON public."EmissãoPaísAnoFonte" (iso_code, ano, fonte_poluente_id);
+
+
+-- Emissão total por país e ano
+CREATE MATERIALIZED VIEW IF NOT EXISTS public."EmissãoPaísAno" AS
+SELECT
+    iso_code,
+    ano,
+    SUM(emissao) AS total_emissao
+FROM public."EmissãoPoluentes"
+GROUP BY iso_code, ano
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS "EmissãoPaísAno_pkey"
+    ON public."EmissãoPaísAno" (ano, iso_code);
+
+
+-- Emissão total por região e ano
+CREATE MATERIALIZED VIEW IF NOT EXISTS public."EmissãoRegiãoAno" AS
+SELECT
+    r.regiao_code,
+    r.nome AS regiao,
+    e.ano,
+    SUM(e.emissao) AS total_emissao
+FROM public."EmissãoPoluentes" e
+JOIN public."Países" p ON e.iso_code = p.iso_code
+JOIN public."Região" r ON p.regiao_code = r.regiao_code
+GROUP BY r.regiao_code, r.nome, e.ano
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS "EmissãoRegiãoAno_pkey"
+    ON public."EmissãoRegiãoAno" (ano, regiao_code);
+
+
+-- Consumo de energia renovável e não renovável por país e ano
+CREATE MATERIALIZED VIEW IF NOT EXISTS public."ConsumoEnergiaPaísAno" AS
+SELECT
+    a.iso_code,
+    a.ano,
+    SUM(CASE WHEN fe.nome IN ('Hydro', 'Solar', 'Wind', 'Biofuel') THEN a.consumo ELSE 0 END) AS consumo_renovavel,
+    SUM(CASE WHEN fe.nome IN ('Coal', 'Oil', 'Gas') THEN a.consumo ELSE 0 END) AS consumo_nao_renovavel
+FROM public."AtividadesEnergia" a
+JOIN public."FontesEnergia" fe ON a.fonte_energia_id = fe.fonte_energia_id
+GROUP BY a.iso_code, a.ano
+WITH NO DATA;
+
+CREATE UNIQUE INDEX IF NOT EXISTS "ConsumoEnergiaPaísAno_pkey"
+    ON public."ConsumoEnergiaPaísAno" (ano, iso_code);
@@ -0,0 +1,101 @@
+import argparse
+import os
+import sys
+import time
+
+import pandas as pd
+from psycopg2 import sql
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import carga
+import copia_binaria
+import parses
+
+# CSVs pré-processados de cada tabela (os mesmos gerados pelos parsers)
+ARQUIVOS = {
+    "EmissãoPoluentes": "emissao_poluentes.csv",
+    "AtividadesEnergia": "atividades_energia.csv",
+    "EmissãoTotalGHG": "emissao_total_ghg.csv",
+    "Demografia": "demografia.csv",
+    "IndicadoresEconômicos": "indicadores_economicos.csv",
+    "EmissãoComércio": "emissao_comercio.csv",
+    "Países": "paises.csv",
+}
+
+# Cria uma tabela temporária com as colunas do modelo, sem chaves, para
+# medir só o COPY
+def criar_temporaria(cursor, tabela, definicao):
+    nome = f"benchmark_{tabela}"
+    colunas = [sql.SQL('{} {}').format(sql.Identifier(c), sql.SQL(d)) for c, d in definicao['colunas']]
+    cursor.execute(sql.SQL('DROP TABLE IF EXISTS {}').format(sql.Identifier(nome)))
+    cursor.execute(sql.SQL('CREATE TEMP TABLE {} ({})').format(sql.Identifier(nome), sql.SQL(', ').join(colunas)))
+    return nome
+
+# Tempo para gerar o fluxo de cada formato no cliente, sem banco
+def medir_codificacao(df, tipos):
+    inicio = time.perf_counter()
+    leitor = carga.LeitorDataFrame(df)
+    tamanho_csv = sum(len(b.encode('utf-8')) for b in iter(lambda: leitor.read(1 << 16), ''))
+    tempo_csv = time.perf_counter() - inicio
+
+    inicio = time.perf_counter()
+    leitor = copia_binaria.LeitorBinario(df, tipos)
+    tamanho_binario = sum(len(b) for b in iter(lambda: leitor.read(1 << 16), b''))
+    tempo_binario = time.perf_counter() - inicio
+    return (tempo_csv, tamanho_csv), (tempo_binario, tamanho_binario)
+
+# Melhor tempo de COPY de um DataFrame em cada formato
+def medir_copy(conn, tabela, definicao, df, repeticoes):
+    tempos = {}
+    with conn.cursor() as cursor:
+        temporaria = criar_temporaria(cursor, tabela, definicao)
+        for formato in ('csv', 'binario'):
+            melhor = None
+            for _ in range(repeticoes):
+                cursor.execute(sql.SQL('TRUNCATE {}').format(sql.Identifier(temporaria)))
+                inicio = time.perf_counter()
+                carga.importar_tabela(cursor, tabela, df, destino=temporaria, formato=formato)
+                tempo = time.perf_counter() - inicio
+                melhor = tempo if melhor is None else min(melhor, tempo)
+            tempos[formato] = melhor
+    conn.rollback()
+    return tempos
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o COPY em CSV e binário nas tabelas pré-processadas")
+    parser.add_argument("--dados", default=parses.DADOS_DIR, help="diretório dos CSVs pré-processados")
+    parser.add_argument("--dsn", help="conexão PostgreSQL; sem ela mede só a geração do fluxo no cliente")
+    parser.add_argument("--repeticoes", type=int, default=3)
+    parser.add_argument("--tabelas", nargs='+', default=list(ARQUIVOS))
+    args = parser.parse_args()
+
+    modelo = carga.ler_modelo()
+    conn = None
+    if args.dsn:
+        import psycopg2
+        conn = psycopg2.connect(args.dsn)
+
+    linhas = []
+    try:
+        for tabela in args.tabelas:
+            df = pd.read_csv(os.path.join(args.dados, ARQUIVOS[tabela]), keep_default_na=False, na_values=[''])
+            tipos = [copia_binaria.tipo_binario(d) for _, d in modelo[tabela]['colunas']]
+            (tempo_csv, bytes_csv), (tempo_bin, bytes_bin) = medir_codificacao(df, tipos)
+            linha = [tabela, len(df), bytes_csv / 2**20, bytes_bin / 2**20, tempo_csv, tempo_bin]
+            if conn is not None:
+                copy = medir_copy(conn, tabela, modelo[tabela], df, args.repeticoes)
+                linha += [copy['csv'], copy['binario'], len(df) / copy['csv'], len(df) / copy['binario'],
+                          copy['csv'] / copy['binario']]
+            linhas.append(linha)
+    finally:
+        if conn is not None:
+            conn.close()
+
+    cabecalho = ['tabela', 'linhas', 'CSV (MiB)', 'binário (MiB)', 'gerar CSV (s)', 'gerar binário (s)']
+    if conn is not None:
+        cabecalho += ['COPY CSV (s)', 'COPY binário (s)', 'CSV (linhas/s)', 'binário (linhas/s)', 'ganho']
+    print(tabulate(linhas, headers=cabecalho, tablefmt='psql', floatfmt=".3f"))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,196 @@
+import argparse
+import datetime
+import json
+import os
+import platform
+import resource
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from tabulate import tabulate
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+import carga
+import consultas
+import datasets
+import etapas
+import parses
+from instrumentacao import pico_rss, zerar_pico_rss
+from gerar_dados import gerar
+
+RESULTADOS_DIR = os.path.join(BENCH_DIR, "resultados")
+CONSULTAS_DIR = os.path.join(BENCH_DIR, "../../consultas")
+DATASETS = ("owid-co2-data.csv", "owid-energy-data.csv", "pip.csv")
+
+# Executa uma etapa e registra tempo, pico de memória e informações extras
+def medir(resultados, nome, funcao, **extras):
+    zerar_pico_rss()
+    inicio = time.perf_counter()
+    retorno = funcao()
+    registro = {
+        'etapa': nome,
+        'tempo_s': round(time.perf_counter() - inicio, 4),
+        'pico_rss_mb': round(pico_rss(), 1),
+        'pico_rss_filhos_mb': round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+    }
+    registro.update(extras)
+    resultados.append(registro)
+    print(f"  {nome:<12} {registro['tempo_s']:8.3f}s  {registro['pico_rss_mb']:8.1f} MiB")
+    return retorno
+
+def versao_codigo():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=BENCH_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Recria o esquema, importa as tabelas e atualiza os agregados, como no script.py
+def copiar(conn, tabelas):
+    with conn.cursor() as cursor:
+        modelo = carga.ler_modelo()
+        for tabela in modelo:
+            cursor.execute(f'DROP TABLE IF EXISTS public."{tabela}" CASCADE')
+        with open(carga.MODELO_FISICO, 'r', encoding='utf-8') as f:
+            cursor.execute(f.read())
+        for tabela, origem in tabelas.items():
+            carga.importar_tabela(cursor, tabela, origem)
+        carga.atualizar_rollups(cursor)
+    conn.commit()
+
+# Executa as consultas de ../consultas e devolve o número de linhas de cada uma
+def consultar(conn):
+    linhas = {}
+    with conn.cursor() as cursor:
+        for nome, consulta, parametros in consultas.carregar_consultas(CONSULTAS_DIR):
+            cursor.execute(consulta, parametros or None)
+            linhas[nome] = len(cursor.fetchall())
+    conn.commit()
+    return linhas
+
+# Roda todas as etapas do pipeline numa escala
+def executar_escala(escala, dados_dir, processos, dsn):
+    print(f"\nEscala {escala}x")
+    resultados = []
+    destino = os.path.join(dados_dir, f"escala-{escala:g}")
+    saida = os.path.join(destino, "dados-pre-processados")
+    os.makedirs(saida, exist_ok=True)
+
+    if not all(os.path.exists(os.path.join(destino, nome)) for nome in DATASETS):
+        gerar(escala, destino)
+    datasets.DATASETS_DIR = destino
+    datasets.CACHE_DIR = os.path.join(destino, ".cache")
+    parses.DADOS_DIR = saida
+    shutil.rmtree(datasets.CACHE_DIR, ignore_errors=True)
+
+    tamanho = sum(os.path.getsize(os.path.join(destino, nome)) for nome in DATASETS)
+    medir(resultados, 'conversao', lambda: [datasets.converter_dataset(nome) for nome in DATASETS],
+          bytes_entrada=tamanho)
+
+    dfs = medir(resultados, 'leitura', lambda: {
+        "co2": datasets.carregar_dataset("owid-co2-data.csv"),
+        "energy": datasets.carregar_dataset("owid-energy-data.csv"),
+        "pip": datasets.carregar_dataset("pip.csv"),
+    })
+    linhas_entrada = {nome: len(df) for nome, df in dfs.items()}
+
+    # Parse sem gravar CSV, para separar o custo de processamento da escrita
+    parses.CARGA_DIRETA, parses.SALVAR_CSV = True, False
+    tabelas = {}
+    tempos = medir(resultados, 'parse', lambda: etapas.executar_etapas(dfs, tabelas, processos, exibir=False),
+                   linhas_entrada=linhas_entrada)
+    resultados[-1]['tempo_por_parser_s'] = {nome: round(t, 4) for nome, t in tempos.items()}
+    parses.CARGA_DIRETA, parses.SALVAR_CSV = False, True
+
+    def escrever():
+        arquivos = {}
+        for tabela, df in tabelas.items():
+            caminho = os.path.join(saida, f"{tabela}.csv")
+            df.to_csv(caminho, index=False, encoding='utf-8')
+            arquivos[tabela] = caminho
+        return arquivos
+    arquivos = medir(resultados, 'escrita_csv', escrever,
+                     linhas_saida={t: len(df) for t, df in tabelas.items()})
+    resultados[-1]['bytes_saida'] = sum(os.path.getsize(c) for c in arquivos.values())
+
+    if dsn is not None:
+        import psycopg2
+        conn = psycopg2.connect(dsn)
+        try:
+            medir(resultados, 'copy', lambda: copiar(conn, arquivos))
+            linhas = medir(resultados, 'consultas', lambda: consultar(conn))
+            resultados[-1]['linhas_por_consulta'] = linhas
+        finally:
+            conn.close()
+
+    return {'escala': escala, 'linhas_entrada': linhas_entrada, 'bytes_entrada': tamanho, 'etapas': resultados}
+
+# Compara com um resultado anterior e aponta etapas que ficaram mais lentas
+def comparar(atual, anterior, tolerancia):
+    anteriores = {(e['escala'], r['etapa']): r for e in anterior['escalas'] for r in e['etapas']}
+    linhas = []
+    regressoes = 0
+    for escala in atual['escalas']:
+        for r in escala['etapas']:
+            antes = anteriores.get((escala['escala'], r['etapa']))
+            if not antes:
+                continue
+            razao = r['tempo_s'] / antes['tempo_s'] if antes['tempo_s'] else float('inf')
+            regressao = razao > 1 + tolerancia
+            regressoes += regressao
+            linhas.append([escala['escala'], r['etapa'], antes['tempo_s'], r['tempo_s'], razao,
+                           antes['pico_rss_mb'], r['pico_rss_mb'], 'REGRESSÃO' if regressao else ''])
+    print(f"\nComparação com {anterior.get('versao')} ({anterior.get('data')}):")
+    print(tabulate(linhas, headers=['escala', 'etapa', 'antes (s)', 'agora (s)', 'razão',
+                                    'pico antes (MiB)', 'pico agora (MiB)', ''], tablefmt='psql', floatfmt=".3f"))
+    return regressoes
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark do pipeline ETL com datasets sintéticos")
+    parser.add_argument("--escalas", type=float, nargs='+', default=[1, 10, 100])
+    parser.add_argument("--dados", help="diretório para guardar e reaproveitar os datasets gerados")
+    parser.add_argument("--processos", type=int, default=None, help="processos usados no parse")
+    parser.add_argument("--dsn", default=None,
+                        help="conexão PostgreSQL para medir COPY e consultas (as tabelas são recriadas!)")
+    parser.add_argument("--saida", help="arquivo JSON de resultado (padrão: benchmarks/resultados/)")
+    parser.add_argument("--comparar", help="JSON de uma execução anterior para comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="aumento relativo de tempo considerado regressão (padrão: 0.2)")
+    args = parser.parse_args()
+
+    dados_dir = args.dados or tempfile.mkdtemp(prefix="benchmark-etl-")
+    try:
+        relatorio = {
+            'versao': versao_codigo(),
+            'data': datetime.datetime.now().isoformat(timespec='seconds'),
+            'ambiente': {
+                'python': platform.python_version(),
+                'pandas': pd.__version__,
+                'plataforma': platform.platform(),
+                'cpus': os.cpu_count(),
+            },
+            'escalas': [executar_escala(e, dados_dir, args.processos, args.dsn) for e in args.escalas],
+        }
+    finally:
+        if not args.dados:
+            shutil.rmtree(dados_dir, ignore_errors=True)
+
+    saida = args.saida or os.path.join(
+        RESULTADOS_DIR, f"etl-{relatorio['versao'] or 'local'}-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(saida)), exist_ok=True)
+    with open(saida, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False)
+    print(f"\nResultado salvo em {saida}")
+
+    if args.comparar:
+        with open(args.comparar, 'r', encoding='utf-8') as f:
+            if comparar(relatorio, json.load(f), args.tolerancia):
+                sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+import argparse
+import os
+import sys
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import parses
+
+FONTES_POLUENTE = pd.DataFrame({
+    'fonte_poluente_id': range(1, 8),
+    'nome': ['Cement', 'Coal', 'Oil', 'Gas', 'Flaring', 'Other Industry', 'Land Use Change'],
+})
+FONTES_ENERGIA = pd.DataFrame({
+    'fonte_energia_id': range(1, 10),
+    'nome': ['Biofuel', 'Coal', 'Gas', 'Hydro', 'Nuclear', 'Oil', 'Solar', 'Wind', 'Other Renewables'],
+})
+COLUNAS_EMISSAO = {
+    'cement_co2': 'Cement', 'coal_co2': 'Coal', 'oil_co2': 'Oil', 'gas_co2': 'Gas',
+    'flaring_co2': 'Flaring', 'other_industry_co2': 'Other Industry', 'co2_including_luc': 'Land Use Change',
+}
+COLUNAS_CUMULATIVA = {
+    'cumulative_cement_co2': 'Cement', 'cumulative_coal_co2': 'Coal', 'cumulative_oil_co2': 'Oil',
+    'cumulative_gas_co2': 'Gas', 'cumulative_flaring_co2': 'Flaring', 'cumulative_other_co2': 'Other Industry',
+    'cumulative_co2_including_luc': 'Land Use Change',
+}
+FONTES_ATIVIDADE = {
+    'Biofuel': ('biofuel_consumption', None, 'biofuel_electricity'),
+    'Coal': ('coal_consumption', 'coal_production', 'coal_electricity'),
+    'Gas': ('gas_consumption', 'gas_production', 'gas_electricity'),
+    'Hydro': ('hydro_consumption', None, 'hydro_electricity'),
+    'Nuclear': ('nuclear_consumption', None, 'nuclear_electricity'),
+    'Oil': ('oil_consumption', 'oil_production', 'oil_electricity'),
+    'Solar': ('solar_consumption', None, 'solar_electricity'),
+    'Wind': ('wind_consumption', None, 'wind_electricity'),
+    'Other Renewables': ('other_renewable_consumption', None, 'other_renewable_electricity'),
+}
+
+# Implementação anterior (melt + merge), mantida como referência
+def emissao_poluentes_melt(co2_df, fontes_df):
+    ids = fontes_df.set_index('nome')['fonte_poluente_id']
+    fonte_map_emissao = {c: ids[n] for c, n in COLUNAS_EMISSAO.items()}
+    fonte_map_cumulativa = {c: ids[n] for c, n in COLUNAS_CUMULATIVA.items()}
+    colunas = ['iso_code', 'year'] + list(fonte_map_emissao) + list(fonte_map_cumulativa)
+    df = co2_df[colunas].dropna(subset=['iso_code', 'year'])
+    emissao = pd.melt(df, id_vars=['iso_code', 'year'], value_vars=fonte_map_emissao.keys(),
+                      var_name='fonte', value_name='emissao')
+    cumulativa = pd.melt(df, id_vars=['iso_code', 'year'], value_vars=fonte_map_cumulativa.keys(),
+                         var_name='fonte_cumulativa', value_name='emissao_cumulativa')
+    emissao['fonte_poluente_id'] = emissao['fonte'].map(fonte_map_emissao)
+    cumulativa['fonte_poluente_id'] = cumulativa['fonte_cumulativa'].map(fonte_map_cumulativa)
+    df = emissao.merge(cumulativa[['iso_code', 'year', 'fonte_poluente_id', 'emissao_cumulativa']],
+                       on=['iso_code', 'year', 'fonte_poluente_id'], how='left')
+    df = df.dropna(subset=['emissao', 'emissao_cumulativa'])
+    df['gas_id'] = 1
+    df = df.rename(columns={'year': 'ano'})
+    return df[['iso_code', 'gas_id', 'fonte_poluente_id', 'ano', 'emissao', 'emissao_cumulativa']]
+
+# Implementação anterior (três melts + dois merges), mantida como referência
+def atividades_energia_melt(energy_df, fontes_df):
+    ids = fontes_df.set_index('nome')['fonte_energia_id']
+    consumo = {c: ids[n] for n, (c, _, _) in FONTES_ATIVIDADE.items()}
+    producao = {p: ids[n] for n, (_, p, _) in FONTES_ATIVIDADE.items() if p}
+    geracao = {g: ids[n] for n, (_, _, g) in FONTES_ATIVIDADE.items()}
+    colunas = ['iso_code', 'year'] + list(consumo) + list(producao) + list(geracao)
+    df = energy_df[colunas].dropna(subset=['iso_code', 'year'])
+    longos = []
+    for mapa, nome in ((consumo, 'consumo'), (producao, 'producao'), (geracao, 'geracao')):
+        longo = pd.melt(df, id_vars=['iso_code', 'year'], value_vars=mapa.keys(),
+                        var_name='fonte', value_name=nome)
+        longo['fonte_energia_id'] = longo['fonte'].map(mapa)
+        longos.append(longo)
+    chaves = ['iso_code', 'year', 'fonte_energia_id']
+    df = longos[0].merge(longos[1][chaves + ['producao']], on=chaves, how='left') \
+                  .merge(longos[2][chaves + ['geracao']], on=chaves, how='left')
+    df = df.dropna(subset=['consumo']).rename(columns={'year': 'ano'})
+    return df[['iso_code', 'fonte_energia_id', 'ano', 'producao', 'geracao', 'consumo']]
+
+# Gera um dataset largo com o formato do OWID (países × anos)
+def gerar_largo(paises, anos, colunas, semente=0):
+    rng = np.random.default_rng(semente)
+    n = paises * anos
+    df = pd.DataFrame({
+        'iso_code': np.repeat([f"P{i:04d}" for i in range(paises)], anos),
+        'year': np.tile(np.arange(2024 - anos, 2024), paises),
+    })
+    for coluna in colunas:
+        valores = rng.random(n) * 100
+        valores[rng.random(n) < 0.3] = np.nan
+        df[coluna] = valores
+    return df
+
+# Mede tempo e pico de memória alocada de uma função
+def medir(funcao, *args, repeticoes=3):
+    tempos = []
+    for _ in range(repeticoes):
+        inicio = time.perf_counter()
+        funcao(*args)
+        tempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    resultado = funcao(*args)
+    _, pico = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return resultado, min(tempos), pico
+
+# Compara duas saídas ignorando o índice e os tipos inteiros
+def mesma_saida(a, b):
+    a = a.reset_index(drop=True)
+    b = b.reset_index(drop=True)
+    pd.testing.assert_frame_equal(a, b, check_dtype=False)
+    return True
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara o reshape vetorizado com o melt + merge anterior")
+    parser.add_argument("--paises", type=int, default=250)
+    parser.add_argument("--anos", type=int, default=274)
+    parser.add_argument("--repeticoes", type=int, default=3)
+    args = parser.parse_args()
+
+    co2_df = gerar_largo(args.paises, args.anos, list(COLUNAS_EMISSAO) + list(COLUNAS_CUMULATIVA))
+    colunas_energia = [c for cols in FONTES_ATIVIDADE.values() for c in cols if c]
+    energy_df = gerar_largo(args.paises, args.anos, colunas_energia, semente=1)
+
+    casos = [
+        ('emissao_poluentes', emissao_poluentes_melt, parses.montar_emissao_poluentes, co2_df, FONTES_POLUENTE),
+        ('atividades_energia', atividades_energia_melt, parses.montar_atividades_energia, energy_df, FONTES_ENERGIA),
+    ]
+    linhas = []
+    for nome, anterior, vetorizado, df, fontes in casos:
+        saida_anterior, tempo_anterior, pico_anterior = medir(anterior, df, fontes, repeticoes=args.repeticoes)
+        saida_nova, tempo_novo, pico_novo = medir(vetorizado, df, fontes, repeticoes=args.repeticoes)
+        mesma_saida(saida_anterior, saida_nova)
+        linhas.append([
+            nome, len(df), len(saida_nova),
+            tempo_anterior, tempo_novo, tempo_anterior / tempo_novo,
+            pico_anterior / 2**20, pico_novo / 2**20, pico_anterior / pico_novo,
+        ])
+
+    print(tabulate(linhas, headers=[
+        'parser', 'linhas entrada', 'linhas saída',
+        'melt+merge (s)', 'vetorizado (s)', 'speedup',
+        'pico melt+merge (MiB)', 'pico vetorizado (MiB)', 'redução memória',
+    ], tablefmt='psql', floatfmt=".3f"))
+
+if __name__ == "__main__":
+    main()
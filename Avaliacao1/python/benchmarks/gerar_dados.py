@@ -0,0 +1,116 @@
+import argparse
+import itertools
+import math
+import os
+import string
+import sys
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import datasets
+
+# Tamanho aproximado dos datasets reais (escala 1)
+PAISES_BASE = 250
+ANO_FINAL = 2023
+ANOS_CO2 = 274
+ANOS_ENERGIA = 124
+COLUNAS_CO2 = 79
+COLUNAS_ENERGIA = 130
+
+REGIOES = [
+    ('EAP', 'East Asia & Pacific'), ('ECA', 'Europe & Central Asia'),
+    ('LAC', 'Latin America & Caribbean'), ('MNA', 'Middle East & North Africa'),
+    ('NAC', 'North America'), ('SAS', 'South Asia'), ('SSA', 'Sub-Saharan Africa'),
+]
+AGREGADOS = ['World', 'Africa', 'Asia', 'Europe', 'High-income countries']
+
+# Códigos de três letras AAA, AAB, ... para os países sintéticos
+def codigos_iso(quantidade):
+    letras = itertools.product(string.ascii_uppercase, repeat=3)
+    return [''.join(c) for c in itertools.islice(letras, quantidade)]
+
+# Dimensões de cada escala: países e anos crescem com a raiz da escala,
+# então o número de linhas cresce linearmente com ela
+def dimensoes(escala):
+    fator = math.sqrt(escala)
+    return round(PAISES_BASE * fator), round(ANOS_CO2 * fator), round(ANOS_ENERGIA * fator)
+
+# Preenche colunas numéricas com valores positivos e uma fração de nulos
+def _preencher(df, colunas, rng, nulos=0.3):
+    n = len(df)
+    valores = {}
+    for coluna in colunas:
+        v = rng.gamma(2.0, 50.0, n)
+        v[rng.random(n) < nulos] = np.nan
+        valores[coluna] = v
+    return pd.concat([df, pd.DataFrame(valores, index=df.index)], axis=1)
+
+# Linhas país × ano no formato OWID, com os agregados sem iso_code
+def _base(isos, anos):
+    nomes = [f"Country {iso}" for iso in isos] + AGREGADOS
+    codigos = isos + [None] * len(AGREGADOS)
+    anos = np.arange(ANO_FINAL - anos + 1, ANO_FINAL + 1)
+    return pd.DataFrame({
+        'country': np.repeat(nomes, len(anos)),
+        'year': np.tile(anos, len(nomes)),
+        'iso_code': np.repeat(codigos, len(anos)),
+    })
+
+def gerar_co2(isos, anos, rng):
+    df = _base(isos, anos)
+    usadas = [c for c in datasets.COLUNAS["owid-co2-data.csv"] if c not in df.columns]
+    extras = [f"extra_source_{i}_co2" for i in range(max(0, COLUNAS_CO2 - len(df.columns) - len(usadas)))]
+    df = _preencher(df, usadas + extras, rng)
+    df['population'] = df['population'].round() * 1000
+    return df
+
+# PIB e população vêm da mesma fonte nos dois datasets reais, então são
+# copiados do co2 (senão o mesmo país e ano teria dois PIBs diferentes)
+def gerar_energia(isos, anos, rng, co2):
+    df = _base(isos, anos)
+    usadas = [c for c in datasets.COLUNAS["owid-energy-data.csv"] if c not in df.columns]
+    extras = [f"extra_source_{i}_share_energy" for i in range(max(0, COLUNAS_ENERGIA - len(df.columns) - len(usadas)))]
+    df = _preencher(df, usadas + extras, rng)
+    comuns = co2.set_index(['country', 'year'])[['gdp', 'population']]
+    df[['gdp', 'population']] = comuns.reindex(pd.MultiIndex.from_frame(df[['country', 'year']])).to_numpy()
+    return df
+
+# Algumas linhas por país, como no pip.csv (uma por ano de pesquisa)
+def gerar_pip(isos, rng, anos_por_pais=10):
+    regioes = rng.integers(0, len(REGIOES), len(isos))
+    linhas = []
+    for iso, r in zip(isos, regioes):
+        for ano in range(ANO_FINAL - anos_por_pais, ANO_FINAL):
+            linhas.append((REGIOES[r][0], REGIOES[r][1], iso, f"Country {iso}", ano))
+    return pd.DataFrame(linhas, columns=['region_code', 'region_name', 'country_code', 'country_name', 'reporting_year'])
+
+# Gera owid-co2-data.csv, owid-energy-data.csv e pip.csv na escala pedida
+def gerar(escala, destino, semente=0):
+    rng = np.random.default_rng(semente)
+    paises, anos_co2, anos_energia = dimensoes(escala)
+    isos = codigos_iso(paises)
+    os.makedirs(destino, exist_ok=True)
+
+    co2 = gerar_co2(isos, anos_co2, rng)
+    arquivos = {
+        "owid-co2-data.csv": co2,
+        "owid-energy-data.csv": gerar_energia(isos, anos_energia, rng, co2),
+        "pip.csv": gerar_pip(isos, rng),
+    }
+    for nome, df in arquivos.items():
+        df.to_csv(os.path.join(destino, nome), index=False)
+        print(f"{nome}: {len(df)} linhas, {len(df.columns)} colunas")
+    return {nome: len(df) for nome, df in arquivos.items()}
+
+def main():
+    parser = argparse.ArgumentParser(description="Gera datasets sintéticos no formato OWID/PIP")
+    parser.add_argument("--escala", type=float, default=1, help="fator de escala (1 ≈ tamanho real)")
+    parser.add_argument("--destino", required=True, help="diretório onde os CSVs serão gravados")
+    parser.add_argument("--semente", type=int, default=0)
+    args = parser.parse_args()
+    gerar(args.escala, args.destino, args.semente)
+
+if __name__ == "__main__":
+    main()
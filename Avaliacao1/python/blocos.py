@@ -0,0 +1,83 @@
+import math
+import os
+import shutil
+import tempfile
+import time
+
+import pandas as pd
+
+import datasets
+import etapas
+import parses
+
+# Etapas que leem os datasets OWID e por isso rodam uma vez por partição
+ETAPAS_POR_PAIS = [e.nome for e in etapas.ETAPAS if {'co2', 'energy'} & set(e.datasets)]
+
+# Divide o CSV bruto em partições por iso_code, lendo em pedaços de tamanho fixo.
+# Todas as linhas de um país caem na mesma partição, em qualquer ordem do arquivo.
+def particionar(nome, diretorio, particoes, linhas_por_leitura=100_000):
+    colunas = set(datasets.COLUNAS[nome])
+    caminhos = [os.path.join(diretorio, f"{os.path.splitext(nome)[0]}-{p}.csv") for p in range(particoes)]
+    cabecalho = None
+
+    leitor = pd.read_csv(os.path.join(datasets.DATASETS_DIR, nome),
+                         usecols=lambda c: c in colunas, chunksize=linhas_por_leitura)
+    for pedaco in leitor:
+        cabecalho = list(pedaco.columns)
+        pedaco = pedaco.dropna(subset=['iso_code'])
+        particao = pd.util.hash_array(pedaco['iso_code'].to_numpy()) % particoes
+        for p, parte in pedaco.groupby(particao):
+            escrever_cabecalho = not os.path.exists(caminhos[p])
+            parte.to_csv(caminhos[p], mode='a', header=escrever_cabecalho, index=False, encoding='utf-8')
+
+    return caminhos, cabecalho
+
+# Lê uma partição; partições sem linhas viram um DataFrame vazio com as colunas
+def ler_particao(caminho, cabecalho):
+    if os.path.exists(caminho):
+        return pd.read_csv(caminho)
+    return pd.DataFrame(columns=cabecalho)
+
+# Pré-processamento com memória limitada: os datasets OWID são particionados
+# por país em disco e cada partição passa pelos mesmos parsers, com a saída
+# acrescentada aos CSVs. O pico de memória depende do tamanho da partição,
+# não do tamanho do dataset.
+def executar_em_blocos(pip_df, tabelas_arquivos, mb_por_particao=64, processos=None):
+    inicio = time.perf_counter()
+    tamanho = max(os.path.getsize(os.path.join(datasets.DATASETS_DIR, nome))
+                  for nome in ("owid-co2-data.csv", "owid-energy-data.csv"))
+    particoes = max(1, math.ceil(tamanho / (mb_por_particao * 2**20)))
+
+    diretorio = tempfile.mkdtemp(prefix="particoes-")
+    try:
+        co2_particoes, co2_colunas = particionar("owid-co2-data.csv", diretorio, particoes)
+        energy_particoes, energy_colunas = particionar("owid-energy-data.csv", diretorio, particoes)
+        print(f"Datasets divididos em {particoes} partições ({time.perf_counter() - inicio:.2f}s)")
+
+        # Tabelas fixas e de região só dependem do pip_df e rodam uma vez
+        fixas = [e.nome for e in etapas.ETAPAS if e.nome not in ETAPAS_POR_PAIS]
+        etapas.executar_etapas({"pip": pip_df}, tabelas_arquivos, processos, nomes=fixas, exibir=False)
+
+        # Os CSVs das etapas por país (cada etapa grava <nome>.csv) são apagados
+        # antes da primeira partição: se um parser falhar nela, as partições
+        # seguintes não acrescentam linhas ao CSV de uma execução anterior
+        for nome in ETAPAS_POR_PAIS:
+            caminho = os.path.join(parses.DADOS_DIR, f"{nome}.csv")
+            if os.path.exists(caminho):
+                os.remove(caminho)
+
+        for p in range(particoes):
+            dataframes = {
+                "co2": ler_particao(co2_particoes[p], co2_colunas),
+                "energy": ler_particao(energy_particoes[p], energy_colunas),
+                "pip": pip_df,
+            }
+            # A primeira partição recria os CSVs; as seguintes acrescentam linhas
+            parses.ANEXAR = p > 0
+            etapas.executar_etapas(dataframes, tabelas_arquivos, processos, nomes=ETAPAS_POR_PAIS, exibir=False)
+            print(f"Partição {p + 1}/{particoes} processada")
+    finally:
+        parses.ANEXAR = False
+        shutil.rmtree(diretorio, ignore_errors=True)
+
+    print(f"Pré-processamento em blocos concluído em {time.perf_counter() - inicio:.2f}s")
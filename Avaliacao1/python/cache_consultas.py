@@ -0,0 +1,84 @@
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(BASE_DIR, '../consultas/.cache')
+
+# Tamanho máximo do cache, em MiB
+LIMITE_MB = 64
+
+# Texto da consulta sem comentários, espaços repetidos e ';' final
+def normalizar(consulta):
+    consulta = re.sub(r'--[^\n]*', ' ', consulta)
+    consulta = re.sub(r'/\*.*?\*/', ' ', consulta, flags=re.S)
+    return ' '.join(consulta.split()).rstrip(';').strip()
+
+# Chave de uma consulta, com seus parâmetros, numa versão dos dados
+def chave(consulta, versao, parametros=None):
+    parametros = json.dumps(parametros or {}, sort_keys=True, default=str)
+    return hashlib.sha256(f"{versao}\n{parametros}\n{normalizar(consulta)}".encode('utf-8')).hexdigest()
+
+# Cache persistente dos CSVs de resultado, indexado pela chave da consulta.
+# Quando passa do limite, os resultados usados há mais tempo são descartados.
+class CacheConsultas:
+    def __init__(self, diretorio=CACHE_DIR, limite_mb=LIMITE_MB):
+        self.diretorio = diretorio
+        self.limite = limite_mb * 2**20
+        self._indice_arquivo = os.path.join(diretorio, "indice.json")
+        self._trava = threading.Lock()
+        os.makedirs(diretorio, exist_ok=True)
+        self.indice = {}
+        if os.path.exists(self._indice_arquivo):
+            with open(self._indice_arquivo, 'r', encoding='utf-8') as f:
+                self.indice = json.load(f)
+
+    def _caminho(self, chave_consulta):
+        return os.path.join(self.diretorio, f"{chave_consulta}.csv")
+
+    # Copia o resultado guardado para destino e devolve sua entrada (com o
+    # número de linhas), ou None se não houver. A cópia é feita fora da trava:
+    # se um guardar concorrente descartar o arquivo antes, conta como ausente
+    def obter(self, chave_consulta, destino):
+        with self._trava:
+            entrada = self.indice.get(chave_consulta)
+            if entrada is None or not os.path.exists(self._caminho(chave_consulta)):
+                return None
+            entrada['ultimo_uso'] = time.time()
+        try:
+            shutil.copyfile(self._caminho(chave_consulta), destino)
+        except FileNotFoundError:
+            return None
+        return entrada
+
+    # Guarda uma cópia do CSV de resultado e descarta os mais antigos se preciso.
+    # A cópia vai para um temporário e é renomeada, para que obter nunca leia
+    # um arquivo pela metade
+    def guardar(self, chave_consulta, arquivo, linhas):
+        tmp = f"{self._caminho(chave_consulta)}.{threading.get_ident()}.tmp"
+        shutil.copyfile(arquivo, tmp)
+        os.replace(tmp, self._caminho(chave_consulta))
+        with self._trava:
+            self.indice[chave_consulta] = {'tamanho': os.path.getsize(arquivo), 'linhas': linhas,
+                                           'ultimo_uso': time.time()}
+            self._descartar()
+
+    def _descartar(self):
+        total = sum(e['tamanho'] for e in self.indice.values())
+        for chave_consulta in sorted(self.indice, key=lambda c: self.indice[c]['ultimo_uso']):
+            if total <= self.limite:
+                break
+            total -= self.indice.pop(chave_consulta)['tamanho']
+            if os.path.exists(self._caminho(chave_consulta)):
+                os.remove(self._caminho(chave_consulta))
+
+    def salvar(self):
+        with self._trava:
+            tmp = self._indice_arquivo + ".tmp"
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump(self.indice, f, indent=2)
+            os.replace(tmp, self._indice_arquivo)
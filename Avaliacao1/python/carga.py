@@ -0,0 +1,350 @@
+import io
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+from psycopg2 import sql
+
+import conexao
+import copia_binaria
+import instrumentacao
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+MODELO_FISICO = os.path.join(BASE_DIR, '../modelos/ModeloFisico.sql')
+ROLLUPS = os.path.join(BASE_DIR, '../modelos/Rollups.sql')
+
+COPY_CSV = "COPY {} FROM STDIN WITH (FORMAT CSV, HEADER, DELIMITER ',', NULL '')"
+
+# Tabelas quase só numéricas, importadas pelo COPY binário no modo 'auto':
+# o servidor não precisa converter texto em double precision linha a linha
+TABELAS_BINARIAS = {"EmissãoPoluentes", "AtividadesEnergia", "EmissãoTotalGHG"}
+
+# Formato do COPY: 'auto' (binário só em TABELAS_BINARIAS), 'csv' ou 'binario'
+FORMATO = 'auto'
+
+# Arquivo somente-leitura que gera o CSV de um DataFrame em blocos,
+# para o COPY consumir sem materializar o texto inteiro em memória
+class LeitorDataFrame:
+    def __init__(self, df, linhas_por_bloco=50000):
+        self._blocos = (
+            df.iloc[i:i + linhas_por_bloco].to_csv(index=False, header=(i == 0))
+            for i in range(0, max(len(df), 1), linhas_por_bloco)
+        )
+        self._atual = io.StringIO()
+
+    def read(self, size=-1):
+        partes = []
+        restante = size
+        while size < 0 or restante > 0:
+            parte = self._atual.read(restante if size >= 0 else -1)
+            if not parte:
+                bloco = next(self._blocos, None)
+                if bloco is None:
+                    break
+                self._atual = io.StringIO(bloco)
+                continue
+            partes.append(parte)
+            restante -= len(parte)
+        return ''.join(partes)
+
+# Formato usado na importação de uma tabela do modelo
+def formato_copia(tabela):
+    if FORMATO == 'auto':
+        return 'binario' if tabela in TABELAS_BINARIAS else 'csv'
+    return FORMATO
+
+# Importa uma tabela a partir de um CSV pré-processado ou de um DataFrame.
+# destino permite copiar para outra tabela com a mesma estrutura (ex.: staging).
+def importar_tabela(cursor, tabela, origem, destino=None, formato=None):
+    destino = destino or tabela
+    formato = formato or formato_copia(tabela)
+    with instrumentacao.etapa(f"importar:{destino}") as registro:
+        registro['formato'] = formato
+        if formato == 'binario':
+            if not isinstance(origem, pd.DataFrame):
+                registro['bytes_entrada'] = os.path.getsize(origem)
+                origem = pd.read_csv(origem, keep_default_na=False, na_values=[''])
+            registro['linhas_entrada'] = len(origem)
+            tipos = [copia_binaria.tipo_binario(d) for _, d in ler_modelo()[tabela]['colunas']]
+            comando = sql.SQL(copia_binaria.COPY_BINARIO).format(sql.Identifier(destino))
+            cursor.copy_expert(comando, copia_binaria.LeitorBinario(origem, tipos), size=1 << 16)
+        elif isinstance(origem, pd.DataFrame):
+            comando = sql.SQL(COPY_CSV).format(sql.Identifier(destino))
+            registro['linhas_entrada'] = len(origem)
+            cursor.copy_expert(comando, LeitorDataFrame(origem), size=1 << 16)
+        else:
+            comando = sql.SQL(COPY_CSV).format(sql.Identifier(destino))
+            registro['bytes_entrada'] = os.path.getsize(origem)
+            with open(origem, "r", encoding="utf-8") as f:
+                cursor.copy_expert(comando, f)
+        instrumentacao.registrar_saida(max(cursor.rowcount, 0))
+
+# Lê o modelo físico e separa, por tabela, as colunas, a chave primária e
+# as chaves estrangeiras (coluna, tabela referenciada, coluna referenciada)
+def ler_modelo(caminho=MODELO_FISICO):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        texto = f.read()
+
+    tabelas = {}
+    for m in re.finditer(r'CREATE TABLE IF NOT EXISTS public\."([^"]+)"\s*\((.*?)\n\);', texto, re.S):
+        nome, corpo = m.groups()
+        colunas, pk = [], []
+        for linha in corpo.splitlines():
+            linha = linha.strip().rstrip(',')
+            chave = re.match(r'PRIMARY KEY \((.*)\)', linha)
+            if chave:
+                pk = [c.strip() for c in chave.group(1).split(',')]
+            elif linha:
+                coluna, definicao = linha.split(None, 1)
+                colunas.append((coluna, definicao))
+        tabelas[nome] = {'colunas': colunas, 'pk': pk, 'fks': []}
+
+    for m in re.finditer(r'ALTER TABLE IF EXISTS public\."([^"]+)"\s*ADD FOREIGN KEY \((\w+)\)\s*'
+                         r'REFERENCES public\."([^"]+)" \((\w+)\)', texto):
+        tabela, coluna, referenciada, coluna_ref = m.groups()
+        tabelas[tabela]['fks'].append((coluna, referenciada, coluna_ref))
+
+    return tabelas
+
+# Estimativa do volume de uma tabela, para começar pelas maiores
+def _tamanho(origem):
+    if isinstance(origem, pd.DataFrame):
+        return origem.size
+    return os.path.getsize(origem)
+
+# Executa as tarefas em paralelo, cada uma com sua própria conexão e transação
+def _em_paralelo(tarefas, conexoes):
+    def executar(descricao, comando):
+        try:
+            with conexao.conectar(carga=True) as conn:
+                with conn.cursor() as cursor:
+                    comando(cursor)
+        except Exception as e:
+            print(f"Erro em {descricao}: {e}")
+            return False
+        return True
+
+    with ThreadPoolExecutor(max_workers=conexoes) as executor:
+        resultados = list(executor.map(lambda t: executar(*t), tarefas))
+    return all(resultados)
+
+# Carga em massa: cria as tabelas sem chaves, importa em paralelo em várias
+# conexões e só depois cria as chaves primárias e valida as estrangeiras
+def carga_paralela(tabelas_arquivos, conexoes=4):
+    modelo = ler_modelo()
+    inicio = time.perf_counter()
+
+    # Cria as tabelas sem chaves primárias nem estrangeiras
+    with conexao.conectar() as conn:
+        with conn.cursor() as cursor:
+            for tabela, definicao in modelo.items():
+                colunas = sql.SQL(', ').join(
+                    sql.SQL('{} {}').format(sql.Identifier(c), sql.SQL(d)) for c, d in definicao['colunas']
+                )
+                cursor.execute(sql.SQL('CREATE TABLE IF NOT EXISTS public.{} ({})').format(sql.Identifier(tabela), colunas))
+    print(f"Tabelas criadas sem chaves ({time.perf_counter() - inicio:.2f}s)")
+
+    # Importa as tabelas em paralelo, das maiores para as menores
+    etapa = time.perf_counter()
+    ordem = sorted(tabelas_arquivos.items(), key=lambda t: _tamanho(t[1]), reverse=True)
+    ok = _em_paralelo([
+        (f"importação de {tabela}", lambda cursor, t=tabela, o=origem: importar_tabela(cursor, t, o))
+        for tabela, origem in ordem
+    ], conexoes)
+    print(f"Tabelas importadas em {conexoes} conexões ({time.perf_counter() - etapa:.2f}s)")
+
+    # Cria as chaves primárias, uma tabela por conexão
+    etapa = time.perf_counter()
+    ok = _em_paralelo([
+        (f"chave primária de {tabela}", lambda cursor, t=tabela, pk=definicao['pk']: cursor.execute(
+            sql.SQL('ALTER TABLE public.{} ADD PRIMARY KEY ({})').format(
+                sql.Identifier(t), sql.SQL(', ').join(map(sql.Identifier, pk)))))
+        for tabela, definicao in modelo.items() if definicao['pk']
+    ], conexoes) and ok
+    print(f"Chaves primárias criadas ({time.perf_counter() - etapa:.2f}s)")
+
+    # Adiciona as chaves estrangeiras sem validar (operação só de catálogo), uma
+    # por transação e em uma conexão só, para não disputar os bloqueios das
+    # tabelas referenciadas; sem a chave primária da referenciada, a chave
+    # falha e a carga devolve False
+    etapa = time.perf_counter()
+    ok = _em_paralelo([
+        (f"chave estrangeira {tabela}.{coluna}", lambda cursor, t=tabela, c=coluna, r=referenciada, cr=coluna_ref:
+            cursor.execute(sql.SQL(
+                'ALTER TABLE public.{} ADD CONSTRAINT {} FOREIGN KEY ({}) '
+                'REFERENCES public.{} ({}) MATCH SIMPLE ON UPDATE NO ACTION ON DELETE NO ACTION NOT VALID'
+            ).format(sql.Identifier(t), sql.Identifier(f"{t}_{c}_fkey"), sql.Identifier(c),
+                     sql.Identifier(r), sql.Identifier(cr))))
+        for tabela, definicao in modelo.items()
+        for coluna, referenciada, coluna_ref in definicao['fks']
+    ], 1) and ok
+
+    # Valida as chaves estrangeiras, uma tabela por conexão
+    def validar(cursor, tabela, fks):
+        for coluna, _, _ in fks:
+            cursor.execute(sql.SQL('ALTER TABLE public.{} VALIDATE CONSTRAINT {}').format(
+                sql.Identifier(tabela), sql.Identifier(f"{tabela}_{coluna}_fkey")))
+
+    ok = _em_paralelo([
+        (f"validação das chaves de {tabela}", lambda cursor, t=tabela, fks=definicao['fks']: validar(cursor, t, fks))
+        for tabela, definicao in modelo.items() if definicao['fks']
+    ], conexoes) and ok
+    print(f"Chaves estrangeiras validadas ({time.perf_counter() - etapa:.2f}s)")
+
+    print(f"Carga paralela concluída em {time.perf_counter() - inicio:.2f}s")
+    return ok
+
+# Cria as tabelas do modelo que ainda não existem no banco e devolve as criadas
+def garantir_esquema(cursor):
+    modelo = ler_modelo()
+    cursor.execute("SELECT tablename FROM pg_tables WHERE schemaname = 'public'")
+    existentes = {linha[0] for linha in cursor.fetchall()}
+
+    if not existentes & set(modelo):
+        with open(MODELO_FISICO, 'r', encoding='utf-8') as f:
+            cursor.execute(f.read())
+        print("Tabelas criadas com sucesso")
+        return set(modelo)
+
+    criadas = set()
+    for tabela, definicao in modelo.items():
+        if tabela in existentes:
+            continue
+        colunas = [sql.SQL('{} {}').format(sql.Identifier(c), sql.SQL(d)) for c, d in definicao['colunas']]
+        if definicao['pk']:
+            colunas.append(sql.SQL('PRIMARY KEY ({})').format(sql.SQL(', ').join(map(sql.Identifier, definicao['pk']))))
+        cursor.execute(sql.SQL('CREATE TABLE public.{} ({})').format(sql.Identifier(tabela), sql.SQL(', ').join(colunas)))
+        print(f"Tabela {tabela} criada")
+        criadas.add(tabela)
+    return criadas
+
+# Lê o conteúdo atual de uma tabela do banco
+def ler_tabela_banco(cursor, tabela):
+    buffer = io.StringIO()
+    cursor.copy_expert(
+        sql.SQL("COPY public.{} TO STDOUT WITH (FORMAT CSV, HEADER)").format(sql.Identifier(tabela)), buffer
+    )
+    buffer.seek(0)
+    return pd.read_csv(buffer, keep_default_na=False, na_values=[''])
+
+# Usa os nomes de colunas do banco e tipos comparáveis entre as duas origens
+def _normalizar(df, definicao):
+    colunas = [c for c, _ in definicao['colunas']]
+    if len(df.columns) != len(colunas):
+        raise ValueError(f"esperadas {len(colunas)} colunas, encontradas {len(df.columns)}")
+
+    df = df.set_axis(colunas, axis=1)
+    for coluna, tipo in definicao['colunas']:
+        if tipo.startswith('integer'):
+            df[coluna] = pd.to_numeric(df[coluna]).astype('Int64')
+        elif tipo.startswith('double precision'):
+            df[coluna] = pd.to_numeric(df[coluna]).astype(float)
+        else:
+            df[coluna] = df[coluna].where(df[coluna].isna(), df[coluna].astype(str))
+    return df
+
+# Seleciona as linhas novas ou alteradas em relação ao que já está no banco
+def linhas_alteradas(novo, atual, definicao):
+    pk = definicao['pk']
+    valores = [c for c, _ in definicao['colunas'] if c not in pk]
+
+    novo = novo.drop_duplicates(subset=pk, keep='last')
+    comparacao = novo.merge(atual, on=pk, how='left', suffixes=('', '_atual'), indicator=True)
+
+    alterada = comparacao['_merge'] == 'left_only'
+    for coluna in valores:
+        a, b = comparacao[coluna], comparacao[coluna + '_atual']
+        iguais = (a == b).fillna(False).astype(bool) | (a.isna() & b.isna())
+        alterada |= ~iguais
+
+    return novo[alterada.to_numpy()]
+
+# Carga incremental: importa só as linhas novas ou alteradas para uma tabela
+# temporária e as mescla com INSERT ... ON CONFLICT pela chave primária.
+# Linhas que deixaram de existir nos dados novos são mantidas no banco.
+# Devolve o total de linhas inseridas ou atualizadas.
+def carga_incremental(cursor, tabelas_arquivos):
+    modelo = ler_modelo()
+    total = 0
+
+    for tabela, origem in tabelas_arquivos.items():
+        definicao = modelo[tabela]
+        pk = definicao['pk']
+
+        if isinstance(origem, pd.DataFrame):
+            novo = origem
+        else:
+            novo = pd.read_csv(origem, keep_default_na=False, na_values=[''])
+        novo = _normalizar(novo, definicao)
+        atual = _normalizar(ler_tabela_banco(cursor, tabela), definicao)
+
+        alteradas = linhas_alteradas(novo, atual, definicao)
+        if alteradas.empty:
+            print(f"{tabela}: nenhuma alteração")
+            continue
+
+        # Tabela temporária com a mesma estrutura, descartada no commit
+        temporaria = f"staging_{tabela}"
+        cursor.execute(sql.SQL('CREATE TEMP TABLE {} (LIKE public.{}) ON COMMIT DROP').format(
+            sql.Identifier(temporaria), sql.Identifier(tabela)))
+        importar_tabela(cursor, tabela, alteradas, destino=temporaria)
+
+        valores = [c for c, _ in definicao['colunas'] if c not in pk]
+        if valores:
+            acao = sql.SQL('DO UPDATE SET {}').format(sql.SQL(', ').join(
+                sql.SQL('{0} = EXCLUDED.{0}').format(sql.Identifier(c)) for c in valores))
+        else:
+            acao = sql.SQL('DO NOTHING')
+        cursor.execute(sql.SQL('INSERT INTO public.{} SELECT * FROM {} ON CONFLICT ({}) {}').format(
+            sql.Identifier(tabela), sql.Identifier(temporaria),
+            sql.SQL(', ').join(map(sql.Identifier, pk)), acao))
+
+        novas = len(alteradas) - alteradas.merge(atual[pk], on=pk).shape[0]
+        print(f"{tabela}: {novas} linhas novas, {len(alteradas) - novas} atualizadas")
+        total += len(alteradas)
+    return total
+
+# Cria as visões materializadas de Rollups.sql que faltam e atualiza todas
+# (com somente_vazias, só as que ainda não foram preenchidas). Visões já
+# preenchidas são atualizadas com CONCURRENTLY, sem bloquear leituras.
+# Devolve quantas visões foram atualizadas.
+def atualizar_rollups(cursor, caminho=ROLLUPS, somente_vazias=False):
+    with open(caminho, 'r', encoding='utf-8') as f:
+        texto = f.read()
+    cursor.execute(texto)
+
+    inicio = time.perf_counter()
+    atualizadas = 0
+    for visao in re.findall(r'CREATE MATERIALIZED VIEW IF NOT EXISTS public\."([^"]+)"', texto):
+        cursor.execute("SELECT ispopulated FROM pg_matviews WHERE schemaname = 'public' AND matviewname = %s",
+                       (visao,))
+        preenchida = cursor.fetchone()[0]
+        if preenchida and somente_vazias:
+            continue
+        concorrente = sql.SQL(' CONCURRENTLY') if preenchida else sql.SQL('')
+        with instrumentacao.etapa(f"rollup:{visao}"):
+            cursor.execute(sql.SQL('REFRESH MATERIALIZED VIEW{} public.{}').format(concorrente, sql.Identifier(visao)))
+        cursor.execute(sql.SQL('ANALYZE public.{}').format(sql.Identifier(visao)))
+        atualizadas += 1
+    print(f"Agregados atualizados: {atualizadas} em {time.perf_counter() - inicio:.2f}s")
+    return atualizadas
+
+# Versão dos dados: uma sequência fora do modelo físico (não é apagada com as
+# tabelas) incrementada depois de cada carga que grava algo. O cache das
+# consultas usa a versão na chave, então essas cargas invalidam os resultados
+# guardados.
+def incrementar_versao(cursor):
+    cursor.execute('CREATE SEQUENCE IF NOT EXISTS public."_versao_dados"')
+    cursor.execute("SELECT nextval('public.\"_versao_dados\"')")
+    return cursor.fetchone()[0]
+
+# Versão atual dos dados, ou None se o banco ainda não foi carregado
+def versao_dados(cursor):
+    cursor.execute("SELECT to_regclass('public.\"_versao_dados\"')")
+    if cursor.fetchone()[0] is None:
+        return None
+    cursor.execute('SELECT last_value, is_called FROM public."_versao_dados"')
+    versao, chamada = cursor.fetchone()
+    return versao if chamada else None
@@ -0,0 +1,99 @@
+import atexit
+import os
+import threading
+from contextlib import contextmanager
+
+from psycopg2 import pool
+
+# Parâmetros da conexão: variáveis de ambiente padrão do libpq, com os
+# valores usados até aqui como padrão. A senha não tem padrão: o próprio libpq
+# a lê de PGPASSWORD ou do ~/.pgpass.
+PARAMETROS = {
+    'dbname': os.environ.get('PGDATABASE', 'postgres'),
+    'user': os.environ.get('PGUSER', 'postgres'),
+    'host': os.environ.get('PGHOST', 'localhost'),
+    'port': os.environ.get('PGPORT', '5432'),
+}
+
+# Máximo de conexões abertas ao mesmo tempo; quem pede além disso espera
+MAXIMO_CONEXOES = int(os.environ.get('ETL_MAXIMO_CONEXOES', '8'))
+
+# Ajustes de sessão das cargas em massa: sem esperar o flush do WAL a cada
+# commit e com mais memória para ordenação e criação de índices
+SESSAO_CARGA = {
+    'synchronous_commit': os.environ.get('ETL_SYNCHRONOUS_COMMIT', 'off'),
+    'work_mem': os.environ.get('ETL_WORK_MEM', '256MB'),
+    'maintenance_work_mem': os.environ.get('ETL_MAINTENANCE_WORK_MEM', '512MB'),
+}
+
+_pool = None
+_vagas = None
+_trava = threading.Lock()
+
+# Pool compartilhado por todas as etapas, criado na primeira conexão
+def _obter_pool():
+    global _pool, _vagas
+    with _trava:
+        if _pool is None:
+            print("Conectando...")
+            _pool = pool.ThreadedConnectionPool(1, MAXIMO_CONEXOES, **PARAMETROS)
+            _vagas = threading.BoundedSemaphore(MAXIMO_CONEXOES)
+        return _pool
+
+# Pega uma conexão do pool, esperando se todas estiverem em uso
+def obter():
+    pool_conexoes = _obter_pool()
+    _vagas.acquire()
+    try:
+        return pool_conexoes.getconn()
+    except Exception:
+        _vagas.release()
+        raise
+
+# Devolve a conexão ao pool; conexões com problema são descartadas
+def devolver(conn):
+    _pool.putconn(conn, close=bool(conn.closed))
+    _vagas.release()
+
+# Empresta uma conexão do pool como uma transação: commit ao fim do bloco,
+# rollback em caso de erro. Com carga=True a sessão recebe SESSAO_CARGA
+# durante o bloco e volta aos padrões antes de retornar ao pool.
+@contextmanager
+def conectar(carga=False):
+    conn = obter()
+    try:
+        if carga:
+            with conn.cursor() as cursor:
+                for parametro, valor in SESSAO_CARGA.items():
+                    cursor.execute("SELECT set_config(%s, %s, false)", (parametro, valor))
+        yield conn
+        conn.commit()
+    except Exception:
+        if not conn.closed:
+            conn.rollback()
+        raise
+    finally:
+        if carga and not conn.closed:
+            with conn.cursor() as cursor:
+                cursor.execute("RESET ALL")
+            conn.commit()
+        devolver(conn)
+
+# Usa uma string de conexão no lugar das variáveis de ambiente; precisa vir
+# antes da primeira conexão
+def configurar(dsn):
+    global PARAMETROS
+    with _trava:
+        if _pool is not None:
+            raise RuntimeError("O pool de conexões já foi criado")
+        PARAMETROS = {'dsn': dsn}
+
+# Fecha todas as conexões do pool
+def fechar():
+    global _pool
+    with _trava:
+        if _pool is not None:
+            _pool.closeall()
+            _pool = None
+
+atexit.register(fechar)
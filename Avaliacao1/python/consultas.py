@@ -0,0 +1,121 @@
+import json
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pandas as pd
+
+import cache_consultas
+import conexao
+import instrumentacao
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+CONSULTAS_DIR = os.path.join(BASE_DIR, '../consultas')
+RESULTADOS_DIR = os.path.join(CONSULTAS_DIR, 'resultados')
+
+# Valores padrão dos parâmetros nomeados (%(nome)s), declarados na linha
+# "-- parametros: {...}" do arquivo da consulta
+def parametros_padrao(consulta):
+    m = re.search(r'^--\s*parametros:\s*(\{.*\})\s*$', consulta, re.M)
+    return json.loads(m.group(1)) if m else {}
+
+# Consultas queryN.sql em ordem, parando no primeiro número que não existe,
+# como (nome, sql, parâmetros padrão)
+def carregar_consultas(diretorio=CONSULTAS_DIR):
+    consultas = []
+    i = 1
+    while os.path.exists(os.path.join(diretorio, f"query{i}.sql")):
+        with open(os.path.join(diretorio, f"query{i}.sql"), 'r', encoding='utf-8') as f:
+            consulta = f.read().strip().rstrip(';')
+        consultas.append((f"query{i}", consulta, parametros_padrao(consulta)))
+        i += 1
+    return consultas
+
+# Texto final da consulta com os parâmetros (COPY e EXPLAIN não aceitam parâmetros)
+def montar(cursor, consulta, parametros):
+    if not parametros:
+        return consulta
+    return cursor.mogrify(consulta, parametros).decode('utf-8')
+
+# Descrição da consulta em queryN.txt, se existir
+def descricao(nome, diretorio=CONSULTAS_DIR):
+    caminho = os.path.join(diretorio, f"{nome}.txt")
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return f.read()
+
+COPY_PARA_CSV = "COPY ({}) TO STDOUT WITH (FORMAT CSV, HEADER)"
+
+# Grava o resultado da consulta direto no CSV com COPY TO, sem passar as
+# linhas pelo Python; devolve o número de linhas
+def exportar_csv(cursor, consulta, caminho):
+    with open(caminho, 'w', encoding='utf-8', newline='') as f:
+        cursor.copy_expert(COPY_PARA_CSV.format(consulta), f)
+    return cursor.rowcount
+
+# Colunas e linhas de um resultado, lendo o CSV só quando for exibi-lo
+def ler_resultado(resultado):
+    if resultado['arquivo'] is None:
+        return resultado['colunas'], resultado['linhas']
+    df = pd.read_csv(resultado['arquivo'], keep_default_na=False, na_values=[''])
+    df = df.astype(object).where(df.notna(), None)
+    return list(df.columns), list(df.itertuples(index=False, name=None))
+
+# Executa uma consulta numa conexão emprestada do pool. Com resultados_dir o resultado
+# vai direto para queryN.csv; sem ele as linhas ficam em memória.
+# Com cache (e a versão atual dos dados), resultados já conhecidos não vão ao banco.
+def executar_consulta(nome, consulta, parametros=None, resultados_dir=RESULTADOS_DIR, cache=None, versao=None):
+    resultado = {'nome': nome, 'colunas': [], 'linhas': [], 'total_linhas': 0,
+                 'erro': None, 'arquivo': None, 'cache': False}
+    if resultados_dir is not None:
+        resultado['arquivo'] = os.path.join(resultados_dir, f"{nome}.csv")
+    usar_cache = cache is not None and versao is not None and resultados_dir is not None
+    chave_consulta = cache_consultas.chave(consulta, versao, parametros) if usar_cache else None
+    inicio = time.perf_counter()
+
+    if usar_cache:
+        with instrumentacao.etapa(f"consulta:{nome}") as registro:
+            entrada = cache.obter(chave_consulta, resultado['arquivo'])
+            if entrada is not None:
+                resultado.update(cache=True, total_linhas=entrada['linhas'], latencia_s=time.perf_counter() - inicio)
+                registro['linhas_saida'] = entrada['linhas']
+                registro['cache'] = True
+                return resultado
+
+    try:
+        with conexao.conectar() as conn, instrumentacao.etapa(f"consulta:{nome}") as registro:
+            with conn.cursor() as cursor:
+                if resultado['arquivo'] is not None:
+                    resultado['total_linhas'] = exportar_csv(
+                        cursor, montar(cursor, consulta, parametros), resultado['arquivo'])
+                    registro['bytes_escritos'] = os.path.getsize(resultado['arquivo'])
+                else:
+                    cursor.execute(consulta, parametros or None)
+                    resultado['linhas'] = cursor.fetchall()
+                    resultado['colunas'] = [desc[0] for desc in cursor.description]
+                    resultado['total_linhas'] = len(resultado['linhas'])
+            resultado['latencia_s'] = time.perf_counter() - inicio
+            registro['linhas_saida'] = resultado['total_linhas']
+            if usar_cache:
+                cache.guardar(chave_consulta, resultado['arquivo'], resultado['total_linhas'])
+    except Exception as e:
+        resultado['erro'] = str(e)
+        resultado['latencia_s'] = time.perf_counter() - inicio
+    return resultado
+
+# Executa as consultas em paralelo, uma por thread, com conexões do pool.
+# Os resultados voltam na ordem das consultas; o tempo total tende ao da mais lenta.
+def executar_consultas(consultas, conexoes=4, resultados_dir=RESULTADOS_DIR, cache=None, versao=None):
+    if resultados_dir is not None:
+        os.makedirs(resultados_dir, exist_ok=True)
+    inicio = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=conexoes) as executor:
+            resultados = list(executor.map(
+                lambda c: executar_consulta(*c, resultados_dir, cache, versao), consultas))
+    finally:
+        if cache is not None:
+            cache.salvar()
+    return resultados, time.perf_counter() - inicio
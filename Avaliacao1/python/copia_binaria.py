@@ -0,0 +1,116 @@
+import io
+
+import numpy as np
+import pandas as pd
+
+# Formato binário do COPY do PostgreSQL: assinatura, flags e extensão do
+# cabeçalho; cada linha tem o número de campos (int16) e, para cada campo,
+# o tamanho (int32, -1 para nulo) seguido dos bytes em big-endian
+ASSINATURA = b'PGCOPY\n\xff\r\n\x00' + np.array([0, 0], dtype='>i4').tobytes()
+FIM = np.array([-1], dtype='>i2').tobytes()
+
+COPY_BINARIO = "COPY {} FROM STDIN WITH (FORMAT BINARY)"
+
+# Tipo binário de cada definição de coluna do modelo físico
+def tipo_binario(definicao):
+    definicao = definicao.lower()
+    if definicao.startswith('integer'):
+        return '>i4'
+    if definicao.startswith('double precision'):
+        return '>f8'
+    if definicao.startswith('character varying') or definicao.startswith('text'):
+        return 'texto'
+    raise ValueError(f"Tipo sem codificação binária: {definicao}")
+
+# Bytes de cada valor de uma coluna (matriz n × largura), o tamanho de cada
+# valor e a máscara de nulos
+def _codificar_coluna(serie, tipo):
+    nulos = serie.isna().to_numpy()
+    if tipo == 'texto':
+        # Os textos se repetem muito (iso_code), então só os distintos são
+        # codificados; a posição 0 é o texto vazio, usada pelos nulos
+        codigos, distintos = pd.factorize(serie)
+        textos = np.array([''] + [str(t) for t in distintos], dtype=str)
+        codificados = np.char.encode(textos, 'utf-8')
+        largura = max(codificados.dtype.itemsize, 1)
+        bytes_distintos = codificados.astype(f'S{largura}').view(np.uint8).reshape(len(textos), largura)
+        dados = bytes_distintos[codigos + 1]
+        tamanhos = np.char.str_len(codificados).astype(np.int64)[codigos + 1]
+    else:
+        valores = pd.to_numeric(serie).to_numpy(dtype=np.float64, na_value=np.nan)
+        if tipo == '>i4':
+            valores = np.where(nulos, 0, valores)
+            if np.any(valores != np.round(valores)) or np.any(np.abs(valores) > np.iinfo(np.int32).max):
+                raise ValueError(f"Coluna {serie.name} tem valores fora de integer")
+        dados = valores.astype(tipo).view(np.uint8).reshape(len(serie), np.dtype(tipo).itemsize)
+        tamanhos = np.full(len(serie), np.dtype(tipo).itemsize, dtype=np.int64)
+    tamanhos[nulos] = 0
+    return dados, tamanhos, nulos
+
+# Copia a matriz de bytes para o buffer a partir das posições de cada linha,
+# só até o tamanho de cada valor
+def _espalhar(buffer, posicoes, dados, tamanhos):
+    colunas = np.arange(dados.shape[1])
+    mascara = colunas[None, :] < tamanhos[:, None]
+    buffer[(posicoes[:, None] + colunas[None, :])[mascara]] = dados[mascara]
+
+# Codifica as linhas de um DataFrame no formato binário do COPY (sem
+# cabeçalho nem fim). As colunas são associadas aos tipos pela posição, como
+# no COPY CSV. Toda a montagem é vetorizada: calcula-se o deslocamento de cada
+# campo de cada linha e os bytes são espalhados coluna a coluna.
+def codificar_linhas(df, tipos):
+    if len(df.columns) != len(tipos):
+        raise ValueError(f"DataFrame com {len(df.columns)} colunas para {len(tipos)} tipos")
+    n = len(df)
+    if n == 0:
+        return b''
+
+    campos = [_codificar_coluna(df.iloc[:, i], tipo) for i, tipo in enumerate(tipos)]
+    # Cada linha: 2 bytes do número de campos + (4 + tamanho) por campo
+    tamanho_linha = 2 + sum(4 + tamanhos for _, tamanhos, _ in campos)
+    inicio_linha = np.zeros(n, dtype=np.int64)
+    np.cumsum(tamanho_linha[:-1], out=inicio_linha[1:])
+    buffer = np.zeros(int(inicio_linha[-1] + tamanho_linha[-1]), dtype=np.uint8)
+
+    numero_campos = np.full(n, len(tipos), dtype='>i2').view(np.uint8).reshape(n, 2)
+    _espalhar(buffer, inicio_linha, numero_campos, np.full(n, 2))
+    posicao = inicio_linha + 2
+    for dados, tamanhos, nulos in campos:
+        cabecalho = np.where(nulos, -1, tamanhos).astype('>i4').view(np.uint8).reshape(n, 4)
+        _espalhar(buffer, posicao, cabecalho, np.full(n, 4))
+        _espalhar(buffer, posicao + 4, dados, tamanhos)
+        posicao = posicao + 4 + tamanhos
+    return buffer.tobytes()
+
+# Arquivo somente-leitura que gera o COPY binário de um DataFrame em blocos,
+# no mesmo esquema do LeitorDataFrame usado para CSV
+class LeitorBinario:
+    def __init__(self, df, tipos, linhas_por_bloco=50000):
+        blocos = (
+            codificar_linhas(df.iloc[i:i + linhas_por_bloco], tipos)
+            for i in range(0, len(df), linhas_por_bloco)
+        )
+        self._blocos = self._moldura(blocos)
+        self._atual = io.BytesIO()
+
+    # Cabeçalho, linhas e marcador de fim
+    @staticmethod
+    def _moldura(blocos):
+        yield ASSINATURA
+        yield from blocos
+        yield FIM
+
+    def read(self, size=-1):
+        partes = []
+        restante = size
+        while size < 0 or restante > 0:
+            parte = self._atual.read(restante if size >= 0 else -1)
+            if not parte:
+                bloco = next(self._blocos, None)
+                if bloco is None:
+                    break
+                self._atual = io.BytesIO(bloco)
+                continue
+            partes.append(parte)
+            restante -= len(parte)
+        return b''.join(partes)
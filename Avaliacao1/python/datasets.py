@@ -0,0 +1,96 @@
+import hashlib
+import os
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.feather as feather
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DATASETS_DIR = os.path.join(BASE_DIR, "../datasets")
+CACHE_DIR = os.path.join(DATASETS_DIR, ".cache")
+
+# Colunas de cada dataset que são usadas pelos parses.*
+COLUNAS = {
+    "owid-co2-data.csv": [
+        'iso_code', 'country', 'year', 'gdp', 'population',
+        'total_ghg', 'total_ghg_excluding_lucf', 'trade_co2', 'consumption_co2',
+        'cement_co2', 'coal_co2', 'oil_co2', 'gas_co2', 'flaring_co2',
+        'other_industry_co2', 'co2_including_luc',
+        'cumulative_cement_co2', 'cumulative_coal_co2', 'cumulative_oil_co2',
+        'cumulative_gas_co2', 'cumulative_flaring_co2', 'cumulative_other_co2',
+        'cumulative_co2_including_luc'
+    ],
+    "owid-energy-data.csv": [
+        'iso_code', 'country', 'year', 'gdp', 'population',
+        'biofuel_consumption', 'coal_consumption', 'gas_consumption',
+        'hydro_consumption', 'nuclear_consumption', 'oil_consumption',
+        'solar_consumption', 'wind_consumption', 'other_renewable_consumption',
+        'coal_production', 'gas_production', 'oil_production',
+        'biofuel_electricity', 'coal_electricity', 'gas_electricity',
+        'hydro_electricity', 'nuclear_electricity', 'oil_electricity',
+        'solar_electricity', 'wind_electricity', 'other_renewable_electricity'
+    ],
+    "pip.csv": ['region_code', 'region_name', 'country_code', 'country_name'],
+}
+
+# Calcula o sha256 do conteúdo de um arquivo, lendo em blocos
+def hash_arquivo(caminho, tamanho_bloco=1 << 20):
+    h = hashlib.sha256()
+    with open(caminho, 'rb') as f:
+        for bloco in iter(lambda: f.read(tamanho_bloco), b''):
+            h.update(bloco)
+    return h.hexdigest()
+
+_hashes = {}
+
+# Hash do conteúdo de um dataset, calculado uma vez enquanto o arquivo não muda
+def hash_dataset(nome):
+    caminho = os.path.join(DATASETS_DIR, nome)
+    estado = os.stat(caminho)
+    chave = (caminho, estado.st_size, estado.st_mtime_ns)
+    if chave not in _hashes:
+        _hashes[chave] = hash_arquivo(caminho)
+    return _hashes[chave]
+
+# Converte o CSV para Arrow (Feather) uma única vez, indexado pelo hash do conteúdo
+def converter_dataset(nome):
+    caminho = os.path.join(DATASETS_DIR, nome)
+    prefixo = os.path.splitext(nome)[0]
+    cache_path = os.path.join(CACHE_DIR, f"{prefixo}-{hash_dataset(nome)[:16]}.arrow")
+
+    if not os.path.exists(cache_path):
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        df = pd.read_csv(caminho, low_memory=False)
+
+        # Grava sem compressão para permitir memory-map na leitura
+        tmp_path = cache_path + ".tmp"
+        feather.write_feather(df, tmp_path, compression='uncompressed')
+        os.replace(tmp_path, cache_path)
+        print(f"Cache de {nome} gerado em {cache_path}")
+
+        # Remove caches antigos do mesmo dataset
+        for arquivo in os.listdir(CACHE_DIR):
+            antigo = os.path.join(CACHE_DIR, arquivo)
+            if arquivo.startswith(prefixo + "-") and antigo != cache_path:
+                os.remove(antigo)
+
+    return cache_path
+
+# Carrega um dataset lendo apenas as colunas usadas pelos parsers. O memory-map
+# só evita ler o arquivo inteiro: to_pandas copia as colunas lidas, e o ganho de
+# memória vem de carregar menos colunas. A conversão sem cópia deixaria os
+# arrays somente leitura, e os parsers alteram os DataFrames
+def carregar_dataset(nome, colunas=None):
+    cache_path = converter_dataset(nome)
+
+    if colunas is None:
+        colunas = COLUNAS.get(nome)
+
+    # Ignora colunas que não existem no dataset (os parsers já tratam a ausência)
+    if colunas is not None:
+        with pa.memory_map(cache_path) as f:
+            existentes = set(pa.ipc.open_file(f).schema.names)
+        colunas = [c for c in colunas if c in existentes]
+
+    tabela = feather.read_table(cache_path, columns=colunas, memory_map=True)
+    return tabela.to_pandas()
@@ -0,0 +1,134 @@
+import multiprocessing
+import os
+import time
+from collections import namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+import instrumentacao
+import parses
+
+# Arquivos dos datasets recebidos pelas etapas
+DATASETS = {
+    'co2': "owid-co2-data.csv",
+    'energy': "owid-energy-data.csv",
+    'pip': "pip.csv",
+}
+
+# Etapa de pré-processamento: os datasets que o parser recebe, as tabelas já
+# geradas que ele lê de tabelas_arquivos e as etapas das quais depende
+Etapa = namedtuple('Etapa', ['nome', 'parser', 'datasets', 'tabelas', 'depende'])
+
+ETAPAS = [
+    Etapa('regiao', parses.regiao, ['pip'], [], []),
+    Etapa('paises', parses.paises, ['co2', 'energy', 'pip'], [], []),
+    Etapa('tipo_gases', parses.tipo_gases, [], [], []),
+    Etapa('fontes_poluente', parses.fontes_poluente, [], [], []),
+    Etapa('fontes_energia', parses.fontes_energia, [], [], []),
+    Etapa('indicadores_economicos', parses.indicadores_economicos, ['co2', 'energy'], [], []),
+    Etapa('gases', parses.gases, [], [], []),
+    Etapa('demografia', parses.demografia, ['co2', 'energy'], [], []),
+    Etapa('emissao_total_ghg', parses.emissao_total_ghg, ['co2'], [], []),
+    Etapa('emissao_comercio', parses.emissao_comercio, ['co2'], [], []),
+    Etapa('emissao_poluentes', parses.emissao_poluentes, ['co2'], ['FontesPoluente'], ['fontes_poluente']),
+    Etapa('atividades_energia', parses.atividades_energia, ['co2', 'energy'], ['FontesEnergia'], ['fontes_energia']),
+]
+
+_POR_NOME = {etapa.nome: etapa for etapa in ETAPAS}
+
+# DataFrames carregados pelo processo principal. Os workers são criados com
+# fork e herdam estas referências sem copiar nem serializar os dados.
+_DATAFRAMES = {}
+
+# Executa uma etapa e devolve as tabelas que ela gerou e a medição da etapa
+def _executar_etapa(nome, entradas):
+    etapa = _POR_NOME[nome]
+    args = [_DATAFRAMES[d] for d in etapa.datasets] + [entradas[t] for t in etapa.tabelas]
+    saida = {}
+    linhas = sum(len(_DATAFRAMES[d]) for d in etapa.datasets)
+    with instrumentacao.etapa(f"parse:{nome}", linhas_entrada=linhas) as registro:
+        etapa.parser(*args, saida)
+    return nome, saida, registro
+
+# Verifica se as tabelas que a etapa lê foram geradas pelas dependências
+def _entradas_disponiveis(etapa, tabelas_arquivos):
+    faltando = [t for t in etapa.tabelas if t not in tabelas_arquivos]
+    if faltando:
+        print(f"Erro: etapa {etapa.nome} ignorada, tabelas ausentes: {faltando}")
+        return False
+    return True
+
+# Executa as etapas respeitando as dependências, em paralelo quando possível.
+# Com nomes, só as etapas listadas rodam; as tabelas das demais devem estar
+# em tabelas_arquivos. Com manifesto, as saídas de cada etapa são registradas.
+def executar_etapas(dataframes, tabelas_arquivos, processos=None, nomes=None, exibir=True, manifesto=None):
+    _DATAFRAMES.clear()
+    _DATAFRAMES.update(dataframes)
+
+    processos = processos or os.cpu_count() or 1
+    paralelo = processos > 1 and 'fork' in multiprocessing.get_all_start_methods()
+
+    selecionadas = [e for e in ETAPAS if nomes is None or e.nome in nomes]
+    tempos = {}
+    saidas = {}
+    geradas = dict(tabelas_arquivos)
+    inicio = time.perf_counter()
+
+    if not paralelo:
+        for etapa in selecionadas:
+            if _entradas_disponiveis(etapa, geradas):
+                _, saidas[etapa.nome], registro = _executar_etapa(etapa.nome, geradas)
+                tempos[etapa.nome] = registro['tempo_s']
+                geradas.update(saidas[etapa.nome])
+                if manifesto is not None:
+                    manifesto.registrar(etapa, saidas[etapa.nome])
+    else:
+        pendentes = list(selecionadas)
+        concluidas = {e.nome for e in ETAPAS if e not in selecionadas}
+        em_execucao = {}
+        contexto = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(max_workers=processos, mp_context=contexto) as executor:
+            while pendentes or em_execucao:
+                # Submete todas as etapas cujas dependências já terminaram
+                for etapa in [e for e in pendentes if set(e.depende) <= concluidas]:
+                    pendentes.remove(etapa)
+                    if not _entradas_disponiveis(etapa, geradas):
+                        concluidas.add(etapa.nome)
+                        continue
+                    entradas = {t: geradas[t] for t in etapa.tabelas}
+                    em_execucao[executor.submit(_executar_etapa, etapa.nome, entradas)] = etapa.nome
+
+                if not em_execucao:
+                    if pendentes:
+                        print(f"Erro: dependências não satisfeitas: {[e.nome for e in pendentes]}")
+                    break
+
+                prontas, _ = wait(em_execucao, return_when=FIRST_COMPLETED)
+                for futuro in prontas:
+                    nome = em_execucao.pop(futuro)
+                    concluidas.add(nome)
+                    try:
+                        _, saidas[nome], registro = futuro.result()
+                        # A medição foi feita no worker; registra no processo principal
+                        instrumentacao.adicionar(registro)
+                        tempos[nome] = registro['tempo_s']
+                        geradas.update(saidas[nome])
+                        if manifesto is not None:
+                            manifesto.registrar(_POR_NOME[nome], saidas[nome])
+                    except Exception as e:
+                        print(f"Erro ao executar etapa {nome}: {e}")
+
+    total = time.perf_counter() - inicio
+
+    # Mantém a ordem de declaração das etapas (a importação respeita as chaves estrangeiras)
+    for etapa in ETAPAS:
+        tabelas_arquivos.update(saidas.get(etapa.nome, {}))
+
+    if not exibir:
+        return tempos
+
+    print("\nTempo por etapa de pré-processamento:")
+    for nome, tempo in sorted(tempos.items(), key=lambda t: t[1], reverse=True):
+        print(f"  {nome:<25} {tempo:8.3f}s")
+    print(f"  {'total':<25} {total:8.3f}s ({'paralelo' if paralelo else 'sequencial'})")
+
+    return tempos
@@ -0,0 +1,239 @@
+import argparse
+import datetime
+import glob
+import hashlib
+import json
+import os
+import re
+import statistics
+import sys
+
+from psycopg2 import sql
+from tabulate import tabulate
+
+import carga
+import conexao
+import consultas
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PLANOS_DIR = os.path.join(BASE_DIR, '../relatorios/planos')
+
+# Correlação mínima entre a ordem física e a coluna para valer um índice BRIN
+CORRELACAO_BRIN = 0.9
+
+# Plano real da consulta (EXPLAIN ANALYZE com buffers e colunas de saída)
+def explicar(cursor, consulta):
+    cursor.execute("EXPLAIN (ANALYZE, BUFFERS, VERBOSE, FORMAT JSON) " + consulta)
+    resultado = cursor.fetchone()[0]
+    if isinstance(resultado, str):
+        resultado = json.loads(resultado)
+    return resultado[0]
+
+# Todos os nós de um plano, em pré-ordem
+def nos(plano):
+    pendentes = [plano]
+    while pendentes:
+        no = pendentes.pop()
+        yield no
+        pendentes.extend(reversed(no.get('Plans', [])))
+
+# Forma do plano sem custos nem tempos: muda só quando o planejador escolhe
+# outra estratégia (outro tipo de nó, outra tabela, outro índice)
+def assinatura(plano):
+    partes = []
+    def visitar(no, nivel):
+        descricao = no['Node Type']
+        if 'Relation Name' in no:
+            descricao += f" {no['Relation Name']}"
+        if 'Index Name' in no:
+            descricao += f" [{no['Index Name']}]"
+        partes.append('  ' * nivel + descricao)
+        for filho in no.get('Plans', []):
+            visitar(filho, nivel + 1)
+    visitar(plano['Plan'], 0)
+    return '\n'.join(partes)
+
+# Resumo de uma execução: tempos, buffers e forma do plano
+def resumir(consulta, execucoes):
+    plano = execucoes[-1]
+    raiz = plano['Plan']
+    return {
+        'sql_hash': hashlib.sha256(consulta.encode('utf-8')).hexdigest()[:16],
+        'execucao_ms': round(statistics.median(e['Execution Time'] for e in execucoes), 3),
+        'planejamento_ms': round(statistics.median(e['Planning Time'] for e in execucoes), 3),
+        'buffers_lidos': raiz.get('Shared Read Blocks', 0),
+        'buffers_cache': raiz.get('Shared Hit Blocks', 0),
+        'varreduras_sequenciais': sorted({n['Relation Name'] for n in nos(raiz) if n['Node Type'] == 'Seq Scan'}),
+        'assinatura': assinatura(plano),
+        'plano': plano,
+    }
+
+# Executa cada consulta algumas vezes sob EXPLAIN ANALYZE e guarda a mediana
+def medir(conn, lista_consultas, repeticoes=3):
+    resultados = {}
+    with conn.cursor() as cursor:
+        for nome, consulta, parametros in lista_consultas:
+            try:
+                consulta = consultas.montar(cursor, consulta, parametros)
+                execucoes = [explicar(cursor, consulta) for _ in range(repeticoes)]
+                resultados[nome] = resumir(consulta, execucoes)
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao analisar {nome}: {e}")
+    conn.rollback()
+    return resultados
+
+# Colunas citadas num filtro do plano, separadas em igualdade e intervalo
+def colunas_filtro(filtro):
+    igualdade, intervalo = [], []
+    for coluna, operador in re.findall(r'(?:"?\w+"?\.)?"?(\w+)"?\)?(?:::[\w ]+?)?\s*(=|>=|<=|<>|<|>)\s', filtro):
+        if operador == '<>':
+            continue
+        destino = igualdade if operador == '=' else intervalo
+        if coluna not in igualdade and coluna not in intervalo:
+            destino.append(coluna)
+    return igualdade, intervalo
+
+def _coluna_saida(expressao):
+    m = re.fullmatch(r'(?:"?\w+"?\.)?"?(\w+)"?', expressao.strip())
+    return m.group(1) if m else None
+
+# Correlação entre a ordem física da tabela e cada coluna (pg_stats)
+def correlacoes(cursor, tabela):
+    cursor.execute("SELECT attname, correlation FROM pg_stats WHERE schemaname = 'public' AND tablename = %s",
+                   (tabela,))
+    return {coluna: correlacao for coluna, correlacao in cursor.fetchall() if correlacao is not None}
+
+# Propõe índices para as varreduras sequenciais com filtro: BRIN quando a
+# coluna filtrada acompanha a ordem física da tabela, senão um btree com as
+# colunas do filtro (igualdade antes de intervalo) cobrindo as colunas lidas
+def propor_indices(conn, resultados, modelo):
+    propostas = {}
+    with conn.cursor() as cursor:
+        for nome, resultado in resultados.items():
+            for no in nos(resultado['plano']['Plan']):
+                if no['Node Type'] != 'Seq Scan' or 'Filter' not in no:
+                    continue
+                tabela = no['Relation Name']
+                igualdade, intervalo = colunas_filtro(no['Filter'])
+                chaves = igualdade + intervalo
+                pk = modelo.get(tabela, {}).get('pk', [])
+                # A chave primária já atende filtros pela primeira coluna
+                if not chaves or (pk and pk[0] in chaves):
+                    continue
+
+                correlacao = correlacoes(cursor, tabela)
+                if len(chaves) == 1 and abs(correlacao.get(chaves[0], 0)) >= CORRELACAO_BRIN:
+                    indice = f"{tabela}_{chaves[0]}_brin"
+                    comando = sql.SQL("CREATE INDEX IF NOT EXISTS {} ON public.{} USING brin ({})").format(
+                        sql.Identifier(indice), sql.Identifier(tabela), sql.Identifier(chaves[0]))
+                else:
+                    lidas = [c for c in map(_coluna_saida, no.get('Output', [])) if c and c not in chaves]
+                    indice = f"{tabela}_{'_'.join(chaves)}_idx"
+                    comando = sql.SQL("CREATE INDEX IF NOT EXISTS {} ON public.{} ({}){}").format(
+                        sql.Identifier(indice), sql.Identifier(tabela),
+                        sql.SQL(', ').join(map(sql.Identifier, chaves)),
+                        sql.SQL(" INCLUDE ({})").format(sql.SQL(', ').join(map(sql.Identifier, lidas)))
+                        if lidas else sql.SQL(''))
+
+                proposta = propostas.setdefault(indice, {'tabela': tabela, 'comando': comando, 'consultas': []})
+                proposta['consultas'].append(nome)
+    return propostas
+
+# Cria os índices propostos e atualiza as estatísticas das tabelas
+def aplicar(conn, propostas):
+    with conn.cursor() as cursor:
+        for indice, proposta in propostas.items():
+            cursor.execute(proposta['comando'])
+            print(f"Índice {indice} criado")
+        for tabela in {p['tabela'] for p in propostas.values()}:
+            cursor.execute(sql.SQL("ANALYZE public.{}").format(sql.Identifier(tabela)))
+    conn.commit()
+
+# Execução anterior mais recente gravada em PLANOS_DIR
+def ultima_execucao(diretorio=PLANOS_DIR):
+    arquivos = sorted(glob.glob(os.path.join(diretorio, "planos-*.json")))
+    if not arquivos:
+        return None
+    with open(arquivos[-1], 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+# Compara com a execução anterior: plano diferente para o mesmo SQL é
+# regressão quando a consulta ficou mais lenta que a tolerância
+def comparar(atual, anterior, tolerancia):
+    linhas, regressoes = [], 0
+    for nome, r in atual.items():
+        antes = anterior['consultas'].get(nome)
+        if not antes or antes['sql_hash'] != r['sql_hash']:
+            continue
+        mudou = antes['assinatura'] != r['assinatura']
+        razao = r['execucao_ms'] / antes['execucao_ms'] if antes['execucao_ms'] else float('inf')
+        regressao = mudou and razao > 1 + tolerancia
+        regressoes += regressao
+        situacao = 'REGRESSÃO DE PLANO' if regressao else ('plano mudou' if mudou else '')
+        linhas.append([nome, antes['execucao_ms'], r['execucao_ms'], razao, situacao])
+    print(f"\nComparação com a execução de {anterior['data']}:")
+    print(tabulate(linhas, headers=['consulta', 'antes (ms)', 'agora (ms)', 'razão', ''],
+                   tablefmt='psql', floatfmt=".3f"))
+    for nome, r in atual.items():
+        antes = anterior['consultas'].get(nome)
+        if antes and antes['sql_hash'] == r['sql_hash'] and antes['assinatura'] != r['assinatura']:
+            print(f"\n{nome} antes:\n{antes['assinatura']}\n{nome} agora:\n{r['assinatura']}")
+    return regressoes
+
+def salvar(resultados, diretorio=PLANOS_DIR):
+    os.makedirs(diretorio, exist_ok=True)
+    agora = datetime.datetime.now()
+    caminho = os.path.join(diretorio, f"planos-{agora:%Y%m%d-%H%M%S}.json")
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump({'data': agora.isoformat(timespec='seconds'), 'consultas': resultados}, f,
+                  indent=2, ensure_ascii=False)
+    print(f"Planos salvos em {caminho}")
+    return caminho
+
+def exibir(resultados):
+    linhas = [[nome, r['execucao_ms'], r['planejamento_ms'], r['buffers_cache'], r['buffers_lidos'],
+               ', '.join(r['varreduras_sequenciais'])] for nome, r in resultados.items()]
+    print(tabulate(linhas, headers=['consulta', 'execução (ms)', 'planejamento (ms)', 'buffers cache',
+                                    'buffers lidos', 'varreduras sequenciais'], tablefmt='psql', floatfmt=".3f"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Analisa os planos das consultas e sugere índices")
+    parser.add_argument("--dsn", help="conexão PostgreSQL (padrão: variáveis PG* de conexao.py)")
+    parser.add_argument("--repeticoes", type=int, default=3, help="execuções por consulta (usa a mediana)")
+    parser.add_argument("--aplicar", action="store_true", help="cria os índices sugeridos e mede de novo")
+    parser.add_argument("--tolerancia", type=float, default=0.2,
+                        help="aumento relativo de tempo que, com mudança de plano, é regressão (padrão: 0.2)")
+    args = parser.parse_args()
+
+    lista_consultas = consultas.carregar_consultas()
+    anterior = ultima_execucao()
+    if args.dsn:
+        conexao.configurar(args.dsn)
+    with conexao.conectar() as conn:
+        resultados = medir(conn, lista_consultas, args.repeticoes)
+        exibir(resultados)
+
+        propostas = propor_indices(conn, resultados, carga.ler_modelo())
+        if not propostas:
+            print("\nNenhum índice sugerido.")
+        for indice, proposta in propostas.items():
+            print(f"\n-- {', '.join(proposta['consultas'])}\n{proposta['comando'].as_string(conn)};")
+
+        if args.aplicar and propostas:
+            aplicar(conn, propostas)
+            depois = medir(conn, lista_consultas, args.repeticoes)
+            linhas = [[nome, resultados[nome]['execucao_ms'], depois[nome]['execucao_ms'],
+                       resultados[nome]['execucao_ms'] / depois[nome]['execucao_ms']]
+                      for nome in depois if nome in resultados]
+            print("\nAntes e depois dos índices:")
+            print(tabulate(linhas, headers=['consulta', 'antes (ms)', 'depois (ms)', 'ganho'],
+                           tablefmt='psql', floatfmt=".3f"))
+            resultados = depois
+
+    salvar(resultados)
+    if anterior is not None and comparar(resultados, anterior, args.tolerancia):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
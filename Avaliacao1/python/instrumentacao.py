@@ -0,0 +1,131 @@
+import cProfile
+import datetime
+import io
+import json
+import os
+import pstats
+import resource
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RELATORIOS_DIR = os.path.join(BASE_DIR, "../relatorios")
+
+# Modo de perfil opcional: None, 'cprofile' ou 'tracemalloc'
+PERFIL = None
+
+_registros = []
+_trava = threading.Lock()
+_local = threading.local()
+
+# Pico de memória residente do processo, em MiB (VmHWM no Linux)
+def pico_rss():
+    try:
+        with open('/proc/self/status') as f:
+            for linha in f:
+                if linha.startswith('VmHWM:'):
+                    return int(linha.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+# Zera o pico de memória residente, quando o kernel permite. O pico é do
+# processo inteiro, então etapas simultâneas em threads se misturam.
+def zerar_pico_rss():
+    try:
+        with open('/proc/self/clear_refs', 'w') as f:
+            f.write('5')
+    except OSError:
+        pass
+
+def iniciar(perfil=None):
+    global PERFIL
+    PERFIL = perfil
+    _registros.clear()
+    if perfil == 'tracemalloc' and not tracemalloc.is_tracing():
+        tracemalloc.start()
+
+# Mede uma etapa: tempo de parede, tempo de CPU, linhas, bytes e pico de memória.
+# O registro é devolvido para que quem chama complete linhas_saida etc.
+@contextmanager
+def etapa(nome, linhas_entrada=None):
+    registro = {'etapa': nome, 'linhas_entrada': linhas_entrada, 'linhas_saida': 0, 'bytes_escritos': 0}
+    pilha = getattr(_local, 'pilha', None)
+    if pilha is None:
+        pilha = _local.pilha = []
+    pilha.append(registro)
+
+    perfil = None
+    if PERFIL == 'cprofile' and len(pilha) == 1:
+        perfil = cProfile.Profile()
+        perfil.enable()
+    if PERFIL == 'tracemalloc':
+        tracemalloc.reset_peak()
+    else:
+        zerar_pico_rss()
+
+    inicio, inicio_cpu = time.perf_counter(), time.process_time()
+    try:
+        yield registro
+    except Exception as e:
+        registro['erro'] = str(e)
+        raise
+    finally:
+        registro['tempo_s'] = round(time.perf_counter() - inicio, 4)
+        registro['cpu_s'] = round(time.process_time() - inicio_cpu, 4)
+        if PERFIL == 'tracemalloc':
+            registro['pico_memoria_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 1)
+        else:
+            registro['pico_rss_mb'] = round(pico_rss(), 1)
+        if perfil is not None:
+            perfil.disable()
+            registro['perfil'] = _resumo_perfil(perfil)
+        pilha.pop()
+        adicionar(registro)
+
+# Soma linhas e bytes gravados às etapas em andamento nesta thread
+def registrar_saida(linhas=0, bytes_escritos=0):
+    for registro in getattr(_local, 'pilha', []):
+        registro['linhas_saida'] += linhas
+        registro['bytes_escritos'] += bytes_escritos
+
+# Adiciona um registro medido em outro processo (ex.: workers das etapas)
+def adicionar(registro):
+    with _trava:
+        _registros.append(registro)
+
+def registros():
+    with _trava:
+        return list(_registros)
+
+# As 15 funções com maior tempo acumulado
+def _resumo_perfil(perfil, limite=15):
+    saida = io.StringIO()
+    estatisticas = pstats.Stats(perfil, stream=saida)
+    estatisticas.sort_stats('cumulative').print_stats(limite)
+    return saida.getvalue().splitlines()
+
+# Grava o relatório JSON da execução e devolve o caminho
+def salvar_relatorio(caminho=None, **metadados):
+    if caminho is None:
+        os.makedirs(RELATORIOS_DIR, exist_ok=True)
+        caminho = os.path.join(RELATORIOS_DIR, f"execucao-{datetime.datetime.now():%Y%m%d-%H%M%S}.json")
+
+    etapas = registros()
+    relatorio = {
+        'data': datetime.datetime.now().isoformat(timespec='seconds'),
+        'perfil': PERFIL,
+        **metadados,
+        'etapas': etapas,
+        'mais_lentas': [r['etapa'] for r in sorted(etapas, key=lambda r: r['tempo_s'], reverse=True)[:5]],
+    }
+    if PERFIL == 'tracemalloc':
+        topo = tracemalloc.take_snapshot().statistics('lineno')[:15]
+        relatorio['alocacoes'] = [str(estatistica) for estatistica in topo]
+
+    with open(caminho, 'w', encoding='utf-8') as f:
+        json.dump(relatorio, f, indent=2, ensure_ascii=False, default=str)
+    print(f"Relatório da execução salvo em {caminho}")
+    return caminho
@@ -0,0 +1,123 @@
+import os
+import re
+import time
+
+import pandas as pd
+
+import conexao
+import consultas
+import instrumentacao
+
+LOTES_DIR = os.path.join(consultas.RESULTADOS_DIR, 'lotes')
+
+PARAMETRO = re.compile(r'%\((\w+)\)s')
+
+# ORDER BY final da consulta (fora de parênteses), com o LIMIT opcional
+ORDENACAO = re.compile(r'\bORDER\s+BY\s+([^()]+?)\s*(?:\bLIMIT\b[^()]*)?;?\s*$', re.I)
+
+# Troca os parâmetros nomeados por posicionais ($1, $2, ...) para o PREPARE
+def posicional(consulta):
+    nomes = []
+    def trocar(m):
+        if m.group(1) not in nomes:
+            nomes.append(m.group(1))
+        return f"${nomes.index(m.group(1)) + 1}"
+    return PARAMETRO.sub(trocar, consulta), nomes
+
+# Caminho da partição de um conjunto de parâmetros: um diretório por
+# parâmetro que varia no lote (ex.: query1/iso_code=BRA/query1.csv)
+def particao(destino, nome, parametros, variaveis):
+    partes = [f"{p}={parametros[p]}" for p in variaveis]
+    diretorio = os.path.join(destino, nome, *partes)
+    os.makedirs(diretorio, exist_ok=True)
+    return os.path.join(diretorio, f"{nome}.csv")
+
+def _variaveis(lote):
+    if not lote:
+        return []
+    return [p for p in lote[0] if len({str(parametros[p]) for parametros in lote}) > 1]
+
+# Ordenação da consulta para a janela do row_number: o ORDER BY de uma
+# subconsulta não garante a ordem de quem a lê. Na janela as colunas são as
+# do resultado, então o prefixo da tabela (e.ano -> ano) é removido. Sem ORDER
+# BY final, a ordem dentro de cada conjunto de parâmetros não é garantida.
+def ordenacao(consulta):
+    m = ORDENACAO.search(consulta)
+    if m is None:
+        return ''
+    return 'ORDER BY ' + re.sub(r'\b\w+\.(?=\w)', '', m.group(1).strip())
+
+# Prepara a consulta uma vez e a executa para cada conjunto de parâmetros
+def executar_preparada(conn, nome, consulta, lote, destino=LOTES_DIR):
+    texto, nomes = posicional(consulta)
+    variaveis = _variaveis(lote)
+    total = 0
+    with conn.cursor() as cursor:
+        cursor.execute(f"PREPARE {nome}_lote AS {texto}")
+        try:
+            marcadores = ', '.join(['%s'] * len(nomes))
+            for parametros in lote:
+                cursor.execute(f"EXECUTE {nome}_lote ({marcadores})" if nomes else f"EXECUTE {nome}_lote",
+                               [parametros[p] for p in nomes])
+                colunas = [desc[0] for desc in cursor.description]
+                df = pd.DataFrame(cursor.fetchall(), columns=colunas)
+                df.to_csv(particao(destino, nome, parametros, variaveis), index=False, encoding='utf-8')
+                total += len(df)
+        except Exception:
+            # O comando preparado sobrevive ao rollback e é liberado abaixo
+            conn.rollback()
+            raise
+        finally:
+            cursor.execute(f"DEALLOCATE {nome}_lote")
+    conn.commit()
+    return total
+
+# Responde o lote inteiro numa consulta só: os conjuntos de parâmetros viram
+# uma tabela VALUES e a consulta roda em LATERAL para cada linha dela
+def executar_em_conjunto(conn, nome, consulta, lote, destino=LOTES_DIR):
+    nomes = list(dict.fromkeys(PARAMETRO.findall(consulta)))
+    variaveis = _variaveis(lote)
+    corpo = PARAMETRO.sub(lambda m: f"_p.{m.group(1)}", consulta)
+    with conn.cursor() as cursor:
+        linhas = ', '.join(
+            cursor.mogrify('(' + ', '.join(['%s'] * (len(nomes) + 1)) + ')',
+                           [i] + [parametros[p] for p in nomes]).decode('utf-8')
+            for i, parametros in enumerate(lote))
+        texto = (f"WITH _p (_lote, {', '.join(nomes)}) AS (VALUES {linhas}) "
+                 f"SELECT _p._lote, _r.* FROM _p CROSS JOIN LATERAL ("
+                 f"SELECT _q.*, row_number() OVER ({ordenacao(consulta)}) AS _ordem FROM ({corpo}) _q) _r "
+                 f"ORDER BY _p._lote, _r._ordem")
+        cursor.execute(texto)
+        colunas = [desc[0] for desc in cursor.description]
+        df = pd.DataFrame(cursor.fetchall(), columns=colunas)
+    conn.commit()
+
+    grupos = dict(tuple(df.groupby('_lote', sort=False))) if len(df) else {}
+    vazio = df.iloc[0:0]
+    for i, parametros in enumerate(lote):
+        parte = grupos.get(i, vazio).drop(columns=['_lote', '_ordem'])
+        parte.to_csv(particao(destino, nome, parametros, variaveis), index=False, encoding='utf-8')
+    return len(df)
+
+# Executa cada consulta para um lote de conjuntos de parâmetros (cada um
+# completa os parâmetros padrão da consulta) e grava uma partição por conjunto
+def executar_lotes(lista_consultas, lote, modo='preparado', destino=LOTES_DIR):
+    executar = executar_preparada if modo == 'preparado' else executar_em_conjunto
+    tempos = {}
+    if not lote:
+        print("Lote vazio: nenhum conjunto de parâmetros para executar")
+        return tempos
+    with conexao.conectar() as conn:
+        for nome, consulta, padrao in lista_consultas:
+            completo = [{**padrao, **parametros} for parametros in lote]
+            inicio = time.perf_counter()
+            try:
+                with instrumentacao.etapa(f"lote:{nome}", linhas_entrada=len(completo)) as registro:
+                    registro['linhas_saida'] = executar(conn, nome, consulta, completo, destino)
+                tempos[nome] = time.perf_counter() - inicio
+                print(f"{nome}: {len(completo)} conjuntos de parâmetros em {tempos[nome]:.2f}s "
+                      f"({registro['linhas_saida']} linhas) -> {os.path.join(destino, nome)}")
+            except Exception as e:
+                conn.rollback()
+                print(f"Erro ao executar o lote de {nome}: {e}")
+    return tempos
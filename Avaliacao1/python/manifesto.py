@@ -0,0 +1,141 @@
+import hashlib
+import inspect
+import json
+import os
+import types
+
+import datasets
+import etapas
+import parses
+
+MANIFESTO = os.path.join(parses.DADOS_DIR, "manifesto.json")
+
+# Nomes globais usados por um código, incluindo funções internas e compreensões
+def _nomes(codigo):
+    nomes = set(codigo.co_names)
+    for constante in codigo.co_consts:
+        if isinstance(constante, types.CodeType):
+            nomes |= _nomes(constante)
+    return nomes
+
+# Hash do código do parser e das funções do mesmo módulo que ele chama
+def hash_codigo(funcao):
+    vistas = {}
+    pendentes = [funcao]
+    while pendentes:
+        f = pendentes.pop()
+        if f.__name__ in vistas:
+            continue
+        vistas[f.__name__] = inspect.getsource(f)
+        for nome in _nomes(f.__code__):
+            alvo = f.__globals__.get(nome)
+            if inspect.isfunction(alvo) and alvo.__module__ == f.__module__:
+                pendentes.append(alvo)
+    return hashlib.sha256(''.join(vistas[n] for n in sorted(vistas)).encode('utf-8')).hexdigest()
+
+# Hash do conteúdo de um arquivo de saída
+def hash_saida(caminho):
+    return datasets.hash_arquivo(caminho)
+
+# Manifesto do pré-processamento: para cada etapa guarda a chave das entradas
+# (código do parser, datasets e tabelas de que depende) e os CSVs gerados; para
+# cada tabela guarda o hash do CSV que foi importado por último no banco
+class Manifesto:
+    def __init__(self, caminho=MANIFESTO):
+        self.caminho = caminho
+        self.dados = {'etapas': {}, 'carregadas': {}}
+        if os.path.exists(caminho):
+            with open(caminho, 'r', encoding='utf-8') as f:
+                self.dados.update(json.load(f))
+        self._hashes_tabelas = {}
+
+    # Chave que muda sempre que alguma entrada da etapa muda
+    def chave(self, etapa, hashes_tabelas):
+        partes = [hash_codigo(etapa.parser)]
+        for nome in etapa.datasets:
+            arquivo = etapas.DATASETS[nome]
+            partes.append(f"{arquivo}:{datasets.hash_dataset(arquivo)}:{','.join(datasets.COLUNAS[arquivo])}")
+        for tabela in etapa.tabelas:
+            partes.append(f"{tabela}:{hashes_tabelas.get(tabela)}")
+        return hashlib.sha256('\n'.join(partes).encode('utf-8')).hexdigest()
+
+    # Confere se os CSVs registrados ainda são os mesmos (tamanho e data)
+    def _saidas_intactas(self, registro):
+        for saida in registro['saidas'].values():
+            caminho = os.path.join(parses.DADOS_DIR, saida['arquivo'])
+            if not os.path.exists(caminho):
+                return False
+            estado = os.stat(caminho)
+            if (estado.st_size, estado.st_mtime_ns) != (saida['tamanho'], saida['mtime_ns']):
+                return False
+        return True
+
+    # Etapas que precisam rodar de novo; as demais têm as saídas reaproveitadas
+    def desatualizadas(self):
+        pendentes = []
+        self._hashes_tabelas = {}
+        for etapa in etapas.ETAPAS:
+            registro = self.dados['etapas'].get(etapa.nome)
+            if (set(etapa.depende) & set(pendentes) or registro is None
+                    or registro['chave'] != self.chave(etapa, self._hashes_tabelas)
+                    or not self._saidas_intactas(registro)):
+                pendentes.append(etapa.nome)
+                continue
+            for tabela, saida in registro['saidas'].items():
+                self._hashes_tabelas[tabela] = saida['hash']
+        return pendentes
+
+    # Tabelas geradas por etapas atualizadas, prontas para importação
+    def saidas_atualizadas(self, pendentes):
+        tabelas = {}
+        for etapa in etapas.ETAPAS:
+            if etapa.nome in pendentes or etapa.nome not in self.dados['etapas']:
+                continue
+            for tabela, saida in self.dados['etapas'][etapa.nome]['saidas'].items():
+                tabelas[tabela] = os.path.join(parses.DADOS_DIR, saida['arquivo'])
+        return tabelas
+
+    # Registra as saídas de uma etapa que acabou de rodar
+    def registrar(self, etapa, saida):
+        self.dados['etapas'].pop(etapa.nome, None)
+        if not saida or any(not isinstance(origem, str) for origem in saida.values()):
+            return
+        registro = {'chave': self.chave(etapa, self._hashes_tabelas), 'saidas': {}}
+        for tabela, caminho in saida.items():
+            estado = os.stat(caminho)
+            registro['saidas'][tabela] = {
+                'arquivo': os.path.relpath(caminho, parses.DADOS_DIR),
+                'hash': hash_saida(caminho),
+                'tamanho': estado.st_size,
+                'mtime_ns': estado.st_mtime_ns,
+            }
+            self._hashes_tabelas[tabela] = registro['saidas'][tabela]['hash']
+        self.dados['etapas'][etapa.nome] = registro
+
+    # Ordena as tabelas pela ordem das etapas (a importação respeita as chaves estrangeiras)
+    def ordenar(self, tabelas_arquivos):
+        ordem = [t for e in etapas.ETAPAS for t in self.dados['etapas'].get(e.nome, {}).get('saidas', {})]
+        ordenadas = {t: tabelas_arquivos[t] for t in ordem if t in tabelas_arquivos}
+        ordenadas.update({t: o for t, o in tabelas_arquivos.items() if t not in ordenadas})
+        return ordenadas
+
+    def _hash_tabela(self, tabela):
+        for registro in self.dados['etapas'].values():
+            if tabela in registro['saidas']:
+                return registro['saidas'][tabela]['hash']
+        return None
+
+    # Verifica se o CSV atual da tabela já foi importado no banco
+    def carregada(self, tabela):
+        atual = self._hash_tabela(tabela)
+        return atual is not None and self.dados['carregadas'].get(tabela) == atual
+
+    def marcar_carregadas(self, tabelas):
+        for tabela in tabelas:
+            self.dados['carregadas'][tabela] = self._hash_tabela(tabela)
+
+    def salvar(self):
+        tmp = self.caminho + ".tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.dados, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.caminho)
@@ -1,7 +1,41 @@
+import numpy as np
 import pandas as pd
 import os
 
+import instrumentacao
+
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DADOS_DIR = os.path.join(BASE_DIR, "../dados-pre-processados")
+
+# Com CARGA_DIRETA os DataFrames vão direto para tabelas_arquivos e são
+# importados em memória; os CSVs só são gravados se SALVAR_CSV for True
+CARGA_DIRETA = False
+SALVAR_CSV = True
+
+# Com ANEXAR as linhas são acrescentadas ao CSV existente (processamento em blocos)
+ANEXAR = False
+
+# Salva o DataFrame gerado e registra a tabela para importação
+def salvar_tabela(df, arquivo, tabela, tabelas_arquivos):
+    caminho = os.path.join(DADOS_DIR, arquivo)
+    if ANEXAR and os.path.exists(caminho):
+        tamanho = os.path.getsize(caminho)
+        df.to_csv(caminho, mode='a', header=False, index=False, encoding='utf-8')
+        instrumentacao.registrar_saida(len(df), os.path.getsize(caminho) - tamanho)
+    elif SALVAR_CSV or not CARGA_DIRETA:
+        df.to_csv(caminho, index=False, encoding='utf-8')
+        instrumentacao.registrar_saida(len(df), os.path.getsize(caminho))
+        print(f"Arquivo {arquivo} gerado com sucesso!")
+    else:
+        instrumentacao.registrar_saida(len(df))
+
+    tabelas_arquivos[tabela] = df if CARGA_DIRETA else caminho
+
+# Lê uma tabela registrada em tabelas_arquivos (caminho do CSV ou DataFrame)
+def ler_tabela(origem):
+    if isinstance(origem, pd.DataFrame):
+        return origem
+    return pd.read_csv(origem)
 
 def regiao(pip_df,tabelas_arquivos):
     try:
@@ -27,13 +61,8 @@ def regiao(pip_df,tabelas_arquivos):
             wld = pd.DataFrame([{'regiao_code': 'WLD', 'nome': 'World'}])
             regioes = pd.concat([regioes, wld], ignore_index=True)
         
-        # Salva CSV
-        regioes_path = os.path.join(BASE_DIR, "../dados-pre-processados/regiao.csv")
-        regioes.to_csv(regioes_path, index=False, encoding='utf-8')
-        print(f"Arquivo regiao.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["Região"] = regioes_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(regioes, "regiao.csv", "Região", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar regioes.csv: {e}")
@@ -75,15 +104,8 @@ def paises(co2_df, energy_df, pip_df, tabelas_arquivos):
         countries = countries.dropna(subset=['iso_code', 'nome'])
         countries = countries.drop_duplicates(subset='iso_code')
         
-        # Salva CSV
-        countries_path = os.path.join(BASE_DIR, '../dados-pre-processados/paises.csv')
-        countries[['iso_code', 'regiao_code', 'nome']].to_csv(
-            countries_path, index=False, encoding='utf-8'
-        )
-        print("Arquivo paises.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["Países"] = countries_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(countries[['iso_code', 'regiao_code', 'nome']], "paises.csv", "Países", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar paises.csv: {e}")
@@ -100,13 +122,8 @@ def tipo_gases(tabelas_arquivos):
         # Cria um DataFrame com os dados
         df = pd.DataFrame(tipo_gases)
     
-        # Salva como CSV
-        tipo_gases_path = os.path.join(BASE_DIR, '../dados-pre-processados/tipo_gases.csv')
-        df.to_csv(tipo_gases_path, index=False, encoding='utf-8')
-        print("Arquivo tipo_gases.csv gerado com sucesso!")
-    
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["TipoGases"] = tipo_gases_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(df, "tipo_gases.csv", "TipoGases", tabelas_arquivos)
     
     except Exception as e:
         print(f"Erro ao gerar tipo_gases.csv: {e}")
@@ -128,13 +145,8 @@ def fontes_poluente(tabelas_arquivos):
         # Cria um DataFrame com os dados
         df = pd.DataFrame(fontes_poluente)
         
-        # Salva como CSV
-        fontes_poluente_path = os.path.join(BASE_DIR, '../dados-pre-processados/fontes_poluente.csv')
-        df.to_csv(fontes_poluente_path, index=False, encoding='utf-8')
-        print("Arquivo fontes_poluente.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["FontesPoluente"] = fontes_poluente_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(df, "fontes_poluente.csv", "FontesPoluente", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar fontes_poluente.csv: {e}")
@@ -158,13 +170,8 @@ def fontes_energia(tabelas_arquivos):
         # Cria um DataFrame com os dados
         df = pd.DataFrame(fontes_energia)
         
-        # Salva como CSV
-        fontes_energia_path = os.path.join(BASE_DIR, '../dados-pre-processados/fontes_energia.csv')
-        df.to_csv(fontes_energia_path, index=False, encoding='utf-8')
-        print("Arquivo fontes_energia.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["FontesEnergia"] = fontes_energia_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(df, "fontes_energia.csv", "FontesEnergia", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar fontes_energia.csv: {e}")
@@ -180,13 +187,8 @@ def indicadores_economicos(co2_df,energy_df,tabelas_arquivos):
         # Renomeia as colunas para corresponder à tabela
         indicadores = indicadores.rename(columns={'year': 'ano'})
         
-        # Salva como CSV
-        indicadores_path = os.path.join(BASE_DIR, '../dados-pre-processados/indicadores_economicos.csv')
-        indicadores.to_csv(indicadores_path, index=False, encoding='utf-8')
-        print("Arquivo indicadores_economicos.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["IndicadoresEconômicos"] = indicadores_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(indicadores, "indicadores_economicos.csv", "IndicadoresEconômicos", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar indicadores_economicos.csv: {e}")
@@ -204,13 +206,8 @@ def gases(tabelas_arquivos):
         # Cria um DataFrame com os dados
         df = pd.DataFrame(gases)
         
-        # Salva como CSV
-        gases_path = os.path.join(BASE_DIR, '../dados-pre-processados/gases.csv')
-        df.to_csv(gases_path, index=False, encoding='utf-8')
-        print("Arquivo gases.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["Gases"] = gases_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(df, "gases.csv", "Gases", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar gases.csv: {e}")    
@@ -232,13 +229,8 @@ def demografia(co2_df,energy_df,tabelas_arquivos):
         # Converte populacao para inteiro (arredondando a média)
         demografia['population'] = demografia['population'].round().astype(int)
         
-        # Salva como CSV
-        demografia_path = os.path.join(BASE_DIR, '../dados-pre-processados/demografia.csv')
-        demografia.to_csv(demografia_path, index=False, encoding='utf-8')
-        print("Arquivo demografia.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["Demografia"] = demografia_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(demografia, "demografia.csv", "Demografia", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar demografia.csv: {e}")
@@ -255,13 +247,8 @@ def emissao_total_ghg(co2_df,tabelas_arquivos):
         # Renomeia as colunas para corresponder à tabela
         emissao_ghg = emissao_ghg.rename(columns={'year': 'ano'})
         
-        # Salva como CSV
-        emissao_ghg_path = os.path.join(BASE_DIR, '../dados-pre-processados/emissao_total_ghg.csv')
-        emissao_ghg.to_csv(emissao_ghg_path, index=False, encoding='utf-8')
-        print("Arquivo emissao_total_ghg.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["EmissãoTotalGHG"] = emissao_ghg_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(emissao_ghg, "emissao_total_ghg.csv", "EmissãoTotalGHG", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar emissao_total_ghg.csv: {e}")
@@ -284,207 +271,148 @@ def emissao_comercio(co2_df,tabelas_arquivos):
         # Reordena as colunas para corresponder à tabela
         emissao_comercio = emissao_comercio[['iso_code', 'gas_id','ano',  'trade_co2', 'consumption_co2']]
         
-        # Salva como CSV
-        emissao_comercio_path = os.path.join(BASE_DIR, '../dados-pre-processados/emissao_comercio.csv')
-        emissao_comercio.to_csv(emissao_comercio_path, index=False, encoding='utf-8')
-        print("Arquivo emissao_comercio.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["EmissãoComércio"] = emissao_comercio_path
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(emissao_comercio, "emissao_comercio.csv", "EmissãoComércio", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar emissao_comercio.csv: {e}")
 
+# Converte colunas largas em linhas numa única passada. As colunas de cada
+# medida formam uma matriz (linhas × fontes), alinhada por posição com ids;
+# None indica que a fonte não tem aquela medida e vira NaN. O resultado sai
+# na mesma ordem do pd.melt: todas as linhas da primeira fonte, depois da segunda...
+def empilhar_fontes(df, chaves, nome_id, ids, medidas):
+    n = len(df)
+    longo = {chave: np.tile(df[chave].to_numpy(), len(ids)) for chave in chaves}
+    longo[nome_id] = np.repeat(np.asarray(ids), n)
+    for medida, colunas in medidas.items():
+        matriz = np.full((n, len(ids)), np.nan)
+        for j, coluna in enumerate(colunas):
+            if coluna is not None:
+                matriz[:, j] = df[coluna].to_numpy(dtype=float, na_value=np.nan)
+        longo[medida] = matriz.ravel(order='F')
+    return longo
+
+# Monta o DataFrame de EmissãoPoluentes a partir do co2_df
+def montar_emissao_poluentes(co2_df, fontes_df):
+    # Fonte, coluna de emissão e coluna de emissão cumulativa no dataset
+    fonte_to_coluna = {
+        'Cement': ('cement_co2', 'cumulative_cement_co2'),
+        'Coal': ('coal_co2', 'cumulative_coal_co2'),
+        'Oil': ('oil_co2', 'cumulative_oil_co2'),
+        'Gas': ('gas_co2', 'cumulative_gas_co2'),
+        'Flaring': ('flaring_co2', 'cumulative_flaring_co2'),
+        'Other Industry': ('other_industry_co2', 'cumulative_other_co2'),
+        'Land Use Change': ('co2_including_luc', 'cumulative_co2_including_luc')
+    }
+
+    # Cria mapeamento de nomes de fontes para fonte_poluente_id
+    fonte_ids = fontes_df.set_index('nome')['fonte_poluente_id']
+    ids = [fonte_ids[nome] for nome in fonte_to_coluna]
+
+    # Seleciona iso_code, year e as colunas de emissão e cumulativas
+    emissao_poluentes = co2_df.dropna(subset=['iso_code', 'year'])
+
+    # Transforma as colunas de emissão e emissão cumulativa em linhas (formato longo)
+    longo = empilhar_fontes(
+        emissao_poluentes, ['iso_code', 'year'], 'fonte_poluente_id', ids,
+        {
+            'emissao': [emissao for emissao, _ in fonte_to_coluna.values()],
+            'emissao_cumulativa': [cumulativa for _, cumulativa in fonte_to_coluna.values()],
+        }
+    )
+
+    # Remove linhas com emissao ou emissao_cumulativa nula
+    validas = ~(np.isnan(longo['emissao']) | np.isnan(longo['emissao_cumulativa']))
+
+    # Seleciona as colunas na ordem correta, com gas_id fixo (1 para CO2)
+    return pd.DataFrame({
+        'iso_code': longo['iso_code'][validas],
+        'gas_id': 1,
+        'fonte_poluente_id': longo['fonte_poluente_id'][validas],
+        'ano': longo['year'][validas],
+        'emissao': longo['emissao'][validas],
+        'emissao_cumulativa': longo['emissao_cumulativa'][validas],
+    })
+
 # Faz o parse da tabela Emissao poluentes
 def emissao_poluentes(co2_df,fontes_poluente_path,tabelas_arquivos):
     try:
-        fontes_df = pd.read_csv(fontes_poluente_path)
-        # Cria mapeamento de nomes de fontes para fonte_poluente_id
-        # Ajusta nomes para corresponder às colunas do dataset
-        fonte_map_emissao = {
-            'cement_co2': fontes_df[fontes_df['nome'] == 'Cement']['fonte_poluente_id'].iloc[0],
-            'coal_co2': fontes_df[fontes_df['nome'] == 'Coal']['fonte_poluente_id'].iloc[0],
-            'oil_co2': fontes_df[fontes_df['nome'] == 'Oil']['fonte_poluente_id'].iloc[0],
-            'gas_co2': fontes_df[fontes_df['nome'] == 'Gas']['fonte_poluente_id'].iloc[0],
-            'flaring_co2': fontes_df[fontes_df['nome'] == 'Flaring']['fonte_poluente_id'].iloc[0],
-            'other_industry_co2': fontes_df[fontes_df['nome'] == 'Other Industry']['fonte_poluente_id'].iloc[0],
-            'co2_including_luc': fontes_df[fontes_df['nome'] == 'Land Use Change']['fonte_poluente_id'].iloc[0]
-        }
-        
-        # Mapeamento para colunas cumulativas
-        fonte_map_cumulativa = {
-            'cumulative_cement_co2': fontes_df[fontes_df['nome'] == 'Cement']['fonte_poluente_id'].iloc[0],
-            'cumulative_coal_co2': fontes_df[fontes_df['nome'] == 'Coal']['fonte_poluente_id'].iloc[0],
-            'cumulative_oil_co2': fontes_df[fontes_df['nome'] == 'Oil']['fonte_poluente_id'].iloc[0],
-            'cumulative_gas_co2': fontes_df[fontes_df['nome'] == 'Gas']['fonte_poluente_id'].iloc[0],
-            'cumulative_flaring_co2': fontes_df[fontes_df['nome'] == 'Flaring']['fonte_poluente_id'].iloc[0],
-            'cumulative_other_co2': fontes_df[fontes_df['nome'] == 'Other Industry']['fonte_poluente_id'].iloc[0],
-            'cumulative_co2_including_luc': fontes_df[fontes_df['nome'] == 'Land Use Change']['fonte_poluente_id'].iloc[0]
-        }
-        
-        # Seleciona iso_code, year e as colunas de emissão e cumulativas
-        colunas = ['iso_code', 'year'] + list(fonte_map_emissao.keys()) + list(fonte_map_cumulativa.keys())
-        emissao_poluentes = co2_df[colunas].dropna(subset=['iso_code', 'year'])
-        
-        # Transforma colunas de emissão em linhas (formato longo)
-        emissao_poluentes_melt = pd.melt(
-            emissao_poluentes,
-            id_vars=['iso_code', 'year'],
-            value_vars=fonte_map_emissao.keys(),
-            var_name='fonte',
-            value_name='emissao'
-        )
-        
-        # Transforma colunas de emissão cumulativa em linhas (formato longo)
-        emissao_cumulativa_melt = pd.melt(
-            emissao_poluentes,
-            id_vars=['iso_code', 'year'],
-            value_vars=fonte_map_cumulativa.keys(),
-            var_name='fonte_cumulativa',
-            value_name='emissao_cumulativa'
-        )
-        
-        # Adiciona fonte_poluente_id aos DataFrames
-        emissao_poluentes_melt['fonte_poluente_id'] = emissao_poluentes_melt['fonte'].map(fonte_map_emissao)
-        emissao_cumulativa_melt['fonte_poluente_id'] = emissao_cumulativa_melt['fonte_cumulativa'].map(fonte_map_cumulativa)
-        
-        # Une os DataFrames de emissão e emissão cumulativa
-        emissao_poluentes = emissao_poluentes_melt.merge(
-            emissao_cumulativa_melt[['iso_code', 'year', 'fonte_poluente_id', 'emissao_cumulativa']],
-            on=['iso_code', 'year', 'fonte_poluente_id'],
-            how='left'
-        )
-        
-        # Remove linhas com emissao ou emissao_cumulativa nula
-        emissao_poluentes = emissao_poluentes.dropna(subset=['emissao', 'emissao_cumulativa'])
-        
-        # Adiciona gas_id fixo (1 para CO2)
-        emissao_poluentes['gas_id'] = 1
-        
-        # Renomeia as colunas para corresponder à tabela
-        emissao_poluentes = emissao_poluentes.rename(columns={'year': 'ano'})
-        
-        # Seleciona as colunas na ordem correta
-        emissao_poluentes = emissao_poluentes[['iso_code', 'gas_id', 'fonte_poluente_id', 'ano','emissao', 'emissao_cumulativa']]
-        
-        # Salva como CSV
-        emissao_poluentes_path = os.path.join(BASE_DIR, '../dados-pre-processados/emissao_poluentes.csv')
-        emissao_poluentes.to_csv(emissao_poluentes_path, index=False, encoding='utf-8')
-        print("Arquivo emissao_poluentes.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["EmissãoPoluentes"] = emissao_poluentes_path
+        fontes_df = ler_tabela(fontes_poluente_path)
+        emissao_poluentes = montar_emissao_poluentes(co2_df, fontes_df)
+
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(emissao_poluentes, "emissao_poluentes.csv", "EmissãoPoluentes", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar emissao_poluentes.csv: {e}")
 
+# Monta o DataFrame de AtividadesEnergia a partir do energy_df
+def montar_atividades_energia(energy_df, fontes_energia_df):
+    # Mapeamento de nomes de fontes para colunas do dataset (consumo, produção, geração)
+    fonte_to_coluna = {
+        'Biofuel': ('biofuel_consumption', None, 'biofuel_electricity'),
+        'Coal': ('coal_consumption', 'coal_production', 'coal_electricity'),
+        'Gas': ('gas_consumption', 'gas_production', 'gas_electricity'),
+        'Hydro': ('hydro_consumption', None, 'hydro_electricity'),
+        'Nuclear': ('nuclear_consumption', None, 'nuclear_electricity'),
+        'Oil': ('oil_consumption', 'oil_production', 'oil_electricity'),
+        'Solar': ('solar_consumption', None, 'solar_electricity'),
+        'Wind': ('wind_consumption', None, 'wind_electricity'),
+        'Other Renewables': ('other_renewable_consumption', None, 'other_renewable_electricity')
+    }
+
+    # Só entram as fontes com coluna de consumo; produção e geração ausentes viram nulas
+    fonte_ids = fontes_energia_df.set_index('nome')['fonte_energia_id']
+    ids, consumo, producao, geracao = [], [], [], []
+    for nome, (col_consumo, col_producao, col_geracao) in fonte_to_coluna.items():
+        if col_producao and col_producao not in energy_df.columns:
+            print(f"Aviso: Coluna de produção '{col_producao}' não encontrada no dataset. Ignorando.")
+            col_producao = None
+        if col_geracao not in energy_df.columns:
+            print(f"Aviso: Coluna de geração '{col_geracao}' não encontrada no dataset. Ignorando.")
+            col_geracao = None
+        if col_consumo not in energy_df.columns:
+            print(f"Aviso: Coluna de consumo '{col_consumo}' não encontrada no dataset. Ignorando.")
+            continue
+        ids.append(fonte_ids[nome])
+        consumo.append(col_consumo)
+        producao.append(col_producao)
+        geracao.append(col_geracao)
+
+    # Verifica se há colunas válidas para prosseguir
+    if not ids:
+        raise ValueError("Nenhuma coluna de consumo válida encontrada no dataset.")
+
+    # Transforma as colunas de consumo, produção e geração em linhas (formato longo)
+    atividades_energia = energy_df.dropna(subset=['iso_code', 'year'])
+    longo = empilhar_fontes(
+        atividades_energia, ['iso_code', 'year'], 'fonte_energia_id', ids,
+        {'producao': producao, 'geracao': geracao, 'consumo': consumo}
+    )
+
+    # Remove linhas com consumo nulo (producao e geracao podem ser nulos)
+    validas = ~np.isnan(longo['consumo'])
+
+    # Seleciona as colunas na ordem correta
+    return pd.DataFrame({
+        'iso_code': longo['iso_code'][validas],
+        'fonte_energia_id': longo['fonte_energia_id'][validas],
+        'ano': longo['year'][validas],
+        'producao': longo['producao'][validas],
+        'geracao': longo['geracao'][validas],
+        'consumo': longo['consumo'][validas],
+    })
+
 # Faz o parse da tabela AtividadesEnergia
 def atividades_energia(co2_df,energy_df,fontes_energia_path,tabelas_arquivos):
     try:
-        # Carrega o dataset e o CSV de fontes de energia
-        fontes_energia_df = pd.read_csv(fontes_energia_path)
-        
-        # Mapeamento de nomes de fontes para colunas do dataset (consumo, produção, geração)
-        fonte_to_coluna = {
-            'Biofuel': ('biofuel_consumption', None, 'biofuel_electricity'),
-            'Coal': ('coal_consumption', 'coal_production', 'coal_electricity'),
-            'Gas': ('gas_consumption', 'gas_production', 'gas_electricity'),
-            'Hydro': ('hydro_consumption', None, 'hydro_electricity'),
-            'Nuclear': ('nuclear_consumption', None, 'nuclear_electricity'),
-            'Oil': ('oil_consumption', 'oil_production', 'oil_electricity'),
-            'Solar': ('solar_consumption', None, 'solar_electricity'),
-            'Wind': ('wind_consumption', None, 'wind_electricity'),
-            'Other Renewables': ('other_renewable_consumption', None, 'other_renewable_electricity')
-        }
-        
-        # Cria mapeamentos para consumo, produção e geração
-        fonte_map_consumo = {}
-        fonte_map_producao = {}
-        fonte_map_geracao = {}
-        for nome, (col_consumo, col_producao, col_geracao) in fonte_to_coluna.items():
-            if col_consumo in energy_df.columns:
-                fonte_id = fontes_energia_df[fontes_energia_df['nome'] == nome]['fonte_energia_id'].iloc[0]
-                fonte_map_consumo[col_consumo] = fonte_id
-            else:
-                print(f"Aviso: Coluna de consumo '{col_consumo}' não encontrada no dataset. Ignorando.")
-            if col_producao and col_producao in energy_df.columns:
-                fonte_id = fontes_energia_df[fontes_energia_df['nome'] == nome]['fonte_energia_id'].iloc[0]
-                fonte_map_producao[col_producao] = fonte_id
-            elif col_producao:
-                print(f"Aviso: Coluna de produção '{col_producao}' não encontrada no dataset. Ignorando.")
-            if col_geracao in energy_df.columns:
-                fonte_id = fontes_energia_df[fontes_energia_df['nome'] == nome]['fonte_energia_id'].iloc[0]
-                fonte_map_geracao[col_geracao] = fonte_id
-            else:
-                print(f"Aviso: Coluna de geração '{col_geracao}' não encontrada no dataset. Ignorando.")
-        
-        # Verifica se há colunas válidas para prosseguir
-        if not fonte_map_consumo:
-            raise ValueError("Nenhuma coluna de consumo válida encontrada no dataset.")
-        
-        # Seleciona iso_code, year e as colunas de consumo, produção e geração
-        colunas = ['iso_code', 'year'] + list(fonte_map_consumo.keys()) + list(fonte_map_producao.keys()) + list(fonte_map_geracao.keys())
-        atividades_energia = energy_df[colunas].dropna(subset=['iso_code', 'year'])
-        
-        # Transforma colunas de consumo em linhas (formato longo)
-        consumo_melt = pd.melt(
-            atividades_energia,
-            id_vars=['iso_code', 'year'],
-            value_vars=fonte_map_consumo.keys(),
-            var_name='fonte_consumo',
-            value_name='consumo'
-        )
-        
-        # Transforma colunas de produção em linhas (formato longo)
-        producao_melt = pd.melt(
-            atividades_energia,
-            id_vars=['iso_code', 'year'],
-            value_vars=fonte_map_producao.keys(),
-            var_name='fonte_producao',
-            value_name='producao'
-        ) if fonte_map_producao else pd.DataFrame(columns=['iso_code', 'year', 'fonte_producao', 'producao'])
-        
-        # Transforma colunas de geração em linhas (formato longo)
-        geracao_melt = pd.melt(
-            atividades_energia,
-            id_vars=['iso_code', 'year'],
-            value_vars=fonte_map_geracao.keys(),
-            var_name='fonte_geracao',
-            value_name='geracao'
-        )
-        
-        # Adiciona fonte_energia_id aos DataFrames
-        consumo_melt['fonte_energia_id'] = consumo_melt['fonte_consumo'].map(fonte_map_consumo)
-        producao_melt['fonte_energia_id'] = producao_melt['fonte_producao'].map(fonte_map_producao)
-        geracao_melt['fonte_energia_id'] = geracao_melt['fonte_geracao'].map(fonte_map_geracao)
-        
-        # Une os DataFrames de consumo, produção e geração
-        atividades_energia = consumo_melt.merge(
-            producao_melt[['iso_code', 'year', 'fonte_energia_id', 'producao']],
-            on=['iso_code', 'year', 'fonte_energia_id'],
-            how='left'
-        ).merge(
-            geracao_melt[['iso_code', 'year', 'fonte_energia_id', 'geracao']],
-            on=['iso_code', 'year', 'fonte_energia_id'],
-            how='left'
-        )
-        
-        # Remove linhas com consumo nulo (producao e geracao podem ser nulos)
-        atividades_energia = atividades_energia.dropna(subset=['consumo'])
-        
-        # Renomeia as colunas para corresponder à tabela
-        atividades_energia = atividades_energia.rename(columns={'year': 'ano'})
-        
-        # Seleciona as colunas na ordem correta
-        atividades_energia = atividades_energia[['iso_code', 'fonte_energia_id', 'ano', 'producao', 'geracao', 'consumo']]
-        
-        # Salva como CSV
-        atividades_energia_path = os.path.join(BASE_DIR, '../dados-pre-processados/atividades_energia.csv')
-        atividades_energia.to_csv(atividades_energia_path, index=False, encoding='utf-8')
-        print("Arquivo atividades_energia.csv gerado com sucesso!")
-        
-        # Adiciona à lista de tabelas para importação
-        tabelas_arquivos["AtividadesEnergia"] = atividades_energia_path
+        # Carrega o CSV de fontes de energia
+        fontes_energia_df = ler_tabela(fontes_energia_path)
+        atividades_energia = montar_atividades_energia(energy_df, fontes_energia_df)
+
+        # Salva CSV e adiciona à lista de tabelas para importação
+        salvar_tabela(atividades_energia, "atividades_energia.csv", "AtividadesEnergia", tabelas_arquivos)
         
     except Exception as e:
         print(f"Erro ao gerar atividades_energia.csv: {e}")
@@ -1,105 +1,218 @@
-import pandas as pd
-import psycopg2
+import argparse
 from psycopg2 import sql
 from tabulate import tabulate
 import os
 
 import parses
+import datasets
+import etapas
+import carga
+import conexao
+import blocos
+import cache_consultas
+import consultas
+import instrumentacao
+import lotes
+import manifesto
 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
-          
-# Conexão com o banco
-def conectar():
-    print("Conectando...")
-    return psycopg2.connect(
-        dbname="postgres",
-        user="postgres",
-        password="myql",
-        host="localhost",
-        port="5432"
-    )
+
+parser = argparse.ArgumentParser(description="ETL dos datasets OWID/PIP para o PostgreSQL")
+parser.add_argument("--carga-direta", action="store_true",
+                    help="importa os DataFrames direto no banco, sem passar por CSV")
+parser.add_argument("--salvar-csv", action="store_true",
+                    help="com --carga-direta, grava também os CSVs em dados-pre-processados")
+modo_carga = parser.add_mutually_exclusive_group()
+modo_carga.add_argument("--carga-paralela", action="store_true",
+                        help="cria as tabelas sem chaves, importa em várias conexões e cria as chaves depois")
+modo_carga.add_argument("--incremental", action="store_true",
+                        help="não recria as tabelas; insere ou atualiza só as linhas que mudaram")
+parser.add_argument("--conexoes", type=int, default=4,
+                    help="número de conexões usadas pela carga paralela e pelas consultas (padrão: 4)")
+parser.add_argument("--formato-copia", choices=["auto", "csv", "binario"], default="auto",
+                    help="formato do COPY; 'auto' usa o binário só nas tabelas quase todas numéricas")
+parser.add_argument("--blocos", action="store_true",
+                    help="processa os datasets OWID em partições por país, com memória limitada")
+parser.add_argument("--mb-por-particao", type=int, default=64,
+                    help="tamanho aproximado de cada partição no modo --blocos (padrão: 64)")
+parser.add_argument("--sem-manifesto", action="store_true",
+                    help="roda todas as etapas, ignorando as saídas já geradas em dados-pre-processados")
+parser.add_argument("--sem-cache", action="store_true",
+                    help="executa todas as consultas no banco, sem usar o cache de resultados")
+parser.add_argument("--cache-mb", type=int, default=cache_consultas.LIMITE_MB,
+                    help="tamanho máximo do cache de resultados das consultas (padrão: 64)")
+parser.add_argument("--todos-paises", action="store_true",
+                    help="gera também as consultas com parâmetro iso_code para cada país, em consultas/resultados/lotes")
+parser.add_argument("--modo-lote", choices=["preparado", "conjunto"], default="preparado",
+                    help="'preparado' executa um PREPARE por país; 'conjunto' responde todos numa consulta só")
+parser.add_argument("--perfil", choices=["cprofile", "tracemalloc"],
+                    help="adiciona ao relatório o perfil de CPU ou de alocações de cada etapa")
+parser.add_argument("--relatorio",
+                    help="arquivo JSON do relatório da execução (padrão: ../relatorios/execucao-<data>.json)")
+args = parser.parse_args()
+
+instrumentacao.iniciar(args.perfil)
+
+# O modo em blocos acrescenta cada partição aos CSVs, então não usa carga direta
+if args.blocos and args.carga_direta:
+    print("Aviso: --carga-direta ignorado no modo --blocos; os CSVs serão usados na importação.")
+    args.carga_direta = False
+
+parses.CARGA_DIRETA = args.carga_direta
+carga.FORMATO = args.formato_copia
+parses.SALVAR_CSV = args.salvar_csv or not args.carga_direta
+
+# O manifesto só vale quando as etapas gravam CSVs: etapas cujas entradas não
+# mudaram reaproveitam os arquivos da execução anterior
+estado = None
+if not args.sem_manifesto and not args.carga_direta and not args.blocos:
+    estado = manifesto.Manifesto()
+
+# As conexões vêm do pool compartilhado de conexao.py (configurado pelas
+# variáveis PGHOST, PGUSER, PGPASSWORD etc.)
 
 # Recria o esquema do banco
-with conectar() as conn:
+criadas = set()
+with conexao.conectar() as conn:
     print("Conectado!")
     with conn.cursor() as cursor:
         print("Com cursor")
         try:
-            #Deleta as tabelas se elas existirem
-            cursor.execute("""
-                DROP TABLE IF EXISTS "Região" CASCADE;
-                DROP TABLE IF EXISTS "Países" CASCADE;
-                DROP TABLE IF EXISTS "Gases" CASCADE;
-                DROP TABLE IF EXISTS "FontesPoluente" CASCADE;
-                DROP TABLE IF EXISTS "FontesEnergia" CASCADE;
-                DROP TABLE IF EXISTS "EmissãoPoluentes" CASCADE;
-                DROP TABLE IF EXISTS "AtividadesEnergia" CASCADE;
-                DROP TABLE IF EXISTS "MudançaTemperatura" CASCADE;
-                DROP TABLE IF EXISTS "IndicadoresEconômicos" CASCADE;
-                DROP TABLE IF EXISTS "Demografia" CASCADE;
-                DROP TABLE IF EXISTS "EmissãoComércio" CASCADE;
-                DROP TABLE IF EXISTS "EmissãoTotalGHG" CASCADE;
-                DROP TABLE IF EXISTS "TipoGases" CASCADE;
-                           """)
-            with open(os.path.join(BASE_DIR, '../modelos/ModeloFisico.sql'), 'r', encoding='utf-8') as f:
-                sql_script = f.read()
-                # Executa o script SQL
-                cursor.execute(sql_script)
-                conn.commit()
-                print("Tabelas criadas com sucesso")
+            if args.incremental:
+                # Mantém as tabelas existentes e cria apenas as que faltam
+                criadas = carga.garantir_esquema(cursor)
+            else:
+                #Deleta as tabelas se elas existirem
+                cursor.execute("""
+                    DROP TABLE IF EXISTS "Região" CASCADE;
+                    DROP TABLE IF EXISTS "Países" CASCADE;
+                    DROP TABLE IF EXISTS "Gases" CASCADE;
+                    DROP TABLE IF EXISTS "FontesPoluente" CASCADE;
+                    DROP TABLE IF EXISTS "FontesEnergia" CASCADE;
+                    DROP TABLE IF EXISTS "EmissãoPoluentes" CASCADE;
+                    DROP TABLE IF EXISTS "AtividadesEnergia" CASCADE;
+                    DROP TABLE IF EXISTS "MudançaTemperatura" CASCADE;
+                    DROP TABLE IF EXISTS "IndicadoresEconômicos" CASCADE;
+                    DROP TABLE IF EXISTS "Demografia" CASCADE;
+                    DROP TABLE IF EXISTS "EmissãoComércio" CASCADE;
+                    DROP TABLE IF EXISTS "EmissãoTotalGHG" CASCADE;
+                    DROP TABLE IF EXISTS "TipoGases" CASCADE;
+                               """)
+            # Na carga paralela as tabelas são criadas sem chaves por carga.carga_paralela
+            if not args.carga_paralela and not args.incremental:
+                with open(os.path.join(BASE_DIR, '../modelos/ModeloFisico.sql'), 'r', encoding='utf-8') as f:
+                    sql_script = f.read()
+                    # Executa o script SQL
+                    cursor.execute(sql_script)
+                    print("Tabelas criadas com sucesso")
+            conn.commit()
         except Exception as e:
             conn.rollback()
             print(f"Erro: {e}")
 
 
-# Carregar datasets
-co2_df = pd.read_csv(os.path.join(BASE_DIR, "../datasets/owid-co2-data.csv"))
-energy_df = pd.read_csv(os.path.join(BASE_DIR, "../datasets/owid-energy-data.csv"))
-pip_df = pd.read_csv(os.path.join(BASE_DIR, "../datasets/pip.csv"))
-
 # Guardar o nome e referencia dos csv gerados
 tabelas_arquivos = {}
 
-#pre-processa os dados nos dadasets
-parses.regiao(pip_df,tabelas_arquivos)
-parses.paises(co2_df,energy_df, pip_df,tabelas_arquivos)
-parses.tipo_gases(tabelas_arquivos)
-parses.fontes_poluente(tabelas_arquivos)
-parses.fontes_energia(tabelas_arquivos)
-parses.indicadores_economicos(co2_df,energy_df,tabelas_arquivos)
-parses.gases(tabelas_arquivos)
-parses.demografia(co2_df,energy_df,tabelas_arquivos)
-parses.emissao_total_ghg(co2_df,tabelas_arquivos)
-parses.emissao_comercio(co2_df,tabelas_arquivos)
-parses.emissao_poluentes(co2_df,tabelas_arquivos["FontesPoluente"],tabelas_arquivos)
-parses.atividades_energia(co2_df,energy_df,tabelas_arquivos["FontesEnergia"],tabelas_arquivos)
-
-# Importa um csv pre processado para o banco
-def importar_csv(cursor, tabela, arquivo):
-    with open(arquivo, "r", encoding="utf-8") as f:
-        cursor.copy_expert(
-            sql.SQL("COPY {} FROM STDIN WITH (FORMAT CSV, HEADER, DELIMITER ',', NULL '')").format(sql.Identifier(tabela)),
-            f
-        )
-
-# Importar dados para o banco de dados
+if args.blocos:
+    with instrumentacao.etapa("leitura:pip") as registro:
+        pip_df = datasets.carregar_dataset("pip.csv")
+        registro['linhas_saida'] = len(pip_df)
+    # Lê os datasets OWID em partições por país, sem carregá-los inteiros
+    blocos.executar_em_blocos(pip_df, tabelas_arquivos, args.mb_por_particao)
+else:
+    pendentes = [e.nome for e in etapas.ETAPAS]
+    if estado is not None:
+        pendentes = estado.desatualizadas()
+        tabelas_arquivos.update(estado.saidas_atualizadas(pendentes))
+        print(f"Etapas reaproveitadas do manifesto: {len(etapas.ETAPAS) - len(pendentes)}/{len(etapas.ETAPAS)}")
+
+    # Carregar só os datasets usados pelas etapas pendentes
+    # (cache Arrow em ../datasets/.cache, só as colunas usadas)
+    necessarios = {d for e in etapas.ETAPAS if e.nome in pendentes for d in e.datasets}
+    dataframes = {}
+    for nome in etapas.DATASETS:
+        if nome not in necessarios:
+            continue
+        with instrumentacao.etapa(f"leitura:{nome}") as registro:
+            dataframes[nome] = datasets.carregar_dataset(etapas.DATASETS[nome])
+            registro['linhas_saida'] = len(dataframes[nome])
+
+    #pre-processa os dados nos dadasets (etapas independentes rodam em paralelo)
+    if pendentes:
+        etapas.executar_etapas(dataframes, tabelas_arquivos, nomes=pendentes, manifesto=estado)
+    if estado is not None:
+        tabelas_arquivos = estado.ordenar(tabelas_arquivos)
+        estado.salvar()
+
+# Importar dados para o banco de dados. A versão dos dados só muda se algo foi
+# gravado: a carga completa recria as tabelas; a incremental pode não alterar nada
 print("Populando o Banco")
-with conectar() as conn:
-    with conn.cursor() as cursor:
-        for tabela, caminho_csv in tabelas_arquivos.items():
-            importar_csv(cursor, tabela, caminho_csv)
-        conn.commit()
+escrito = not args.incremental
+if args.carga_paralela:
+    if carga.carga_paralela(tabelas_arquivos, args.conexoes):
         print("Banco Populado com sucesso")
+        if estado is not None:
+            estado.marcar_carregadas(tabelas_arquivos)
+elif args.incremental:
+    # Tabelas cujo CSV é o mesmo da última carga não precisam ser comparadas
+    alteradas = {t: o for t, o in tabelas_arquivos.items()
+                 if estado is None or t in criadas or not estado.carregada(t)}
+    if len(alteradas) < len(tabelas_arquivos):
+        print(f"Tabelas sem alteração desde a última carga: {len(tabelas_arquivos) - len(alteradas)}")
+    with conexao.conectar(carga=True) as conn:
+        with conn.cursor() as cursor:
+            escrito = carga.carga_incremental(cursor, alteradas) > 0 or bool(criadas)
+            conn.commit()
+            print("Banco atualizado com sucesso")
+    if estado is not None:
+        estado.marcar_carregadas(alteradas)
+else:
+    with conexao.conectar(carga=True) as conn:
+        with conn.cursor() as cursor:
+            for tabela, origem in tabelas_arquivos.items():
+                carga.importar_tabela(cursor, tabela, origem)
+            conn.commit()
+            print("Banco Populado com sucesso")
+    if estado is not None:
+        estado.marcar_carregadas(tabelas_arquivos)
+if estado is not None:
+    estado.salvar()
+
+# Atualiza os agregados materializados usados pelas consultas (sem alterações
+# nas tabelas, só os que ainda não foram preenchidos)
+with conexao.conectar(carga=True) as conn:
+    with conn.cursor() as cursor:
+        try:
+            if carga.atualizar_rollups(cursor, somente_vazias=not escrito):
+                escrito = True
+            conn.commit()
+        except Exception as e:
+            conn.rollback()
+            print(f"Erro ao atualizar os agregados: {e}")
+
+# Nova versão dos dados, só depois do commit da carga e dos agregados: uma
+# consulta concorrente nunca guarda no cache um resultado antigo com a versão nova.
+# Sem nada gravado a versão é mantida e o cache das consultas continua valendo.
+with conexao.conectar() as conn:
+    with conn.cursor() as cursor:
+        versao = carga.versao_dados(cursor)
+        if escrito or versao is None:
+            versao = carga.incrementar_versao(cursor)
+            conn.commit()
+        print(f"Versão dos dados: {versao}")
 
 # Faz uma consulta simples de uma tabela no banco
 def consultar_tabela(cursor, tabela):
     # Monta a consulta SQL dinamicamente
     query = sql.SQL('SELECT * FROM public.{} ORDER BY 1 LIMIT 10;').format(sql.Identifier(tabela))
-    cursor.execute(query)
+    with instrumentacao.etapa(f"consultar_tabela:{tabela}") as registro:
+        cursor.execute(query)
     
-    # Obtém os resultados
-    rows = cursor.fetchall()
-    columns = [desc[0] for desc in cursor.description]
+        # Obtém os resultados
+        rows = cursor.fetchall()
+        columns = [desc[0] for desc in cursor.description]
+        registro['linhas_saida'] = len(rows)
    
     print("Mostrando a tabela", tabela)
     # Exibe os resultados
@@ -107,77 +220,53 @@ def consultar_tabela(cursor, tabela):
         print(tabulate(rows, headers=columns, tablefmt='psql', floatfmt=".2f"))
 
 # Mostra as tabelas inseridas no banco
-with conectar() as conn:
+with conexao.conectar() as conn:
     with conn.cursor() as cursor:
         for tabela, _ in tabelas_arquivos.items():
             consultar_tabela(cursor, tabela)
 
 # Executa e mostra as querys nao triviais em ../consultas
 # salva o resultado em ../consultas/resultados
-try:
-    with conectar() as conn: 
+# As consultas rodam em paralelo, cada uma numa conexão do pool
+# Resultados já calculados para a versão atual dos dados vêm do cache
+cache, versao = None, None
+if not args.sem_cache:
+    cache = cache_consultas.CacheConsultas(limite_mb=args.cache_mb)
+    with conexao.conectar() as conn:
+        with conn.cursor() as cursor:
+            versao = carga.versao_dados(cursor)
+resultados, tempo_total = consultas.executar_consultas(
+    consultas.carregar_consultas(), args.conexoes, cache=cache, versao=versao)
+for resultado in resultados:
+    i = resultado['nome'].removeprefix('query')
+    if resultado['erro'] is not None:
+        print(f"Erro ao executar consulta {i}: {resultado['erro']}")
+        continue
+
+    # Exibir resultado
+    print(f"\nConsulta {i}: ", end="")
+    # Exibir query{i}.txt, se existir
+    texto = consultas.descricao(resultado['nome'])
+    print(texto if texto is not None else f"\nNenhum query{i}.txt encontrado.")
+    colunas, linhas = consultas.ler_resultado(resultado)
+    print(tabulate(linhas, headers=colunas, tablefmt='psql', floatfmt=".2f"))
+    print(f"Resultado salvo em {resultado['arquivo']}")
+
+print("\nTempo das consultas:")
+print(tabulate([[r['nome'], r['total_linhas'], r['latencia_s'], 'erro' if r['erro'] else ('cache' if r['cache'] else '')]
+                for r in resultados], headers=['consulta', 'linhas', 'latência (s)', ''],
+               tablefmt='psql', floatfmt=".3f"))
+mais_lenta = max((r['latencia_s'] for r in resultados), default=0)
+print(f"Total: {tempo_total:.3f}s (consulta mais lenta: {mais_lenta:.3f}s)")
+
+# Relatórios por país: as consultas com parâmetro iso_code rodam para todos os países
+if args.todos_paises:
+    with conexao.conectar() as conn:
         with conn.cursor() as cursor:
-            # Diretórios
-            consultas_dir = os.path.join(BASE_DIR, '../consultas')
-            resultados_dir = os.path.join(BASE_DIR, '../consultas/resultados')
-            os.makedirs(resultados_dir, exist_ok=True)
-            
-            # Executar consultas dinamicamente
-            i = 1
-            while True:
-                query_file = f'{consultas_dir}/query{i}.sql'
-                txt_file = f'{consultas_dir}/query{i}.txt'
-                result_file = f'{resultados_dir}/query{i}.csv'
-                
-                # Verificar se o arquivo de consulta existe
-                if not os.path.exists(query_file):
-                    print(f"\nNenhuma query{i}.sql encontrada. Finalizando.")
-                    break
-                
-                # Ler consulta
-                try:
-                    with open(query_file, 'r', encoding='utf-8') as f:
-                        query = f.read()
-                except Exception as e:
-                    print(f"Erro ao ler {query_file}: {e}")
-                    i += 1
-                    continue
-                
-                # Executar consulta
-                try:
-                    cursor.execute(query)
-                    rows = cursor.fetchall()
-                    columns = [desc[0] for desc in cursor.description]
-                    
-                    # Exibir resultado
-                    print(f"\nConsulta {i}: ", end="")
-                    # Ler e exibir query{i}.txt, se existir
-                    if os.path.exists(txt_file):
-                        try:
-                            with open(txt_file, 'r', encoding='utf-8') as f:
-                                conteudo = f.read()
-                            print(conteudo)
-                        except Exception as e:
-                            print(f"Erro ao ler {txt_file}: {e}")
-                    else:
-                        print(f"\nNenhum {txt_file} encontrado.")
-                    
-                    print(tabulate(rows, headers=columns, tablefmt='psql', floatfmt=".2f"))
-                    
-                    # Salvar como CSV
-                    df = pd.DataFrame(rows, columns=columns)
-                    df.to_csv(result_file, index=False, encoding='utf-8')
-                    print(f"Resultado salvo em {result_file}")
-                    
-                    # Commit para evitar transação abortada
-                    conn.commit()
-                    
-                except Exception as e:
-                    print(f"Erro ao executar consulta {i}: {e}")
-                    # Rollback para limpar o erro
-                    conn.rollback()
-                
-                i += 1
-                
-except Exception as e:
-    print(f"Erro geral: {e}")
+            cursor.execute('SELECT iso_code FROM public."Países" ORDER BY iso_code')
+            lote = [{'iso_code': linha[0]} for linha in cursor.fetchall()]
+    por_pais = [c for c in consultas.carregar_consultas() if 'iso_code' in c[2]]
+    lotes.executar_lotes(por_pais, lote, args.modo_lote)
+
+# Relatório estruturado com as medições de cada etapa
+instrumentacao.salvar_relatorio(args.relatorio, argumentos=vars(args))
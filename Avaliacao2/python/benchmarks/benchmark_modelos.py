@@ -0,0 +1,109 @@
+import argparse
+import math
+import os
+import statistics
+import sys
+import time
+
+import bson
+import pandas as pd
+import pymongo
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import documentos
+import pipelines
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+DADOS_DIR = os.path.join(BASE_DIR, "../../dados-pre-processados")
+
+# Documentos embutidos a partir dos CSVs gerados por create_and_populate_mongodb.py,
+# sem precisar do PostgreSQL
+def ler_documentos(dados_dir):
+    ler = lambda nome: pd.read_csv(os.path.join(dados_dir, nome), keep_default_na=False, na_values=[""])
+    return documentos.montar_documentos(ler("regiao.csv"), ler("paises.csv"), ler("emissao_poluentes.csv"),
+                                        ler("atividades_energia.csv"), ler("indicadores_economicos.csv"))
+
+# Carrega a coleção de um modelo e mede o tempo e o espaço ocupado
+def carregar(db, modelo, documentos_paises):
+    partes = documentos.converter(documentos_paises, modelo)
+    inicio = time.perf_counter()
+    colecao = documentos.preparar_colecao(db, modelo)
+    colecao.insert_many(partes, ordered=False)
+    carga_s = time.perf_counter() - inicio
+    estatisticas = db.command("collStats", colecao.name)
+    return colecao, {
+        'documentos': len(partes),
+        'carga_s': carga_s,
+        'maior_documento_kb': max(len(bson.encode(parte)) for parte in partes) / 1024,
+        'dados_mb': estatisticas.get('size', 0) / 2**20,
+        'armazenamento_mb': estatisticas.get('storageSize', 0) / 2**20,
+        'indices_mb': estatisticas.get('totalIndexSize', 0) / 2**20,
+    }
+
+# Resultado comparável entre modelos (floats arredondados, NaN como texto)
+def normalizar(resultado):
+    return [{k: ('nan' if math.isnan(v) else round(v, 6)) if isinstance(v, float) else v
+             for k, v in linha.items()} for linha in resultado]
+
+# Mediana da latência de cada consulta do modelo, em ms, e o resultado dela
+def consultar(colecao, modelo, repeticoes):
+    medidas = {}
+    for nome, pipeline in pipelines.PIPELINES[modelo].items():
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultado = list(colecao.aggregate(pipeline))
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        medidas[nome] = {'latencia_ms': statistics.median(tempos), 'resultado': normalizar(resultado)}
+    return medidas
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara os modelos de armazenamento da coleção de países")
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/", help="URI do MongoDB")
+    parser.add_argument("--banco", default="ods13_benchmark", help="banco usado no benchmark (é apagado ao fim)")
+    parser.add_argument("--dados", default=DADOS_DIR, help="diretório com os CSVs pré-processados")
+    parser.add_argument("--modelos", nargs='+', choices=documentos.MODELOS, default=list(documentos.MODELOS))
+    parser.add_argument("--repeticoes", type=int, default=5, help="execuções por consulta (usa a mediana)")
+    parser.add_argument("--manter", action="store_true", help="não apaga o banco do benchmark ao fim")
+    args = parser.parse_args()
+
+    documentos_paises = ler_documentos(args.dados)
+    client = pymongo.MongoClient(args.mongo)
+    db = client[args.banco]
+    carga = {}
+    consultas = {}
+    try:
+        for modelo in args.modelos:
+            colecao, carga[modelo] = carregar(db, modelo, documentos_paises)
+            consultas[modelo] = consultar(colecao, modelo, args.repeticoes)
+    finally:
+        if not args.manter:
+            client.drop_database(args.banco)
+        client.close()
+
+    print("\nCarga e armazenamento:")
+    print(tabulate([[modelo, c['documentos'], c['carga_s'], c['maior_documento_kb'], c['dados_mb'],
+                     c['armazenamento_mb'], c['indices_mb']] for modelo, c in carga.items()],
+                   headers=['modelo', 'documentos', 'carga (s)', 'maior doc (KiB)', 'dados (MiB)',
+                            'armazenamento (MiB)', 'índices (MiB)'], tablefmt='psql', floatfmt=".2f"))
+    if "serie" in carga:
+        print("Obs.: com uma medição por ano, cada bucket da time-series guarda uma só medição por país; "
+              "o armazenamento de serie não reflete a compressão que a time-series teria com dados mais densos")
+
+    # Latência por consulta; o resultado de cada modelo é conferido com o do
+    # primeiro modelo da lista
+    referencia = args.modelos[0]
+    linhas = []
+    for nome in pipelines.TITULOS:
+        linha = [nome]
+        for modelo in args.modelos:
+            medida = consultas[modelo][nome]
+            igual = medida['resultado'] == consultas[referencia][nome]['resultado']
+            linha.append(f"{medida['latencia_ms']:.2f}" + ("" if igual else " (difere)"))
+        linhas.append(linha)
+    print(f"\nLatência mediana das consultas em ms ({args.repeticoes} execuções):")
+    print(tabulate(linhas, headers=['consulta'] + args.modelos, tablefmt='psql'))
+
+if __name__ == "__main__":
+    main()
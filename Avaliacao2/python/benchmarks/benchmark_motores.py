@@ -0,0 +1,354 @@
+import argparse
+import datetime
+import json
+import math
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+import psycopg2
+import pymongo
+from tabulate import tabulate
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+AVALIACAO1_DIR = os.path.join(BENCH_DIR, "../../../Avaliacao1/python")
+sys.path.insert(0, os.path.join(AVALIACAO1_DIR, "benchmarks"))
+sys.path.insert(0, AVALIACAO1_DIR)
+sys.path.insert(0, os.path.join(BENCH_DIR, '..'))
+import benchmark_etl
+import carga
+import consultas
+import consultas_mongodb
+import datasets
+import documentos
+import etapas
+import parses
+import pipelines
+import rollups
+from gerar_dados import gerar
+from instrumentacao import pico_rss, zerar_pico_rss
+
+# As consultas SQL devolvem todas as linhas; as pipelines do MongoDB param no
+# $limit. Os resultados são comparados só até esse limite.
+LIMITES = {"query2": 5, "query3": 10, "query5": 5}
+
+# Tabelas do modelo físico geradas pelo ETL da Avaliacao1 a partir de datasets
+# sintéticos na escala pedida (ou dos datasets reais, com escala None). Os
+# nomes das colunas são os do modelo, que todos os motores usam.
+def preparar_tabelas(escala, dados_dir, processos):
+    if escala is None:
+        destino = datasets.DATASETS_DIR
+    else:
+        destino = os.path.join(dados_dir, f"escala-{escala:g}")
+        if not all(os.path.exists(os.path.join(destino, nome)) for nome in benchmark_etl.DATASETS):
+            gerar(escala, destino)
+        datasets.DATASETS_DIR = destino
+        datasets.CACHE_DIR = os.path.join(destino, ".cache")
+    parses.DADOS_DIR = os.path.join(dados_dir, "dados-pre-processados")
+    os.makedirs(parses.DADOS_DIR, exist_ok=True)
+
+    for nome in benchmark_etl.DATASETS:
+        datasets.converter_dataset(nome)
+    dfs = {chave: datasets.carregar_dataset(nome) for chave, nome in etapas.DATASETS.items()}
+    anteriores = parses.CARGA_DIRETA, parses.SALVAR_CSV
+    parses.CARGA_DIRETA, parses.SALVAR_CSV = True, False
+    try:
+        tabelas = {}
+        etapas.executar_etapas(dfs, tabelas, processos, exibir=False)
+    finally:
+        parses.CARGA_DIRETA, parses.SALVAR_CSV = anteriores
+
+    modelo = carga.ler_modelo()
+    return {tabela: df.set_axis([coluna for coluna, _ in modelo[tabela]['colunas']], axis=1)
+            for tabela, df in tabelas.items()}
+
+def _rss_atual():
+    with open("/proc/self/status", "r", encoding="utf-8") as f:
+        for linha in f:
+            if linha.startswith("VmRSS:"):
+                return int(linha.split()[1]) / 1024
+    return 0.0
+
+# PostgreSQL: o mesmo caminho do benchmark do ETL (COPY + visões materializadas)
+# e as consultas de Avaliacao1/consultas com os parâmetros padrão
+class MotorPostgres:
+    nome = "postgresql"
+
+    def __init__(self, dsn):
+        self.conn = psycopg2.connect(dsn)
+        self.consultas = {nome: (sql, parametros) for nome, sql, parametros in consultas.carregar_consultas()}
+
+    def carregar(self, tabelas):
+        benchmark_etl.copiar(self.conn, tabelas)
+
+    def executar(self, nome):
+        consulta, parametros = self.consultas[nome]
+        with self.conn.cursor() as cursor:
+            cursor.execute(consulta, parametros or None)
+            colunas = [d[0] for d in cursor.description]
+            linhas = cursor.fetchall()
+        self.conn.commit()
+        return pd.DataFrame(linhas, columns=colunas)
+
+    # Tabelas, visões materializadas e seus índices
+    def armazenamento_mb(self):
+        with self.conn.cursor() as cursor:
+            cursor.execute("SELECT COALESCE(SUM(pg_total_relation_size(c.oid)), 0) FROM pg_class c "
+                           "JOIN pg_namespace n ON n.oid = c.relnamespace "
+                           "WHERE n.nspname = 'public' AND c.relkind IN ('r', 'm')")
+            return cursor.fetchone()[0] / 2**20
+
+    # Memória da sessão do servidor (PostgreSQL 14+)
+    def memoria_mb(self):
+        try:
+            with self.conn.cursor() as cursor:
+                cursor.execute("SELECT SUM(total_bytes) FROM pg_backend_memory_contexts")
+                return float(cursor.fetchone()[0]) / 2**20, "contextos de memória da sessão"
+        except psycopg2.Error:
+            self.conn.rollback()
+            return float('nan'), "indisponível"
+
+    def fechar(self):
+        self.conn.close()
+
+# MongoDB: documentos montados das mesmas tabelas, como em
+# create_and_populate_mongodb.py, no modelo escolhido (com --com-rollups, também
+# os rollups)
+class MotorMongo:
+    nome = "mongodb"
+
+    def __init__(self, uri, banco, modelo, usar_rollups):
+        self.client = pymongo.MongoClient(uri, serverSelectionTimeoutMS=5000)
+        self.client.admin.command("ping")
+        self.banco = banco
+        self.db = self.client[banco]
+        self.modelo = modelo
+        self.usar_rollups = usar_rollups
+        self.consultas = {}
+
+    def carregar(self, tabelas):
+        emissoes = tabelas["EmissãoPoluentes"].merge(
+            tabelas["FontesPoluente"].rename(columns={"nome": "fonte_poluente"}), on="fonte_poluente_id")
+        energia = tabelas["AtividadesEnergia"].merge(
+            tabelas["FontesEnergia"].rename(columns={"nome": "fonte_energia"}), on="fonte_energia_id")
+        documentos_paises = documentos.montar_documentos(
+            tabelas["Região"][["regiao_code", "nome"]], tabelas["Países"][["iso_code", "nome", "regiao_code"]],
+            emissoes[["iso_code", "ano", "emissao", "fonte_poluente_id", "fonte_poluente"]],
+            energia[["iso_code", "ano", "consumo", "fonte_energia_id", "fonte_energia"]],
+            tabelas["IndicadoresEconômicos"])
+
+        self.client.drop_database(self.banco)
+        colecao = documentos.preparar_colecao(self.db, self.modelo)
+        colecao.insert_many(documentos.converter(documentos_paises, self.modelo), ordered=False)
+        if self.usar_rollups:
+            rollups.atualizar(self.db, self.modelo)
+        self.consultas = {consulta['nome']: consulta
+                          for consulta in consultas_mongodb.montar_consultas(self.modelo, self.usar_rollups)}
+
+    def executar(self, nome):
+        return pd.DataFrame(consultas_mongodb.executar(self.db, self.consultas[nome]))
+
+    def armazenamento_mb(self):
+        estatisticas = self.db.command("dbStats")
+        return (estatisticas.get('storageSize', 0) + estatisticas.get('indexSize', 0)) / 2**20
+
+    # Memória residente do servidor inteiro (inclui o cache do WiredTiger)
+    def memoria_mb(self):
+        return float(self.db.command("serverStatus")["mem"]["resident"]), "residente do mongod"
+
+    def fechar(self):
+        self.client.drop_database(self.banco)
+        self.client.close()
+
+# Banco embutido (SQLite, no próprio processo): tabelas do modelo físico, as
+# visões materializadas de Rollups.sql como tabelas e as mesmas consultas SQL
+class MotorSQLite:
+    nome = "sqlite"
+
+    def __init__(self, diretorio):
+        self.caminho = os.path.join(diretorio, "benchmark.sqlite")
+        self.conn = None
+        self.memoria = 0.0
+        self.consultas = {nome: (self._traduzir(sql), parametros)
+                          for nome, sql, parametros in consultas.carregar_consultas()}
+
+    # Sem esquema public e com parâmetros nomeados no formato :nome
+    @staticmethod
+    def _traduzir(texto):
+        return re.sub(r'%\((\w+)\)s', r':\1', texto.replace('public.', ''))
+
+    def carregar(self, tabelas):
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+        self.conn = sqlite3.connect(self.caminho)
+        for tabela, definicao in carga.ler_modelo().items():
+            colunas = [f'{coluna} {tipo}' for coluna, tipo in definicao['colunas']]
+            self.conn.execute(f'CREATE TABLE "{tabela}" ({", ".join(colunas)}, '
+                              f'PRIMARY KEY ({", ".join(definicao["pk"])}))')
+        for tabela, df in tabelas.items():
+            marcadores = ", ".join("?" * df.shape[1])
+            linhas = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+            self.conn.executemany(f'INSERT INTO "{tabela}" VALUES ({marcadores})', linhas)
+
+        with open(carga.ROLLUPS, 'r', encoding='utf-8') as f:
+            rollups_sql = self._traduzir(f.read())
+        rollups_sql = rollups_sql.replace('CREATE MATERIALIZED VIEW', 'CREATE TABLE').replace('WITH NO DATA', '')
+        self.conn.executescript(rollups_sql)
+        self.conn.execute("ANALYZE")
+        self.conn.commit()
+
+    def executar(self, nome):
+        consulta, parametros = self.consultas[nome]
+        cursor = self.conn.execute(consulta, parametros or {})
+        return pd.DataFrame(cursor.fetchall(), columns=[d[0] for d in cursor.description])
+
+    def armazenamento_mb(self):
+        return os.path.getsize(self.caminho) / 2**20
+
+    # Pico de RSS do processo acima do que já estava em uso, medido durante as
+    # consultas (o banco roda dentro do processo)
+    def memoria_mb(self):
+        return self.memoria, "pico de RSS do processo nas consultas"
+
+    def fechar(self):
+        if self.conn is not None:
+            self.conn.close()
+        if os.path.exists(self.caminho):
+            os.remove(self.caminho)
+
+# Resultado comparável entre motores: colunas em ordem alfabética, só as
+# linhas que todos devolvem e floats arredondados
+def normalizar(nome, df):
+    df = df.head(LIMITES[nome]) if nome in LIMITES else df
+    return [tuple(round(v, 6) if isinstance(v, float) and not math.isnan(v) else v
+                  for v in linha) for linha in df[sorted(df.columns)].itertuples(index=False, name=None)]
+
+# Aquecimento e repetições de cada consulta; latências em ms
+def consultar(motor, aquecimento, repeticoes):
+    medidas = {}
+    base = _rss_atual()
+    zerar_pico_rss()
+    for nome in pipelines.TITULOS:
+        for _ in range(aquecimento):
+            motor.executar(nome)
+        tempos = []
+        for _ in range(repeticoes):
+            inicio = time.perf_counter()
+            resultado = motor.executar(nome)
+            tempos.append((time.perf_counter() - inicio) * 1000)
+        medidas[nome] = {'p50_ms': float(np.percentile(tempos, 50)), 'p95_ms': float(np.percentile(tempos, 95)),
+                         'linhas': len(resultado), 'resultado': normalizar(nome, resultado)}
+    motor.memoria = max(pico_rss() - base, 0.0)
+    return medidas
+
+# Carrega as tabelas num motor, mede a carga, o armazenamento, a memória e as
+# consultas
+def executar_motor(motor, tabelas, aquecimento, repeticoes):
+    print(f"  {motor.nome}: carregando...")
+    inicio = time.perf_counter()
+    motor.carregar(tabelas)
+    carga_s = time.perf_counter() - inicio
+    medidas = consultar(motor, aquecimento, repeticoes)
+    memoria, medida_memoria = motor.memoria_mb()
+    return {'carga_s': carga_s, 'armazenamento_mb': motor.armazenamento_mb(), 'memoria_mb': memoria,
+            'medida_memoria': medida_memoria, 'consultas': medidas}
+
+def executar_escala(escala, args):
+    print(f"\nEscala {'real' if escala is None else f'{escala:g}x'}")
+    tabelas = preparar_tabelas(escala, args.dados, args.processos)
+    linhas_fatos = sum(len(tabelas[t]) for t in ("EmissãoPoluentes", "AtividadesEnergia"))
+
+    motores = []
+    if args.dsn:
+        motores.append(lambda: MotorPostgres(args.dsn))
+    if not args.sem_mongo:
+        motores.append(lambda: MotorMongo(args.mongo, args.banco, args.modelo, args.com_rollups))
+    if not args.sem_sqlite:
+        motores.append(lambda: MotorSQLite(args.dados))
+
+    resultados = {}
+    for criar in motores:
+        try:
+            motor = criar()
+        except (psycopg2.Error, pymongo.errors.PyMongoError) as e:
+            print(f"  Motor ignorado: {e}")
+            continue
+        try:
+            resultados[motor.nome] = executar_motor(motor, tabelas, args.aquecimento, args.repeticoes)
+        finally:
+            motor.fechar()
+    return {'escala': escala, 'linhas_fatos': linhas_fatos, 'motores': resultados}
+
+def exibir(relatorio, repeticoes):
+    motores = list(relatorio['motores'])
+    if not motores:
+        print("Nenhum motor disponível")
+        return
+    print(f"\nCarga, armazenamento e memória ({relatorio['linhas_fatos']} linhas de fatos):")
+    print(tabulate([[nome, m['carga_s'], m['armazenamento_mb'], m['memoria_mb'], m['medida_memoria']]
+                    for nome, m in relatorio['motores'].items()],
+                   headers=['motor', 'carga (s)', 'armazenamento (MiB)', 'memória (MiB)', 'medida de memória'],
+                   tablefmt='psql', floatfmt=".2f"))
+
+    # Latência p50/p95 de cada consulta; o resultado de cada motor é conferido
+    # com o do primeiro
+    referencia = relatorio['motores'][motores[0]]['consultas']
+    linhas = []
+    for nome in pipelines.TITULOS:
+        linha = [nome]
+        for motor in motores:
+            medida = relatorio['motores'][motor]['consultas'][nome]
+            igual = medida['resultado'] == referencia[nome]['resultado']
+            linha.append(f"{medida['p50_ms']:.2f} / {medida['p95_ms']:.2f}" + ("" if igual else " (difere)"))
+        linhas.append(linha)
+    print(f"\nLatência das consultas em ms, p50 / p95 ({repeticoes} execuções):")
+    print(tabulate(linhas, headers=['consulta'] + motores, tablefmt='psql'))
+
+def main():
+    parser = argparse.ArgumentParser(description="Compara PostgreSQL, MongoDB e um banco embutido (SQLite) "
+                                                 "nas cinco consultas, com os mesmos dados")
+    parser.add_argument("--escalas", nargs='+', default=["1"],
+                        help="escalas dos dados sintéticos; 'real' usa os datasets de Avaliacao1 (padrão: 1)")
+    parser.add_argument("--dados", default=os.path.join(tempfile.gettempdir(), "benchmark_motores"),
+                        help="diretório para os dados gerados e o arquivo do SQLite")
+    parser.add_argument("--processos", type=int, default=None, help="processos do ETL")
+    parser.add_argument("--dsn", help="DSN do PostgreSQL; sem ele o PostgreSQL fica de fora "
+                                      "(ATENÇÃO: recria as tabelas do esquema public)")
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/", help="URI do MongoDB")
+    parser.add_argument("--banco", default="ods13_benchmark", help="banco do MongoDB (é apagado ao fim)")
+    parser.add_argument("--modelo", choices=documentos.MODELOS, default="embutido",
+                        help="modelo de armazenamento no MongoDB (padrão: embutido)")
+    parser.add_argument("--com-rollups", action="store_true",
+                        help="responde as consultas 2, 4 e 5 pelas coleções de rollup no MongoDB")
+    parser.add_argument("--sem-mongo", action="store_true", help="deixa o MongoDB de fora")
+    parser.add_argument("--sem-sqlite", action="store_true", help="deixa o SQLite de fora")
+    parser.add_argument("--aquecimento", type=int, default=1, help="execuções descartadas por consulta")
+    parser.add_argument("--repeticoes", type=int, default=10, help="execuções medidas por consulta")
+    parser.add_argument("--saida", help="arquivo JSON para salvar o relatório")
+    args = parser.parse_args()
+
+    os.makedirs(args.dados, exist_ok=True)
+    relatorios = []
+    for escala in args.escalas:
+        relatorio = executar_escala(None if escala == "real" else float(escala), args)
+        exibir(relatorio, args.repeticoes)
+        relatorios.append(relatorio)
+
+    if args.saida:
+        for relatorio in relatorios:
+            for medidas in relatorio['motores'].values():
+                for medida in medidas['consultas'].values():
+                    del medida['resultado']
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump({'data': datetime.datetime.now().isoformat(timespec='seconds'),
+                       'aquecimento': args.aquecimento, 'repeticoes': args.repeticoes,
+                       'escalas': relatorios}, f, indent=2, ensure_ascii=False)
+        print(f"\nRelatório salvo em {args.saida}")
+
+if __name__ == "__main__":
+    main()
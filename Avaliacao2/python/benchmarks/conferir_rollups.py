@@ -0,0 +1,117 @@
+import argparse
+import copy
+import os
+import sys
+
+import pymongo
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import benchmark_modelos
+import consultas_mongodb
+import documentos
+import pipelines
+import rollups
+
+# Resultado de uma consulta respondida pelos rollups e da mesma consulta
+# pelas agregações sobre os arrays (o padrão de consultas_mongodb.py)
+def comparar(db, modelo, etapa):
+    linhas = []
+    for nome, busca in pipelines.BUSCAS.items():
+        com = benchmark_modelos.normalizar(consultas_mongodb.executar(db, {'nome': nome, **busca}))
+        sem = benchmark_modelos.normalizar(list(db[documentos.COLECOES[modelo]].aggregate(
+            pipelines.PIPELINES[modelo][nome])))
+        if com == sem:
+            situacao = "igual"
+        elif sorted(map(sorted, (l.items() for l in com))) == sorted(map(sorted, (l.items() for l in sem))):
+            situacao = "mesmas linhas, outra ordem"
+        else:
+            situacao = "DIFERE"
+        linhas.append([modelo, etapa, nome, len(com), len(sem), situacao])
+    return linhas
+
+# Conteúdo das duas coleções de rollup, comparável entre execuções
+def conteudo(db):
+    return {colecao: benchmark_modelos.normalizar(list(db[colecao].find().sort("_id", 1)))
+            for colecao in rollups.INDICES}
+
+# Países alterados no teste incremental: por padrão, os três que mais
+# emitiram em 2020, para mexer no topo das consultas 2 e 5
+def escolher_paises(db, paises):
+    if paises:
+        return paises
+    maiores = db[rollups.PAISES_ANO].find({"ano": 2020}, {"iso_code": 1}).sort("total_emissao", -1).limit(3)
+    return [documento["iso_code"] for documento in maiores]
+
+# Altera os países na coleção do modelo: as emissões de 2020 caem pela
+# metade e o primeiro país passa para outra região
+def alterar_paises(db, modelo, documentos_paises, paises):
+    alterados = [copy.deepcopy(d) for d in documentos_paises if d["_id"] in paises]
+    regioes = {d["regiao"]["nome"]: d["regiao"] for d in documentos_paises}
+    for documento in alterados:
+        for emissao in documento["emissoes"]:
+            if emissao["ano"] == 2020:
+                emissao["emissao"] /= 2
+    if alterados:
+        outras = [r for nome, r in regioes.items() if nome != alterados[0]["regiao"]["nome"]]
+        if outras:
+            alterados[0]["regiao"] = outras[0]
+
+    colecao = db[documentos.COLECOES[modelo]]
+    colecao.delete_many({documentos.CAMPO_PAIS[modelo]: {"$in": paises}})
+    partes = documentos.converter(alterados, modelo)
+    if partes:
+        colecao.insert_many(partes, ordered=False)
+
+def conferir(db, modelo, documentos_paises, paises):
+    colecao = documentos.preparar_colecao(db, modelo)
+    colecao.insert_many(documentos.converter(documentos_paises, modelo), ordered=False)
+    rollups.atualizar(db, modelo)
+    linhas = comparar(db, modelo, "recriação")
+
+    paises = escolher_paises(db, paises)
+    alterar_paises(db, modelo, documentos_paises, paises)
+    rollups.atualizar(db, modelo, paises)
+    linhas += comparar(db, modelo, f"--paises {' '.join(paises)}")
+
+    # A atualização incremental tem de chegar ao mesmo conteúdo da recriação
+    incremental = conteudo(db)
+    rollups.atualizar(db, modelo)
+    for colecao, documentos_rollup in conteudo(db).items():
+        situacao = "igual" if documentos_rollup == incremental[colecao] else "DIFERE"
+        linhas.append([modelo, "incremental x recriação", colecao, len(incremental[colecao]),
+                       len(documentos_rollup), situacao])
+    return linhas
+
+def main():
+    parser = argparse.ArgumentParser(description="Confere as coleções de rollup contra as agregações "
+                                                 "sobre os arrays, na recriação e na atualização por país")
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/", help="URI do MongoDB (5.0+)")
+    parser.add_argument("--banco", default="ods13_benchmark", help="banco usado na conferência (é apagado ao fim)")
+    parser.add_argument("--dados", default=benchmark_modelos.DADOS_DIR, help="diretório com os CSVs pré-processados")
+    parser.add_argument("--modelos", nargs='+', choices=documentos.MODELOS, default=list(documentos.MODELOS))
+    parser.add_argument("--paises", nargs='+', help="países alterados no teste incremental "
+                                                    "(padrão: os três que mais emitiram em 2020)")
+    parser.add_argument("--manter", action="store_true", help="não apaga o banco da conferência ao fim")
+    args = parser.parse_args()
+
+    documentos_paises = benchmark_modelos.ler_documentos(args.dados)
+    client = pymongo.MongoClient(args.mongo)
+    db = client[args.banco]
+    linhas = []
+    try:
+        for modelo in args.modelos:
+            client.drop_database(args.banco)
+            linhas += conferir(db, modelo, documentos_paises, args.paises)
+    finally:
+        if not args.manter:
+            client.drop_database(args.banco)
+        client.close()
+
+    print(tabulate(linhas, headers=['modelo', 'etapa', 'consulta', 'linhas rollup', 'linhas agregação',
+                                    'resultado'], tablefmt='psql'))
+    if any(linha[-1] == "DIFERE" for linha in linhas):
+        sys.exit(1)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,81 @@
+import argparse
+import json
+import os
+import sys
+
+import pymongo
+from tabulate import tabulate
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+import benchmark_modelos
+import consultas_mongodb
+import documentos
+import pipelines
+
+EMBUTIDO = pipelines.EMBUTIDO
+
+# Pipelines do modelo embutido antes dos índices e do $filter: $unwind dos
+# arrays de todos os países e só depois o $match no ano (o restante é igual)
+ANTES = {
+    "query1": [{"$match": {"_id": "BRA"}}, {"$unwind": "$emissoes"},
+               {"$match": {"emissoes.ano": {"$gte": 2000, "$lte": 2020}}}] + EMBUTIDO["query1"][3:],
+    "query2": [{"$unwind": "$emissoes"}, {"$match": {"emissoes.ano": 2020}}] + EMBUTIDO["query2"][3:],
+    "query3": [{"$unwind": "$energia"}, {"$match": {"energia.ano": 2020}}] + EMBUTIDO["query3"][3:],
+    "query4": [{"$unwind": "$emissoes"}, {"$match": {"emissoes.ano": 2020}}] + EMBUTIDO["query4"][3:],
+    "query5": [{"$unwind": "$emissoes"}, {"$match": {"emissoes.ano": {"$in": [2010, 2020]}}}] + EMBUTIDO["query5"][3:],
+}
+
+# Explica cada consulta e confere o resultado
+def medir(db, colecao, consultas):
+    medidas = {}
+    for nome, pipeline in consultas.items():
+        consulta = {'nome': nome, 'colecao': colecao.name, 'pipeline': pipeline}
+        medidas[nome] = consultas_mongodb.resumir(consultas_mongodb.explicar(db, consulta))
+        medidas[nome]['resultado'] = benchmark_modelos.normalizar(list(colecao.aggregate(pipeline)))
+    return medidas
+
+def main():
+    parser = argparse.ArgumentParser(description="Explain das consultas do modelo embutido antes e depois "
+                                                 "dos índices multikey e do $filter")
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/", help="URI do MongoDB")
+    parser.add_argument("--banco", default="ods13_benchmark", help="banco usado no relatório (é apagado ao fim)")
+    parser.add_argument("--dados", default=benchmark_modelos.DADOS_DIR, help="diretório com os CSVs pré-processados")
+    parser.add_argument("--saida", help="arquivo JSON para salvar o relatório")
+    parser.add_argument("--manter", action="store_true", help="não apaga o banco do relatório ao fim")
+    args = parser.parse_args()
+
+    documentos_paises = benchmark_modelos.ler_documentos(args.dados)
+    client = pymongo.MongoClient(args.mongo)
+    db = client[args.banco]
+    try:
+        db.drop_collection(documentos.COLECOES["embutido"])
+        colecao = db.create_collection(documentos.COLECOES["embutido"])
+        colecao.insert_many(documentos_paises)
+        antes = medir(db, colecao, ANTES)
+        documentos.criar_indices(colecao, "embutido")
+        depois = medir(db, colecao, pipelines.EMBUTIDO)
+    finally:
+        if not args.manter:
+            client.drop_database(args.banco)
+        client.close()
+
+    linhas = []
+    for nome in pipelines.TITULOS:
+        a, d = antes[nome], depois[nome]
+        linhas.append([nome, a['documentos_examinados'], d['documentos_examinados'], a['chaves_examinadas'],
+                       d['chaves_examinadas'], a['tempo_ms'], d['tempo_ms'], ', '.join(a['varreduras']),
+                       ', '.join(d['varreduras']), "sim" if a['resultado'] == d['resultado'] else "NÃO"])
+    print(tabulate(linhas, headers=['consulta', 'docs antes', 'docs depois', 'chaves antes', 'chaves depois',
+                                    'ms antes', 'ms depois', 'varredura antes', 'varredura depois',
+                                    'mesmo resultado'], tablefmt='psql'))
+
+    if args.saida:
+        relatorio = {nome: {'antes': {k: v for k, v in antes[nome].items() if k != 'resultado'},
+                            'depois': {k: v for k, v in depois[nome].items() if k != 'resultado'}}
+                     for nome in pipelines.TITULOS}
+        with open(args.saida, 'w', encoding='utf-8') as f:
+            json.dump(relatorio, f, indent=2)
+        print(f"Relatório salvo em {args.saida}")
+
+if __name__ == "__main__":
+    main()
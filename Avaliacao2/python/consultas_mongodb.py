@@ -1,154 +1,211 @@
+import argparse
+import os
+import re
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import bson
+import numpy as np
 import pymongo
 from tabulate import tabulate
 import pandas as pd
 
-client = pymongo.MongoClient("mongodb://localhost:27017/")
-db = client["ods13_db"]
-
-# Consulta 1: Tendência de Emissões por Fonte Poluente no Brasil (2000–2020)
-query1 = [
-    {"$match": {"_id": "BRA"}},
-    {"$unwind": "$emissoes"},
-    {"$match": {"emissoes.ano": {"$gte": 2000, "$lte": 2020}}},
-    {
-        "$group": {
-            "_id": {"ano": "$emissoes.ano", "fonte_poluente": "$emissoes.fonte_poluente"},
-            "total_emissao": {"$sum": "$emissoes.emissao"}
-        }
-    },
-    {"$sort": {"_id.ano": 1, "_id.fonte_poluente": 1}},
-    {"$project": {"ano": "$_id.ano", "fonte_poluente": "$_id.fonte_poluente", "total_emissao": 1, "_id": 0}}
-]
-print("\nConsulta 1: Tendência de Emissões por Fonte Poluente no Brasil (2000–2020)")
-result1 = list(db.paises.aggregate(query1))
-print(tabulate(result1, headers="keys", tablefmt="psql", floatfmt=".2f"))
-pd.DataFrame(result1).to_csv("../consultas/resultados/query1.txt", index=False)
-
-# Consulta 2: Top 5 Países por Emissões Totais em 2020
-query2 = [
-    {"$unwind": "$emissoes"},
-    {"$match": {"emissoes.ano": 2020}},
-    {
-        "$group": {
-            "_id": "$nome",
-            "total_emissao": {"$sum": "$emissoes.emissao"}
-        }
-    },
-    {"$sort": {"total_emissao": -1}},
-    {"$limit": 5},
-    {"$project": {"pais": "$_id", "total_emissao": 1, "_id": 0}}
-]
-print("\nConsulta 2: Top 5 Países por Emissões Totais em 2020")
-result2 = list(db.paises.aggregate(query2))
-print(tabulate(result2, headers="keys", tablefmt="psql", floatfmt=".2f"))
-pd.DataFrame(result2).to_csv("../consultas/resultados/query2.txt", index=False)
-
-# Consulta 3: Consumo de Energia Renovável vs. Não Renovável em 2020
-query3 = [
-    {"$unwind": "$energia"},
-    {"$match": {"energia.ano": 2020}},
-    {
-        "$group": {
-            "_id": "$nome",
-            "consumo_renovavel": {
-                "$sum": {
-                    "$cond": [
-                        {"$in": ["$energia.fonte_energia", ["Hydro", "Solar", "Wind", "Biofuel"]]},
-                        "$energia.consumo",
-                        0
-                    ]
-                }
-            },
-            "consumo_nao_renovavel": {
-                "$sum": {
-                    "$cond": [
-                        {"$in": ["$energia.fonte_energia", ["Coal", "Oil", "Gas"]]},
-                        "$energia.consumo",
-                        0
-                    ]
-                }
-            }
-        }
-    },
-    {"$sort": {"consumo_renovavel": -1}},
-    {"$limit": 10},
-    {"$project": {"pais": "$_id", "consumo_renovavel": 1, "consumo_nao_renovavel": 1, "_id": 0}}
-]
-print("\nConsulta 3: Consumo de Energia Renovável vs. Não Renovável em 2020")
-result3 = list(db.paises.aggregate(query3))
-print(tabulate(result3, headers="keys", tablefmt="psql", floatfmt=".2f"))
-pd.DataFrame(result3).to_csv("../consultas/resultados/query3.txt", index=False)
-
-# Consulta 4: Emissões Totais por Região em 2020
-query4 = [
-    {"$unwind": "$emissoes"},
-    {"$match": {"emissoes.ano": 2020}},
-    {
-        "$group": {
-            "_id": "$regiao.nome",
-            "total_emissao": {"$sum": "$emissoes.emissao"}
-        }
-    },
-    {"$sort": {"total_emissao": -1}},
-    {"$project": {"regiao": "$_id", "total_emissao": 1, "_id": 0}}
-]
-print("\nConsulta 4: Emissões Totais por Região em 2020")
-result4 = list(db.paises.aggregate(query4))
-print(tabulate(result4, headers="keys", tablefmt="psql", floatfmt=".2f"))
-pd.DataFrame(result4).to_csv("../consultas/resultados/query4.txt", index=False)
-
-# Consulta 5: Países com Maior Redução de Emissões (2010–2020)
-query5 = [
-    {"$unwind": "$emissoes"},
-    {"$match": {"emissoes.ano": {"$in": [2010, 2020]}}},
-    {
-        "$group": {
-            "_id": {"pais": "$nome", "ano": "$emissoes.ano"},
-            "total_emissao": {"$sum": "$emissoes.emissao"}
-        }
-    },
-    {
-        "$group": {
-            "_id": "$_id.pais",
-            "emissoes": {
-                "$push": {"ano": "$_id.ano", "total_emissao": "$total_emissao"}
-            }
-        }
-    },
-    {
-        "$project": {
-            "emissao_2010": {
-                "$arrayElemAt": [
-                    "$emissoes.total_emissao",
-                    {"$indexOfArray": ["$emissoes.ano", 2010]}
-                ]
-            },
-            "emissao_2020": {
-                "$arrayElemAt": [
-                    "$emissoes.total_emissao",
-                    {"$indexOfArray": ["$emissoes.ano", 2020]}
-                ]
-            }
-        }
-    },
-    {
-        "$match": {
-            "$expr": {"$lt": ["$emissao_2020", "$emissao_2010"]}
-        }
-    },
-    {
-        "$project": {
-            "pais": "$_id",
-            "emissao_2010": 1,
-            "emissao_2020": 1,
-            "reducao_emissao": {"$subtract": ["$emissao_2020", "$emissao_2010"]},
-            "_id": 0
-        }
-    },
-    {"$sort": {"reducao_emissao": 1}},
-    {"$limit": 5}
-]
-print("\nConsulta 5: Países com Maior Redução de Emissões (2010–2020)")
-result5 = list(db.paises.aggregate(query5))
-print(tabulate(result5, headers="keys", tablefmt="psql", floatfmt=".2f"))
-pd.DataFrame(result5).to_csv("../consultas/resultados/query5.txt", index=False)
+import documentos
+import pipelines
+import rollups
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+RESULTADOS_DIR = os.path.join(BASE_DIR, "../consultas/resultados")
+
+# Prefixo do comment das consultas deste módulo, usado para achá-las no profiler
+PREFIXO = "consultas_mongodb"
+
+# Consultas do modelo como dados: uma agregação sobre a coleção do modelo ou,
+# com os rollups, um find (pipelines.BUSCAS) para as consultas 2, 4 e 5
+def montar_consultas(modelo="embutido", usar_rollups=False):
+    consultas = []
+    for nome, pipeline in pipelines.PIPELINES[modelo].items():
+        if usar_rollups and nome in pipelines.BUSCAS:
+            consultas.append({'nome': nome, **pipelines.BUSCAS[nome]})
+        else:
+            consultas.append({'nome': nome, 'colecao': documentos.COLECOES[modelo], 'pipeline': pipeline})
+    return consultas
+
+def executar(db, consulta, comentario=None):
+    colecao = db[consulta['colecao']]
+    if 'pipeline' in consulta:
+        return list(colecao.aggregate(consulta['pipeline'], comment=comentario))
+    cursor = colecao.find(consulta['filtro'], consulta['projecao'], comment=comentario).sort(consulta['ordem'])
+    return list(cursor.limit(consulta['limite']))
+
+# Comando equivalente à consulta, para o explain
+def comando(consulta):
+    if 'pipeline' in consulta:
+        return {"aggregate": consulta['colecao'], "pipeline": consulta['pipeline'], "cursor": {}}
+    return {"find": consulta['colecao'], "filter": consulta['filtro'], "projection": consulta['projecao'],
+            "sort": dict(consulta['ordem']), "limit": consulta['limite']}
+
+def explicar(db, consulta):
+    return db.command("explain", comando(consulta), verbosity="executionStats")
+
+# Todos os objetos de um explain, recursivamente
+def _nos(no):
+    if isinstance(no, dict):
+        yield no
+        for valor in no.values():
+            yield from _nos(valor)
+    elif isinstance(no, list):
+        for valor in no:
+            yield from _nos(valor)
+
+# Documentos e chaves examinados, tempo no servidor e varreduras (COLLSCAN,
+# IXSCAN...) de um explain. No aggregate o executionTimeMillis cobre só o
+# $cursor; os estágios seguintes ($group, $sort...) trazem o tempo acumulado
+# em executionTimeMillisEstimate, então o tempo é o maior dos dois.
+def resumir(explicacao):
+    estatisticas = [no["executionStats"] for no in _nos(explicacao) if isinstance(no.get("executionStats"), dict)]
+    tempos = [no[campo] for no in _nos(explicacao)
+              for campo in ("executionTimeMillis", "executionTimeMillisEstimate") if campo in no]
+    varreduras = sorted({no["stage"] + (f"({no['indexName']})" if "indexName" in no else "")
+                         for no in _nos(explicacao)
+                         if isinstance(no.get("stage"), str) and (no["stage"].endswith("SCAN") or no["stage"] == "IDHACK")})
+    return {
+        'documentos_examinados': sum(e.get('totalDocsExamined', 0) for e in estatisticas),
+        'chaves_examinadas': sum(e.get('totalKeysExamined', 0) for e in estatisticas),
+        'tempo_ms': max(tempos, default=0),
+        'varreduras': varreduras,
+    }
+
+# Liga o profiler do banco só para as consultas marcadas com PREFIXO no
+# comment. Devolve o nível anterior, ou None se o servidor não permitir
+# (mongos, usuário sem privilégio, versão sem filtro de profiler).
+def ativar_profiler(db):
+    try:
+        anterior = db.command("profile", -1)["was"]
+        db.command("profile", 2, filter={"command.comment": {"$regex": f"^{PREFIXO}:"}})
+        return anterior
+    except pymongo.errors.OperationFailure:
+        return None
+
+def desativar_profiler(db, anterior):
+    if anterior is not None:
+        db.command("profile", anterior, filter="unset")
+
+# Tempo no servidor (system.profile.millis) de cada execução cujo comment
+# começa com marca, somando o aggregate/find e os getMore do mesmo cursor
+def tempos_profiler(db, marca):
+    padrao = {"$regex": f"^{re.escape(marca)}"}
+    tempos = {}
+    for entrada in db["system.profile"].find({"$or": [{"command.comment": padrao},
+                                                       {"originatingCommand.comment": padrao}]}):
+        comentario = entrada.get("command", {}).get("comment") or entrada["originatingCommand"]["comment"]
+        tempos[comentario] = tempos.get(comentario, 0) + entrada["millis"]
+    return [tempos[c] for c in sorted(tempos)]
+
+# Executa a consulta repeticoes vezes, medindo o tempo no cliente (ida e
+# volta, leitura do cursor e decodificação do BSON). O tempo no servidor vem
+# do profiler, lido depois das execuções medidas, com cada execução marcada
+# por marca no comment; sem marca (profiler indisponível), vem de um único
+# explain executionStats feito antes delas. O resultado da primeira execução
+# é salvo em resultados_dir.
+def medir(db, consulta, repeticoes=1, resultados_dir=RESULTADOS_DIR, marca=None):
+    medida = {'nome': consulta['nome'], 'servidor_ms': [], 'cliente_ms': [], 'erro': None}
+    try:
+        if marca is None:
+            medida['servidor_ms'].append(resumir(explicar(db, consulta))['tempo_ms'])
+        for i in range(repeticoes):
+            comentario = None if marca is None else f"{marca}:{consulta['nome']}:{i:06d}"
+            inicio = time.perf_counter()
+            resultado = executar(db, consulta, comentario)
+            medida['cliente_ms'].append((time.perf_counter() - inicio) * 1000)
+            if 'resultado' not in medida:
+                medida['resultado'] = resultado
+                medida['linhas'] = len(resultado)
+                medida['bytes'] = sum(len(bson.encode(documento)) for documento in resultado)
+                if resultados_dir is not None:
+                    pd.DataFrame(resultado).to_csv(os.path.join(resultados_dir, f"{consulta['nome']}.txt"),
+                                                   index=False)
+        if marca is not None:
+            medida['servidor_ms'] = tempos_profiler(db, f"{marca}:{consulta['nome']}:")
+    except Exception as e:
+        medida['erro'] = str(e)
+    return medida
+
+# Executa as consultas ao mesmo tempo, uma por thread, com o pool de conexões
+# do cliente; devolve as medidas na ordem das consultas e o tempo total. O
+# profiler fica ligado só durante as execuções, que levam uma marca própria
+# desta chamada no comment.
+def executar_consultas(db, consultas, conexoes=5, repeticoes=1, resultados_dir=RESULTADOS_DIR):
+    if resultados_dir is not None:
+        os.makedirs(resultados_dir, exist_ok=True)
+    anterior = ativar_profiler(db)
+    marca = None if anterior is None else f"{PREFIXO}:{os.getpid()}-{time.time_ns()}"
+    try:
+        inicio = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=conexoes) as executor:
+            medidas = list(executor.map(lambda c: medir(db, c, repeticoes, resultados_dir, marca), consultas))
+        total = time.perf_counter() - inicio
+    finally:
+        desativar_profiler(db, anterior)
+    return medidas, total
+
+def percentil(valores, p):
+    return float(np.percentile(valores, p)) if valores else float('nan')
+
+def exibir_latencias(medidas, repeticoes):
+    if repeticoes > 1:
+        cabecalho = ['consulta', 'linhas', 'KiB', 'servidor p50 (ms)', 'servidor p95 (ms)',
+                     'cliente p50 (ms)', 'cliente p95 (ms)']
+        linhas = [[m['nome'], m.get('linhas'), m.get('bytes', 0) / 1024,
+                   percentil(m['servidor_ms'], 50), percentil(m['servidor_ms'], 95),
+                   percentil(m['cliente_ms'], 50), percentil(m['cliente_ms'], 95)] for m in medidas]
+    else:
+        cabecalho = ['consulta', 'linhas', 'KiB', 'servidor (ms)', 'cliente (ms)']
+        linhas = [[m['nome'], m.get('linhas'), m.get('bytes', 0) / 1024,
+                   percentil(m['servidor_ms'], 50), percentil(m['cliente_ms'], 50)] for m in medidas]
+    print(tabulate(linhas, headers=cabecalho, tablefmt='psql', floatfmt=".2f"))
+
+def main():
+    parser = argparse.ArgumentParser(description="Consultas da Atividade 1 no MongoDB")
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/", help="URI do MongoDB")
+    parser.add_argument("--banco", default="ods13_db", help="banco do MongoDB (padrão: ods13_db)")
+    parser.add_argument("--modelo", choices=documentos.MODELOS, default="embutido",
+                        help="modelo de armazenamento consultado (padrão: embutido)")
+    parser.add_argument("--com-rollups", action="store_true",
+                        help="responde as consultas 2, 4 e 5 pelas coleções de rollup em vez das agregações "
+                             "sobre os arrays (confira antes com benchmarks/conferir_rollups.py)")
+    parser.add_argument("--conexoes", type=int, default=5,
+                        help="consultas executadas ao mesmo tempo / tamanho do pool do cliente (padrão: 5)")
+    parser.add_argument("--repeticoes", type=int, default=1,
+                        help="execuções de cada consulta; com mais de uma, mostra p50/p95 (padrão: 1)")
+    parser.add_argument("--sem-resultados", action="store_true", help="só mede, sem exibir os resultados")
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(args.mongo, maxPoolSize=args.conexoes)
+    db = client[args.banco]
+    try:
+        # Os rollups só são usados a pedido: as agregações sobre os arrays são
+        # a referência até conferir_rollups.py passar no servidor em uso
+        usar_rollups = args.com_rollups and rollups.disponiveis(db)
+        if args.com_rollups and not usar_rollups:
+            print("Coleções de rollup vazias ou inexistentes: usando as agregações sobre os arrays")
+        consultas = montar_consultas(args.modelo, usar_rollups)
+        medidas, total = executar_consultas(db, consultas, args.conexoes, args.repeticoes)
+    finally:
+        client.close()
+
+    for medida in medidas:
+        print(f"\n{pipelines.TITULOS[medida['nome']]}")
+        if medida['erro'] is not None:
+            print(f"Erro ao executar {medida['nome']}: {medida['erro']}")
+        elif not args.sem_resultados:
+            print(tabulate(medida['resultado'], headers="keys", tablefmt="psql", floatfmt=".2f"))
+
+    print(f"\nLatência das consultas ({args.repeticoes} execuções de cada, {args.conexoes} conexões):")
+    exibir_latencias(medidas, args.repeticoes)
+    mais_lenta = max(medidas, key=lambda m: sum(m['cliente_ms']))
+    print(f"Total: {total:.2f}s (consulta mais lenta: {mais_lenta['nome']}, "
+          f"{sum(mais_lenta['cliente_ms']) / 1000:.2f}s)")
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,21 @@
+import argparse
+
 import pymongo
 import pandas as pd
 import os
-import psycopg2
+import sys
+
+# Conexões PostgreSQL pelo módulo compartilhado da Avaliacao1
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../Avaliacao1/python'))
+import conexao
+import documentos
+import rollups
+
+parser = argparse.ArgumentParser(description="Popula o MongoDB a partir do PostgreSQL")
+parser.add_argument("--modelo", choices=documentos.MODELOS, default="embutido",
+                    help="modelo de armazenamento: um documento por país (embutido), por país e década "
+                         "(decadas) ou coleção time-series por país e ano (serie)")
+args = parser.parse_args()
 
 # Passo 1: Conectar ao MongoDB
 client = pymongo.MongoClient("mongodb://localhost:27017/")
@@ -12,19 +26,10 @@ if "ods13_db" not in client.list_database_names():
 else:
     print("Erro: Banco ods13_db não foi limpo corretamente!")
 
-def conectar():
-    print("Conectando...")
-    return psycopg2.connect(
-        dbname="postgres",
-        user="postgres",
-        password="myql",
-        host="localhost",
-        port="5432"
-    )
 # Passo 2: Conectar ao PostgreSQL
 try:
 
-    conn = conectar()
+    conn = conexao.obter()
     cursor = conn.cursor()
     print("Conexão com PostgreSQL estabelecida com sucesso!")
 except Exception as e:
@@ -37,16 +42,15 @@ data_dir = os.path.join(BASE_DIR, "../dados-pre-processados")
 os.makedirs(data_dir, exist_ok=True)
 
 # Função para executar consulta SQL e salvar CSV
+# O COPY TO grava as linhas direto no arquivo, em memória constante; o
+# DataFrame é lido do CSV só porque os documentos são montados a partir dele
 def query_to_csv(query, csv_name):
     try:
-        cursor.execute(query)
-        rows = cursor.fetchall()
-        columns = [desc[0] for desc in cursor.description]
-        df = pd.DataFrame(rows, columns=columns)
         csv_path = os.path.join(data_dir, csv_name)
-        df.to_csv(csv_path, index=False, encoding="utf-8")
+        with open(csv_path, "w", encoding="utf-8", newline="") as f:
+            cursor.copy_expert(f"COPY ({query.strip().rstrip(';')}) TO STDOUT WITH (FORMAT CSV, HEADER)", f)
         print(f"CSV {csv_name} gerado com sucesso em {csv_path}")
-        return df
+        return pd.read_csv(csv_path, keep_default_na=False, na_values=[""])
     except Exception as e:
         print(f"Erro ao gerar CSV {csv_name}: {e}")
         return pd.DataFrame()
@@ -75,88 +79,54 @@ atividades_energia_df = query_to_csv(query_atividades_energia, "atividades_energ
 query_indicadores_economicos = 'SELECT * FROM public."IndicadoresEconômicos"'
 pib_df = query_to_csv(query_indicadores_economicos, "indicadores_economicos.csv")
 
-# Fechar conexão com PostgreSQL
+# Devolver a conexão ao pool do PostgreSQL
 cursor.close()
-conn.close()
+conn.rollback()
+conexao.devolver(conn)
 
 # Passo 3: Popular MongoDB a partir dos CSVs gerados
 
-# Inicializar Paises com base em paises.csv
-paises_dict = {}
-for _, row in paises_df.iterrows():
-    iso_code = row["iso_code"]
-    paises_dict[iso_code] = {
-        "_id": iso_code,
-        "nome": row["nome"],
-        "regiao": {
-            "regiao_code": row["regiao_code"],
-            "nome": regiao_df[regiao_df["regiao_code"] == row["regiao_code"]]["nome"].iloc[0]
-            if not regiao_df[regiao_df["regiao_code"] == row["regiao_code"]].empty
-            else "World"
-        },
-        "emissoes": [],
-        "energia": [],
-        "pib": [],
-    }
-
-# Popular array emissoes
-for _, row in emissao_poluentes_df.iterrows():
-    iso_code = row["iso_code"]
-    if iso_code in paises_dict:
-        paises_dict[iso_code]["emissoes"].append({
-            "ano": int(row["ano"]),
-            "fonte_poluente": row["fonte_poluente"],
-            "emissao": float(row["emissao"])
-        })
-
-# Popular array energia
-for _, row in atividades_energia_df.iterrows():
-    iso_code = row["iso_code"]
-    if iso_code in paises_dict:
-        paises_dict[iso_code]["energia"].append({
-            "ano": int(row["ano"]),
-            "fonte_energia": row["fonte_energia"],
-            "consumo": float(row["consumo"])
-        })
-
-# Popular array indicadores_economicos
-indicadores_cols = [col for col in pib_df.columns if col not in ["iso_code", "ano"]]
-for _, row in pib_df.iterrows():
-    iso_code = row["iso_code"]
-    if iso_code in paises_dict:
-        indicadores = {"ano": int(row["ano"])}
-        for col in indicadores_cols:
-            if pd.notna(row[col]):
-                indicadores[col] = row[col]
-        paises_dict[iso_code]["pib"].append(indicadores)
-
-# Inserir documentos na coleção Paises
-db.paises.insert_many(list(paises_dict.values()))
-print(f"Coleção paises populada com {len(paises_dict)} documentos.")
+# Montar os documentos agrupando cada tabela por país de uma vez, sem
+# percorrer os DataFrames linha a linha
+documentos_paises = documentos.montar_documentos(regiao_df, paises_df, emissao_poluentes_df,
+                                                 atividades_energia_df, pib_df)
+
+# Inserir documentos na coleção do modelo escolhido
+colecao = documentos.preparar_colecao(db, args.modelo)
+colecao.insert_many(documentos.converter(documentos_paises, args.modelo))
+print(f"Coleção {colecao.name} populada com os documentos de {len(documentos_paises)} países.")
+
+# Totais de emissões por país/ano e região/ano usados pelas consultas 2, 4 e 5
+rollups.atualizar(db, args.modelo)
+print(f"Rollups {rollups.PAISES_ANO} e {rollups.REGIOES_ANO} gerados.")
 
 # Testar e Validar o Banco
 print("\nValidação:")
-print(f"Total de documentos em paises: {db.paises.count_documents({})}")
-sample_pais = db.paises.find_one({"_id": "BRA"})
-if sample_pais:
-    print(f"\nExemplo de documento para Brasil (BRA):")
-    print(f"  Nome: {sample_pais['nome']}")
-    print(f"  Região: {sample_pais['regiao']['nome']}")
-    print(f"  Emissões: {len(sample_pais['emissoes'])} registros")
-    print(f"  Energia: {len(sample_pais['energia'])} registros")
-    print(f"  Pib: {len(sample_pais['pib'])} registros")
-else:
-    print("Documento para Brasil (BRA) não encontrado.")
-sample_pais = db.paises.find_one({"_id": "USA"})
-if sample_pais:
-    print(f"\nExemplo de documento para Estados Unidos (USA):")
-    print(f"  Nome: {sample_pais['nome']}")
-    print(f"  Região: {sample_pais['regiao']['nome']}")
-    print(f"  Emissões: {len(sample_pais['emissoes'])} registros")
-    print(f"  Energia: {len(sample_pais['energia'])} registros")
-    print(f"  Pib: {len(sample_pais['pib'])} registros")
+print(f"Total de documentos em {colecao.name}: {colecao.count_documents({})}")
+if args.modelo != "embutido":
+    for iso_code in ("BRA", "USA"):
+        print(f"  {iso_code}: {colecao.count_documents({documentos.CAMPO_PAIS[args.modelo]: iso_code})} documentos")
 else:
-    print("Documento para Estados Unidos (USA) não encontrado.")
+    sample_pais = db.paises.find_one({"_id": "BRA"})
+    if sample_pais:
+        print(f"\nExemplo de documento para Brasil (BRA):")
+        print(f"  Nome: {sample_pais['nome']}")
+        print(f"  Região: {sample_pais['regiao']['nome']}")
+        print(f"  Emissões: {len(sample_pais['emissoes'])} registros")
+        print(f"  Energia: {len(sample_pais['energia'])} registros")
+        print(f"  Pib: {len(sample_pais['pib'])} registros")
+    else:
+        print("Documento para Brasil (BRA) não encontrado.")
+    sample_pais = db.paises.find_one({"_id": "USA"})
+    if sample_pais:
+        print(f"\nExemplo de documento para Estados Unidos (USA):")
+        print(f"  Nome: {sample_pais['nome']}")
+        print(f"  Região: {sample_pais['regiao']['nome']}")
+        print(f"  Emissões: {len(sample_pais['emissoes'])} registros")
+        print(f"  Energia: {len(sample_pais['energia'])} registros")
+        print(f"  Pib: {len(sample_pais['pib'])} registros")
+    else:
+        print("Documento para Estados Unidos (USA) não encontrado.")
 
 
 # Fechar conexão com MongoDB
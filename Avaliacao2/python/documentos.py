@@ -0,0 +1,151 @@
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+import pymongo
+
+# Converte as linhas de um DataFrame em listas de registros por iso_code, na
+# ordem original de cada país. Os registros são gerados de uma vez só
+# (to_dict) e divididos pelas posições de cada país após uma ordenação estável.
+def registros_por_pais(df, colunas, paises):
+    df = df[df["iso_code"].isin(paises)]
+    if df.empty:
+        return {}
+    codigos = df["iso_code"].to_numpy()
+    ordem = np.argsort(codigos, kind="stable")
+    registros = df[colunas].iloc[ordem].to_dict("records")
+    isos, inicios = np.unique(codigos[ordem], return_index=True)
+    fins = list(inicios[1:]) + [len(registros)]
+    return {iso: registros[inicio:fim] for iso, inicio, fim in zip(isos.tolist(), inicios, fins)}
+
+# Documento de um país, com a região embutida e os arrays ainda vazios
+def novo_documento(iso_code, nome, regiao_code, nome_regiao):
+    return {
+        "_id": iso_code,
+        "nome": nome,
+        "regiao": {
+            "regiao_code": regiao_code,
+            "nome": nome_regiao,
+        },
+        "emissoes": [],
+        "energia": [],
+        "pib": [],
+    }
+
+# Monta os documentos da coleção paises: dados do país, região embutida e os
+# arrays emissoes, energia e pib
+def montar_documentos(regiao_df, paises_df, emissao_poluentes_df, atividades_energia_df, pib_df):
+    # Nome de cada região, mantendo a primeira ocorrência de cada código
+    regioes = regiao_df.drop_duplicates("regiao_code").set_index("regiao_code")["nome"].to_dict()
+
+    paises_dict = {}
+    for iso_code, nome, regiao_code in zip(paises_df["iso_code"].tolist(), paises_df["nome"].tolist(),
+                                          paises_df["regiao_code"].tolist()):
+        paises_dict[iso_code] = novo_documento(iso_code, nome, regiao_code, regioes.get(regiao_code, "World"))
+
+    emissoes = registros_por_pais(emissao_poluentes_df.astype({"ano": int, "emissao": float}),
+                                  ["ano", "fonte_poluente", "emissao"], paises_dict)
+    energia = registros_por_pais(atividades_energia_df.astype({"ano": int, "consumo": float}),
+                                 ["ano", "fonte_energia", "consumo"], paises_dict)
+
+    # Indicadores econômicos: só as colunas com valor em cada ano
+    indicadores_cols = [col for col in pib_df.columns if col not in ["iso_code", "ano"]]
+    pib = registros_por_pais(pib_df.astype({"ano": int}), ["ano"] + indicadores_cols, paises_dict)
+
+    for iso_code, documento in paises_dict.items():
+        documento["emissoes"] = emissoes.get(iso_code, [])
+        documento["energia"] = energia.get(iso_code, [])
+        documento["pib"] = [{c: v for c, v in r.items() if c == "ano" or pd.notna(v)} for r in pib.get(iso_code, [])]
+
+    return list(paises_dict.values())
+
+# Modelos de armazenamento da coleção de países:
+# - embutido: um documento por país com todos os anos (paises)
+# - decadas: um documento por país e década, _id "ISO:década" (paises_decadas)
+# - serie: coleção time-series com uma medição por país e ano (paises_serie)
+MODELOS = ("embutido", "decadas", "serie")
+COLECOES = {"embutido": "paises", "decadas": "paises_decadas", "serie": "paises_serie"}
+
+# Campo com o iso_code do país em cada modelo
+CAMPO_PAIS = {"embutido": "_id", "decadas": "iso_code", "serie": "pais.iso_code"}
+
+# Divide o documento de um país em um documento por década
+def por_decada(documento):
+    decadas = {}
+    for campo in ("emissoes", "energia", "pib"):
+        for registro in documento[campo]:
+            decada = registro["ano"] // 10 * 10
+            if decada not in decadas:
+                decadas[decada] = {
+                    "_id": f"{documento['_id']}:{decada}",
+                    "iso_code": documento["_id"],
+                    "nome": documento["nome"],
+                    "regiao": documento["regiao"],
+                    "decada": decada,
+                    "emissoes": [],
+                    "energia": [],
+                    "pib": [],
+                }
+            decadas[decada][campo].append(registro)
+    return [decadas[decada] for decada in sorted(decadas)]
+
+# Divide o documento de um país em uma medição por ano: o país vai no
+# metaField (pais) e o ano no timeField (data, 1º de janeiro do ano)
+def por_ano(documento):
+    pais = {"iso_code": documento["_id"], "nome": documento["nome"], "regiao": documento["regiao"]}
+    anos = {}
+    for campo in ("emissoes", "energia", "pib"):
+        for registro in documento[campo]:
+            ano = registro["ano"]
+            if ano not in anos:
+                anos[ano] = {"data": datetime(ano, 1, 1), "pais": pais, "ano": ano, "emissoes": [], "energia": []}
+            valores = {c: v for c, v in registro.items() if c != "ano"}
+            if campo == "pib":
+                anos[ano]["pib"] = valores
+            else:
+                anos[ano][campo].append(valores)
+    return [anos[ano] for ano in sorted(anos)]
+
+CONVERSORES = {"embutido": lambda documento: [documento], "decadas": por_decada, "serie": por_ano}
+
+# Documentos de países convertidos para o modelo escolhido
+def converter(documentos_paises, modelo):
+    conversor = CONVERSORES[modelo]
+    return [parte for documento in documentos_paises for parte in conversor(documento)]
+
+# Índices de cada modelo usados pelas consultas; no embutido são multikey
+# (uma entrada por elemento dos arrays)
+INDICES = {
+    "embutido": [[("emissoes.ano", 1)], [("energia.ano", 1)], [("regiao.nome", 1)]],
+    "decadas": [[("iso_code", 1), ("decada", 1)], [("decada", 1)]],
+    "serie": [[("pais.iso_code", 1), ("data", 1)]],
+}
+
+def criar_indices(colecao, modelo):
+    for chaves in INDICES[modelo]:
+        colecao.create_index(chaves)
+
+# Maior intervalo de bucket aceito pelo MongoDB (365 dias). Mesmo assim, com
+# uma medição por ano, cada bucket guarda uma única medição de cada país: a
+# time-series não ganha compressão com estes dados e o modelo serie fica no
+# benchmark só como comparação de armazenamento e latência
+BUCKET_SERIE_S = 365 * 24 * 3600
+
+# Recria a coleção do modelo (time-series no caso de serie) com os índices
+# usados pelas consultas. Os buckets de um ano exigem MongoDB 6.3+; nas
+# versões anteriores a coleção usa a maior granularidade (hours)
+def preparar_colecao(db, modelo):
+    nome = COLECOES[modelo]
+    db.drop_collection(nome)
+    if modelo == "serie":
+        try:
+            colecao = db.create_collection(nome, timeseries={
+                "timeField": "data", "metaField": "pais",
+                "bucketMaxSpanSeconds": BUCKET_SERIE_S, "bucketRoundingSeconds": BUCKET_SERIE_S})
+        except pymongo.errors.OperationFailure:
+            colecao = db.create_collection(nome, timeseries={"timeField": "data", "metaField": "pais",
+                                                             "granularity": "hours"})
+    else:
+        colecao = db.create_collection(nome)
+    criar_indices(colecao, modelo)
+    return colecao
@@ -0,0 +1,223 @@
+import argparse
+import itertools
+import json
+import os
+import sys
+import time
+from operator import itemgetter
+
+import pymongo
+from pymongo.errors import BulkWriteError
+
+# Conexões PostgreSQL pelo módulo compartilhado da Avaliacao1
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '../../Avaliacao1/python'))
+import conexao
+import documentos
+import rollups
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+PONTO_DE_RETOMADA = os.path.join(BASE_DIR, "../dados-pre-processados/migracao.json")
+
+# Todas as consultas saem ordenadas por iso_code byte a byte (COLLATE "C"), a
+# mesma ordem em que o Python compara strings, o que permite juntar as
+# tabelas país a país enquanto as linhas chegam. %(desde)s é o último país
+# já gravado ('' numa migração do zero).
+CONSULTA_PAISES = """
+SELECT p.iso_code, p.nome, p.regiao_code, COALESCE(r.nome, 'World') AS regiao
+FROM public."Países" p
+LEFT JOIN public."Região" r ON r.regiao_code = p.regiao_code
+WHERE p.iso_code COLLATE "C" > %(desde)s
+ORDER BY p.iso_code COLLATE "C"
+"""
+
+CONSULTA_EMISSOES = """
+SELECT e.iso_code, e.ano, f.nome AS fonte_poluente, e.emissao
+FROM public."EmissãoPoluentes" e
+JOIN public."FontesPoluente" f ON e.fonte_poluente_id = f.fonte_poluente_id
+WHERE e.iso_code COLLATE "C" > %(desde)s
+ORDER BY e.iso_code COLLATE "C", e.ano, e.fonte_poluente_id
+"""
+
+CONSULTA_ENERGIA = """
+SELECT a.iso_code, a.ano, f.nome AS fonte_energia, a.consumo
+FROM public."AtividadesEnergia" a
+JOIN public."FontesEnergia" f ON a.fonte_energia_id = f.fonte_energia_id
+WHERE a.iso_code COLLATE "C" > %(desde)s
+ORDER BY a.iso_code COLLATE "C", a.ano, a.fonte_energia_id
+"""
+
+CONSULTA_PIB = """
+SELECT *
+FROM public."IndicadoresEconômicos"
+WHERE iso_code COLLATE "C" > %(desde)s
+ORDER BY iso_code COLLATE "C", ano
+"""
+
+# Linhas de uma tabela de fatos agrupadas por país, lidas de um cursor no
+# servidor. Como os países chegam na mesma ordem da tabela Países, basta
+# avançar o cursor até o país pedido.
+class FluxoPorPais:
+    def __init__(self, cursor):
+        self.cursor = cursor
+        self._grupos = itertools.groupby(cursor, key=itemgetter(0))
+        self._atual = next(self._grupos, None)
+
+    # Colunas do resultado (só existem depois da primeira leitura)
+    def colunas(self):
+        return [desc[0] for desc in self.cursor.description]
+
+    # Linhas do país; as de países sem cadastro em Países são descartadas
+    def linhas(self, iso_code):
+        while self._atual is not None and self._atual[0] < iso_code:
+            self._atual = next(self._grupos, None)
+        if self._atual is None or self._atual[0] != iso_code:
+            return []
+        linhas = list(self._atual[1])
+        self._atual = next(self._grupos, None)
+        return linhas
+
+# Abre um cursor nomeado (no servidor), que traz linhas_por_leitura linhas por vez
+def cursor_servidor(conn, nome, consulta, desde, linhas_por_leitura):
+    cursor = conn.cursor(name=f"migracao_{nome}")
+    cursor.itersize = linhas_por_leitura
+    cursor.execute(consulta, {'desde': desde})
+    return cursor
+
+# Gera os documentos dos países em ordem de iso_code, cada um assim que as
+# linhas dele chegam de todas as tabelas
+def documentos_em_fluxo(conn, desde='', linhas_por_leitura=2000):
+    paises = cursor_servidor(conn, "paises", CONSULTA_PAISES, desde, linhas_por_leitura)
+    emissoes = FluxoPorPais(cursor_servidor(conn, "emissoes", CONSULTA_EMISSOES, desde, linhas_por_leitura))
+    energia = FluxoPorPais(cursor_servidor(conn, "energia", CONSULTA_ENERGIA, desde, linhas_por_leitura))
+    pib = FluxoPorPais(cursor_servidor(conn, "pib", CONSULTA_PIB, desde, linhas_por_leitura))
+    indicadores_cols = None
+
+    for iso_code, nome, regiao_code, regiao in paises:
+        documento = documentos.novo_documento(iso_code, nome, regiao_code, regiao)
+        documento["emissoes"] = [
+            {"ano": ano, "fonte_poluente": fonte, "emissao": float("nan") if emissao is None else emissao}
+            for _, ano, fonte, emissao in emissoes.linhas(iso_code)]
+        documento["energia"] = [
+            {"ano": ano, "fonte_energia": fonte, "consumo": float("nan") if consumo is None else consumo}
+            for _, ano, fonte, consumo in energia.linhas(iso_code)]
+
+        linhas_pib = pib.linhas(iso_code)
+        if linhas_pib and indicadores_cols is None:
+            indicadores_cols = pib.colunas()
+        for linha in linhas_pib:
+            indicadores = dict(zip(indicadores_cols, linha))
+            del indicadores["iso_code"]
+            documento["pib"].append({c: v for c, v in indicadores.items() if c == "ano" or v is not None})
+
+        yield documento
+
+    for fluxo in (emissoes, energia, pib):
+        fluxo.cursor.close()
+    paises.close()
+
+# Ponto de retomada: último país cujo lote foi confirmado pelo MongoDB
+def ler_ponto_de_retomada(caminho=PONTO_DE_RETOMADA):
+    if not os.path.exists(caminho):
+        return None
+    with open(caminho, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def salvar_ponto_de_retomada(ponto, caminho=PONTO_DE_RETOMADA):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    tmp = caminho + ".tmp"
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(ponto, f, indent=2)
+    os.replace(tmp, caminho)
+
+# Grava um lote de países no modelo escolhido. Nos modelos com _id próprio
+# são upserts fora de ordem: o MongoDB aplica as substituições em paralelo e
+# regravar um lote (ao retomar) não duplica nada. Coleções time-series não
+# aceitam upsert, então as medições são inseridas fora de ordem.
+def gravar_lote(colecao, lote, modelo="embutido"):
+    partes = documentos.converter(lote, modelo)
+    if modelo == "serie":
+        colecao.insert_many(partes, ordered=False)
+    else:
+        operacoes = [pymongo.ReplaceOne({"_id": parte["_id"]}, parte, upsert=True) for parte in partes]
+        colecao.bulk_write(operacoes, ordered=False)
+
+# Migra os países do PostgreSQL para a coleção do modelo no MongoDB em lotes
+# de documentos_por_lote países, salvando o ponto de retomada após cada lote
+def migrar(db, modelo="embutido", retomar=False, documentos_por_lote=100, linhas_por_leitura=2000,
+           ponto_de_retomada=PONTO_DE_RETOMADA):
+    ponto = ler_ponto_de_retomada(ponto_de_retomada) if retomar else None
+    if ponto is not None and ponto.get('modelo', 'embutido') != modelo:
+        raise ValueError(f"O ponto de retomada é do modelo {ponto.get('modelo', 'embutido')}, não {modelo}")
+    if ponto is None:
+        if retomar:
+            print("Nenhuma migração interrompida; começando do zero")
+        ponto = {'modelo': modelo, 'ultimo_iso_code': '', 'documentos': 0}
+        colecao = documentos.preparar_colecao(db, modelo)
+        rollups.limpar(db)
+    else:
+        print(f"Retomando depois de {ponto['ultimo_iso_code']} ({ponto['documentos']} países já gravados)")
+        colecao = db[documentos.COLECOES[modelo]]
+        # Medições do lote interrompido, que seriam inseridas de novo
+        if modelo == "serie":
+            colecao.delete_many({"pais.iso_code": {"$gt": ponto['ultimo_iso_code']}})
+
+    inicio = time.perf_counter()
+    lote = []
+    with conexao.conectar() as conn:
+        for documento in documentos_em_fluxo(conn, ponto['ultimo_iso_code'], linhas_por_leitura):
+            lote.append(documento)
+            if len(lote) < documentos_por_lote:
+                continue
+            gravar_lote(colecao, lote, modelo)
+            rollups.atualizar(db, modelo, [documento["_id"] for documento in lote])
+            ponto = {'modelo': modelo, 'ultimo_iso_code': lote[-1]["_id"],
+                     'documentos': ponto['documentos'] + len(lote)}
+            salvar_ponto_de_retomada(ponto, ponto_de_retomada)
+            print(f"  {ponto['documentos']} países gravados (até {ponto['ultimo_iso_code']})")
+            lote = []
+        if lote:
+            gravar_lote(colecao, lote, modelo)
+            rollups.atualizar(db, modelo, [documento["_id"] for documento in lote])
+            ponto = {'modelo': modelo, 'ultimo_iso_code': lote[-1]["_id"],
+                     'documentos': ponto['documentos'] + len(lote)}
+
+    # Migração completa: a próxima começa do zero
+    if os.path.exists(ponto_de_retomada):
+        os.remove(ponto_de_retomada)
+    return ponto['documentos'], time.perf_counter() - inicio
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra os países do PostgreSQL para o MongoDB em fluxo")
+    parser.add_argument("--dsn", help="conexão PostgreSQL (padrão: variáveis PG* de conexao.py)")
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/", help="URI do MongoDB")
+    parser.add_argument("--banco", default="ods13_db", help="banco do MongoDB (padrão: ods13_db)")
+    parser.add_argument("--modelo", choices=documentos.MODELOS, default="embutido",
+                        help="modelo de armazenamento no MongoDB (padrão: embutido)")
+    parser.add_argument("--retomar", action="store_true",
+                        help="continua a partir do último lote gravado em vez de recriar a coleção")
+    parser.add_argument("--documentos-por-lote", type=int, default=100,
+                        help="países por bulk_write (padrão: 100)")
+    parser.add_argument("--linhas-por-leitura", type=int, default=2000,
+                        help="linhas trazidas do PostgreSQL por leitura de cada cursor (padrão: 2000)")
+    args = parser.parse_args()
+
+    if args.dsn:
+        conexao.configurar(args.dsn)
+    client = pymongo.MongoClient(args.mongo)
+    try:
+        total, duracao = migrar(client[args.banco], args.modelo, args.retomar, args.documentos_por_lote,
+                                args.linhas_por_leitura)
+    except BulkWriteError as e:
+        print(f"Erro ao gravar o lote no MongoDB: {e.details.get('writeErrors', [])[:3]}")
+        print("Execute novamente com --retomar para continuar do último lote gravado.")
+        sys.exit(1)
+    except Exception as e:
+        print(f"Erro na migração: {e}")
+        print("Execute novamente com --retomar para continuar do último lote gravado.")
+        sys.exit(1)
+    finally:
+        client.close()
+    print(f"Coleção {documentos.COLECOES[args.modelo]} migrada com {total} países em {duracao:.2f}s.")
+
+if __name__ == "__main__":
+    main()
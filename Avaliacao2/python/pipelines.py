@@ -0,0 +1,254 @@
+from datetime import datetime
+
+import rollups
+
+# Títulos das consultas, comuns a todos os modelos
+TITULOS = {
+    "query1": "Consulta 1: Tendência de Emissões por Fonte Poluente no Brasil (2000–2020)",
+    "query2": "Consulta 2: Top 5 Países por Emissões Totais em 2020",
+    "query3": "Consulta 3: Consumo de Energia Renovável vs. Não Renovável em 2020",
+    "query4": "Consulta 4: Emissões Totais por Região em 2020",
+    "query5": "Consulta 5: Países com Maior Redução de Emissões (2010–2020)",
+}
+
+RENOVAVEIS = ["Hydro", "Solar", "Wind", "Biofuel"]
+NAO_RENOVAVEIS = ["Coal", "Oil", "Gas"]
+
+# Consumo renovável e não renovável de um registro de energia
+def consumo_por_tipo():
+    return {
+        "consumo_renovavel": {
+            "$sum": {"$cond": [{"$in": ["$energia.fonte_energia", RENOVAVEIS]}, "$energia.consumo", 0]}
+        },
+        "consumo_nao_renovavel": {
+            "$sum": {"$cond": [{"$in": ["$energia.fonte_energia", NAO_RENOVAVEIS]}, "$energia.consumo", 0]}
+        },
+    }
+
+# Final da consulta 5, a partir dos totais por país e ano
+REDUCAO_2010_2020 = [
+    {
+        "$group": {
+            "_id": "$_id.pais",
+            "emissoes": {
+                "$push": {"ano": "$_id.ano", "total_emissao": "$total_emissao"}
+            }
+        }
+    },
+    {
+        "$project": {
+            "emissao_2010": {
+                "$arrayElemAt": [
+                    "$emissoes.total_emissao",
+                    {"$indexOfArray": ["$emissoes.ano", 2010]}
+                ]
+            },
+            "emissao_2020": {
+                "$arrayElemAt": [
+                    "$emissoes.total_emissao",
+                    {"$indexOfArray": ["$emissoes.ano", 2020]}
+                ]
+            }
+        }
+    },
+    {
+        "$match": {
+            "$expr": {"$lt": ["$emissao_2020", "$emissao_2010"]}
+        }
+    },
+    {
+        "$project": {
+            "pais": "$_id",
+            "emissao_2010": 1,
+            "emissao_2020": 1,
+            "reducao_emissao": {"$subtract": ["$emissao_2020", "$emissao_2010"]},
+            "_id": 0
+        }
+    },
+    {"$sort": {"reducao_emissao": 1}},
+    {"$limit": 5}
+]
+
+# Registros de um array (emissoes, energia) entre os anos inicial e final
+def _no_periodo(campo, inicial, final):
+    return {"$filter": {"input": f"${campo}", "as": "r",
+                        "cond": {"$and": [{"$gte": ["$$r.ano", inicial]}, {"$lte": ["$$r.ano", final]}]}}}
+
+# Registros de um array nos anos da lista
+def _nos_anos(campo, anos):
+    return {"$filter": {"input": f"${campo}", "as": "r", "cond": {"$in": ["$$r.ano", anos]}}}
+
+# Modelo embutido (paises): um documento por país com todos os anos. O
+# primeiro $match usa os índices multikey em emissoes.ano/energia.ano para
+# escolher só os países com dados no período, e o $filter reduz os arrays aos
+# anos pedidos antes do $unwind.
+EMBUTIDO = {
+    "query1": [
+        {"$match": {"_id": "BRA"}},
+        {"$project": {"emissoes": _no_periodo("emissoes", 2000, 2020)}},
+        {"$unwind": "$emissoes"},
+        {
+            "$group": {
+                "_id": {"ano": "$emissoes.ano", "fonte_poluente": "$emissoes.fonte_poluente"},
+                "total_emissao": {"$sum": "$emissoes.emissao"}
+            }
+        },
+        {"$sort": {"_id.ano": 1, "_id.fonte_poluente": 1}},
+        {"$project": {"ano": "$_id.ano", "fonte_poluente": "$_id.fonte_poluente", "total_emissao": 1, "_id": 0}}
+    ],
+    "query2": [
+        {"$match": {"emissoes.ano": 2020}},
+        {"$project": {"nome": 1, "emissoes": _no_periodo("emissoes", 2020, 2020)}},
+        {"$unwind": "$emissoes"},
+        {
+            "$group": {
+                "_id": "$nome",
+                "total_emissao": {"$sum": "$emissoes.emissao"}
+            }
+        },
+        {"$sort": {"total_emissao": -1}},
+        {"$limit": 5},
+        {"$project": {"pais": "$_id", "total_emissao": 1, "_id": 0}}
+    ],
+    "query3": [
+        {"$match": {"energia.ano": 2020}},
+        {"$project": {"nome": 1, "energia": _no_periodo("energia", 2020, 2020)}},
+        {"$unwind": "$energia"},
+        {"$group": {"_id": "$nome", **consumo_por_tipo()}},
+        {"$sort": {"consumo_renovavel": -1}},
+        {"$limit": 10},
+        {"$project": {"pais": "$_id", "consumo_renovavel": 1, "consumo_nao_renovavel": 1, "_id": 0}}
+    ],
+    "query4": [
+        {"$match": {"emissoes.ano": 2020}},
+        {"$project": {"regiao.nome": 1, "emissoes": _no_periodo("emissoes", 2020, 2020)}},
+        {"$unwind": "$emissoes"},
+        {
+            "$group": {
+                "_id": "$regiao.nome",
+                "total_emissao": {"$sum": "$emissoes.emissao"}
+            }
+        },
+        {"$sort": {"total_emissao": -1}},
+        {"$project": {"regiao": "$_id", "total_emissao": 1, "_id": 0}}
+    ],
+    "query5": [
+        {"$match": {"emissoes.ano": {"$in": [2010, 2020]}}},
+        {"$project": {"nome": 1, "emissoes": _nos_anos("emissoes", [2010, 2020])}},
+        {"$unwind": "$emissoes"},
+        {
+            "$group": {
+                "_id": {"pais": "$nome", "ano": "$emissoes.ano"},
+                "total_emissao": {"$sum": "$emissoes.emissao"}
+            }
+        },
+        *REDUCAO_2010_2020
+    ],
+}
+
+# Modelo por décadas (paises_decadas): os documentos têm os mesmos campos
+# do embutido, então basta escolher antes as décadas (e o país) pelo índice
+DECADAS = {
+    "query1": [{"$match": {"iso_code": "BRA", "decada": {"$gte": 2000, "$lte": 2020}}}] + EMBUTIDO["query1"][1:],
+    "query2": [{"$match": {"decada": 2020}}] + EMBUTIDO["query2"],
+    "query3": [{"$match": {"decada": 2020}}] + EMBUTIDO["query3"],
+    "query4": [{"$match": {"decada": 2020}}] + EMBUTIDO["query4"],
+    "query5": [{"$match": {"decada": {"$in": [2010, 2020]}}}] + EMBUTIDO["query5"],
+}
+
+# Intervalo de datas (timeField) dos anos inicial a final
+def _anos(inicial, final):
+    return {"$gte": datetime(inicial, 1, 1), "$lt": datetime(final + 1, 1, 1)}
+
+# Modelo time-series (paises_serie): uma medição por país e ano, com o país
+# em pais e o ano em data; só os arrays do próprio ano são desdobrados
+SERIE = {
+    "query1": [
+        {"$match": {"pais.iso_code": "BRA", "data": _anos(2000, 2020)}},
+        {"$unwind": "$emissoes"},
+        {
+            "$group": {
+                "_id": {"ano": "$ano", "fonte_poluente": "$emissoes.fonte_poluente"},
+                "total_emissao": {"$sum": "$emissoes.emissao"}
+            }
+        },
+        {"$sort": {"_id.ano": 1, "_id.fonte_poluente": 1}},
+        {"$project": {"ano": "$_id.ano", "fonte_poluente": "$_id.fonte_poluente", "total_emissao": 1, "_id": 0}}
+    ],
+    "query2": [
+        {"$match": {"data": _anos(2020, 2020)}},
+        {"$unwind": "$emissoes"},
+        {
+            "$group": {
+                "_id": "$pais.nome",
+                "total_emissao": {"$sum": "$emissoes.emissao"}
+            }
+        },
+        {"$sort": {"total_emissao": -1}},
+        {"$limit": 5},
+        {"$project": {"pais": "$_id", "total_emissao": 1, "_id": 0}}
+    ],
+    "query3": [
+        {"$match": {"data": _anos(2020, 2020)}},
+        {"$unwind": "$energia"},
+        {"$group": {"_id": "$pais.nome", **consumo_por_tipo()}},
+        {"$sort": {"consumo_renovavel": -1}},
+        {"$limit": 10},
+        {"$project": {"pais": "$_id", "consumo_renovavel": 1, "consumo_nao_renovavel": 1, "_id": 0}}
+    ],
+    "query4": [
+        {"$match": {"data": _anos(2020, 2020)}},
+        {"$unwind": "$emissoes"},
+        {
+            "$group": {
+                "_id": "$pais.regiao.nome",
+                "total_emissao": {"$sum": "$emissoes.emissao"}
+            }
+        },
+        {"$sort": {"total_emissao": -1}},
+        {"$project": {"regiao": "$_id", "total_emissao": 1, "_id": 0}}
+    ],
+    "query5": [
+        {"$match": {"data": {"$in": [datetime(2010, 1, 1), datetime(2020, 1, 1)]}}},
+        {"$unwind": "$emissoes"},
+        {
+            "$group": {
+                "_id": {"pais": "$pais.nome", "ano": "$ano"},
+                "total_emissao": {"$sum": "$emissoes.emissao"}
+            }
+        },
+        *REDUCAO_2010_2020
+    ],
+}
+
+# Pipelines de cada modelo de armazenamento (ver documentos.MODELOS)
+PIPELINES = {"embutido": EMBUTIDO, "decadas": DECADAS, "serie": SERIE}
+
+# Consultas respondidas pelas coleções de rollup (rollups.py) com um find
+# ordenado pelo índice (ano, total_emissao) ou (ano, variacao_10_anos), sem
+# desdobrar os arrays; valem para qualquer modelo. Só são usadas com
+# --com-rollups em consultas_mongodb.py.
+BUSCAS = {
+    "query2": {
+        "colecao": rollups.PAISES_ANO,
+        "filtro": {"ano": 2020},
+        "projecao": {"_id": 0, "total_emissao": "$total_emissao", "pais": "$pais"},
+        "ordem": [("total_emissao", -1)],
+        "limite": 5,
+    },
+    "query4": {
+        "colecao": rollups.REGIOES_ANO,
+        "filtro": {"ano": 2020},
+        "projecao": {"_id": 0, "total_emissao": 1, "regiao": 1},
+        "ordem": [("total_emissao", -1)],
+        "limite": 0,
+    },
+    "query5": {
+        "colecao": rollups.PAISES_ANO,
+        "filtro": {"ano": 2020, "variacao_10_anos": {"$lt": 0}},
+        "projecao": {"_id": 0, "emissao_2010": "$emissao_10_anos_antes", "emissao_2020": "$total_emissao",
+                     "pais": "$pais", "reducao_emissao": "$variacao_10_anos"},
+        "ordem": [("variacao_10_anos", 1)],
+        "limite": 5,
+    },
+}
@@ -0,0 +1,171 @@
+import argparse
+
+import pymongo
+
+import documentos
+
+# Coleções de rollup: total de emissões por país e ano (com a variação em
+# relação a 10 anos antes) e por região e ano
+PAISES_ANO = "emissoes_pais_ano"
+REGIOES_ANO = "emissoes_regiao_ano"
+
+INDICES = {
+    PAISES_ANO: [[("ano", 1), ("total_emissao", -1)], [("ano", 1), ("variacao_10_anos", 1)],
+                 [("iso_code", 1), ("ano", 1)]],
+    REGIOES_ANO: [[("ano", 1), ("total_emissao", -1)], [("regiao", 1), ("ano", 1)]],
+}
+
+# Uma linha por registro de emissão, com país, região e ano, em cada modelo
+_EMISSOES = {
+    "embutido": [
+        {"$unwind": "$emissoes"},
+        {"$project": {"iso_code": "$_id", "nome": 1, "regiao": "$regiao.nome", "ano": "$emissoes.ano",
+                      "emissao": "$emissoes.emissao"}},
+    ],
+    "decadas": [
+        {"$unwind": "$emissoes"},
+        {"$project": {"iso_code": 1, "nome": 1, "regiao": "$regiao.nome", "ano": "$emissoes.ano",
+                      "emissao": "$emissoes.emissao"}},
+    ],
+    "serie": [
+        {"$unwind": "$emissoes"},
+        {"$project": {"iso_code": "$pais.iso_code", "nome": "$pais.nome", "regiao": "$pais.regiao.nome",
+                      "ano": 1, "emissao": "$emissoes.emissao"}},
+    ],
+}
+
+# Totais por país e ano; o total de 10 anos antes vem de uma janela sobre os
+# anos do próprio país
+_POR_PAIS_E_ANO = [
+    {
+        "$group": {
+            "_id": {"iso_code": "$iso_code", "ano": "$ano"},
+            "nome": {"$first": "$nome"},
+            "regiao": {"$first": "$regiao"},
+            "total_emissao": {"$sum": "$emissao"}
+        }
+    },
+    {
+        "$setWindowFields": {
+            "partitionBy": "$_id.iso_code",
+            "sortBy": {"_id.ano": 1},
+            "output": {"anteriores": {"$push": "$total_emissao", "window": {"range": [-10, -10]}}}
+        }
+    },
+    {
+        "$replaceWith": {
+            "_id": {"$concat": ["$_id.iso_code", ":", {"$toString": "$_id.ano"}]},
+            "iso_code": "$_id.iso_code",
+            "ano": "$_id.ano",
+            "total_emissao": "$total_emissao",
+            "pais": "$nome",
+            "regiao": "$regiao",
+            "emissao_10_anos_antes": {"$arrayElemAt": ["$anteriores", 0]},
+            "variacao_10_anos": {"$subtract": ["$total_emissao", {"$arrayElemAt": ["$anteriores", 0]}]}
+        }
+    },
+    {"$merge": {"into": PAISES_ANO, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+]
+
+# Totais por região e ano, a partir dos totais por país
+_POR_REGIAO_E_ANO = [
+    {
+        "$group": {
+            "_id": {"regiao": "$regiao", "ano": "$ano"},
+            "total_emissao": {"$sum": "$total_emissao"}
+        }
+    },
+    {
+        "$replaceWith": {
+            "_id": {"$concat": ["$_id.regiao", ":", {"$toString": "$_id.ano"}]},
+            "ano": "$_id.ano",
+            "total_emissao": "$total_emissao",
+            "regiao": "$_id.regiao"
+        }
+    },
+    {"$merge": {"into": REGIOES_ANO, "on": "_id", "whenMatched": "replace", "whenNotMatched": "insert"}},
+]
+
+def _preparar(db):
+    for nome, indices in INDICES.items():
+        for chaves in indices:
+            db[nome].create_index(chaves)
+
+# Esvazia os rollups (antes de uma carga do zero)
+def limpar(db):
+    db.drop_collection(PAISES_ANO)
+    db.drop_collection(REGIOES_ANO)
+    _preparar(db)
+
+# Atualiza os rollups a partir da coleção do modelo. Sem iso_codes, recria
+# tudo; com eles, recalcula só esses países e as regiões a que pertenciam ou
+# passaram a pertencer.
+def atualizar(db, modelo="embutido", iso_codes=None):
+    origem = db[documentos.COLECOES[modelo]]
+    if iso_codes is None:
+        limpar(db)
+        origem.aggregate(_EMISSOES[modelo] + _POR_PAIS_E_ANO, allowDiskUse=True)
+        db[PAISES_ANO].aggregate(_POR_REGIAO_E_ANO, allowDiskUse=True)
+        return
+
+    iso_codes = list(iso_codes)
+    if not iso_codes:
+        return
+    _preparar(db)
+    regioes = set(db[PAISES_ANO].distinct("regiao", {"iso_code": {"$in": iso_codes}}))
+    db[PAISES_ANO].delete_many({"iso_code": {"$in": iso_codes}})
+    filtro = {"$match": {documentos.CAMPO_PAIS[modelo]: {"$in": iso_codes}}}
+    origem.aggregate([filtro] + _EMISSOES[modelo] + _POR_PAIS_E_ANO, allowDiskUse=True)
+
+    regioes |= set(db[PAISES_ANO].distinct("regiao", {"iso_code": {"$in": iso_codes}}))
+    regioes = [regiao for regiao in regioes if regiao is not None]
+    db[REGIOES_ANO].delete_many({"regiao": {"$in": regioes}})
+    db[PAISES_ANO].aggregate([{"$match": {"regiao": {"$in": regioes}}}] + _POR_REGIAO_E_ANO, allowDiskUse=True)
+
+# Mantém os rollups em dia acompanhando as alterações da coleção de países
+# (change streams exigem replica set e não existem em coleções time-series)
+def acompanhar(db, modelo="embutido"):
+    campo = documentos.CAMPO_PAIS[modelo]
+    with db[documentos.COLECOES[modelo]].watch(full_document="updateLookup") as alteracoes:
+        print(f"Acompanhando {documentos.COLECOES[modelo]}...")
+        for alteracao in alteracoes:
+            if modelo == "embutido":
+                iso_code = alteracao["documentKey"]["_id"]
+            elif alteracao.get("fullDocument"):
+                iso_code = alteracao["fullDocument"][campo]
+            else:
+                # Documento de década apagado: o _id é "ISO:década"
+                iso_code = alteracao["documentKey"]["_id"].split(":")[0]
+            atualizar(db, modelo, [iso_code])
+            print(f"  rollups de {iso_code} atualizados ({alteracao['operationType']})")
+
+# Os rollups só respondem as consultas se existirem
+def disponiveis(db):
+    return all(db[nome].estimated_document_count() > 0 for nome in INDICES)
+
+def main():
+    parser = argparse.ArgumentParser(description="Atualiza as coleções de rollup de emissões no MongoDB")
+    parser.add_argument("--mongo", default="mongodb://localhost:27017/", help="URI do MongoDB")
+    parser.add_argument("--banco", default="ods13_db", help="banco do MongoDB (padrão: ods13_db)")
+    parser.add_argument("--modelo", choices=documentos.MODELOS, default="embutido",
+                        help="modelo de armazenamento de origem (padrão: embutido)")
+    parser.add_argument("--paises", nargs='+', help="recalcula só estes países (padrão: recria tudo)")
+    parser.add_argument("--acompanhar", action="store_true",
+                        help="fica atualizando os rollups a cada alteração na coleção de países")
+    args = parser.parse_args()
+
+    client = pymongo.MongoClient(args.mongo)
+    db = client[args.banco]
+    try:
+        atualizar(db, args.modelo, args.paises)
+        print(f"Rollups atualizados: {PAISES_ANO} ({db[PAISES_ANO].estimated_document_count()} documentos), "
+              f"{REGIOES_ANO} ({db[REGIOES_ANO].estimated_document_count()} documentos)")
+        if args.acompanhar:
+            acompanhar(db, args.modelo)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        client.close()
+
+if __name__ == "__main__":
+    main()